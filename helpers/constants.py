@@ -11,6 +11,8 @@ EXIT_CODE_DEL_SECRET_FAILED = -600
 EXIT_CODE_GET_K8S_PROPS_FAILED = -700
 EXIT_CODE_GET_PRIMARY_RESOURCES_FAILED = -800
 EXIT_CODE_SET_PRIMARY_RESOURCES_FAILED = -900
+EXIT_CODE_SET_UP_RESOURCES_FAILED = -1000
+EXIT_CODE_CLEANUP_RESOURCES_FAILED = -1100
 
 OPTION_SPARK_DRIVER_DEFAULT_JAVA_OPTIONS = "spark.driver.defaultJavaOptions"
 OPTION_SPARK_DRIVER_EXTRA_JAVA_OPTIONS = "spark.driver.extraJavaOptions"
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 
+import base64
 import errno
 import io
 import logging
@@ -8,8 +9,10 @@ import pwd
 import re
 import subprocess
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property, lru_cache
 from tempfile import NamedTemporaryFile
-from typing import Dict, List, Optional, Union
+from typing import Dict, List, Optional, Tuple, Union
 
 import helpers.constants as constants
 import yaml
@@ -254,20 +257,13 @@ def get_kubectl_cmd() -> str:
 def autodetect_kubernetes_master(conf: Dict) -> str:
     """Return a kubernetes master for use with spark-submit in case not provided.
 
+    The master is read from the kubeconfig parsed by the resolution context of the process, without running kubectl.
+
     Args:
         config: dictionary of all config available to spark-submit.
     """
-    kubeconfig = get_kube_config()
-    namespace = conf.get("spark.kubernetes.namespace")
-    context = conf.get("spark.kubernetes.context")
-    primary_sa = retrieve_primary_service_account_details(
-        namespace, kubeconfig, context
-    )
-    primary_namespace = primary_sa.get("spark.kubernetes.namespace") or "default"
-    kubectl_cmd = build_kubectl_cmd(kubeconfig, primary_namespace, context)
-    master_cmd = f"{kubectl_cmd} config view --minify -o jsonpath=\"{{.clusters[0]['cluster.server']}}\""
-    default_master = execute_kubectl_cmd(master_cmd, constants.EXIT_CODE_BAD_KUBECONFIG)
-    return f"k8s://{default_master}"
+    context = get_resolution_context()
+    return f"k8s://{context.api_server(conf.get('spark.kubernetes.context'))}"
 
 
 def UmaskNamedTemporaryFile(*args, **kargs):
@@ -389,22 +385,18 @@ def retrieve_kubernetes_secret(
 
     kubectl_cmd = build_kubectl_cmd(kubeconfig, namespace, k8s_context)
     secret_name = build_secret_name(username)
-    result = dict()
 
-    if keys is None:
-        cmd = f"{kubectl_cmd} get secret {secret_name} -o yaml"
-        out_yaml_str = execute_kubectl_cmd(cmd, constants.EXIT_CODE_GET_SECRET_FAILED)
-        if out_yaml_str is None:
-            raise ValueError("could not get the secret")
-        secret = yaml.safe_load(out_yaml_str)
-        keys = secret["data"].keys() if secret.get("data") else []
-
-    for k in keys:
-        k1 = k.replace(".", "\\.")
-        cmd = f"{kubectl_cmd} get secret {secret_name} -o jsonpath='{{.data.{k1}}}' | base64 --decode"
-        result[k] = execute_kubectl_cmd(cmd, constants.EXIT_CODE_GET_SECRET_FAILED)
+    cmd = f"{kubectl_cmd} get secret {secret_name} -o yaml"
+    out_yaml_str = execute_kubectl_cmd(cmd, constants.EXIT_CODE_GET_SECRET_FAILED)
+    if out_yaml_str is None:
+        raise ValueError("could not get the secret")
+    data = yaml.safe_load(out_yaml_str).get("data") or dict()
 
-    return result
+    # the secret is fetched once and decoded in-process, rather than piping kubectl into base64 for every key
+    return {
+        k: base64.b64decode(data[k]).decode("utf-8") if data.get(k) else None
+        for k in (data.keys() if keys is None else keys)
+    }
 
 
 def delete_kubernetes_secret(
@@ -490,6 +482,88 @@ def is_primary_sa_defined(namespace: str, kubeconfig: str, k8s_context: str) ->
     return len(conf.keys()) > 0
 
 
+class ResolutionContext:
+    """Class holding what the launchers resolve against the cluster, computed at most once per process.
+
+    The kubeconfig is parsed on first use, the primary service account is looked up on first use and the secret of
+    each service account is retrieved once.
+    """
+
+    def __init__(self, kubeconfig: str):
+        """Initialise the resolution context of a kubeconfig.
+
+        Args:
+            kubeconfig: config for kubectl command execution pointing to the right k8s cluster
+        """
+        self.kubeconfig = kubeconfig
+        self._secrets: Dict[Tuple[Optional[str], Optional[str]], Dict] = dict()
+
+    @cached_property
+    def kube_config(self) -> Dict:
+        """Return the parsed kubeconfig."""
+        try:
+            with open(self.kubeconfig) as f:
+                return yaml.safe_load(f)
+        except IOError:
+            print_help_for_missing_or_inaccessible_kubeconfig_file(self.kubeconfig)
+            sys.exit(constants.EXIT_CODE_BAD_KUBECONFIG)
+
+    @property
+    def context(self) -> str:
+        """Return the current context of the kubeconfig."""
+        return self.kube_config["current-context"]
+
+    def api_server(self, k8s_context: Optional[str] = None) -> str:
+        """Return the URL of the API server of a context, read from the parsed kubeconfig.
+
+        Args:
+            k8s_context: kubernetes context to be used. Default is the current context.
+        """
+        context_name = k8s_context or self.context
+        try:
+            context = next(
+                c["context"]
+                for c in self.kube_config["contexts"]
+                if c["name"] == context_name
+            )
+            return next(
+                c["cluster"]["server"]
+                for c in self.kube_config["clusters"]
+                if c["name"] == context["cluster"]
+            )
+        except (KeyError, StopIteration):
+            print_help_for_bad_kubeconfig_file(self.kubeconfig)
+            sys.exit(constants.EXIT_CODE_BAD_KUBECONFIG)
+
+    @cached_property
+    def primary(self) -> Dict:
+        """Return the details of the primary service account."""
+        return retrieve_primary_service_account_details(None, self.kubeconfig, None)
+
+    def secret(self, username: Optional[str], namespace: Optional[str]) -> Dict:
+        """Return the config properties stored against a service account.
+
+        Args:
+            username: username corresponding to the service account
+            namespace: namespace of the provided username
+        """
+        if (username, namespace) not in self._secrets:
+            self._secrets[(username, namespace)] = retrieve_kubernetes_secret(
+                username, namespace, self.kubeconfig, None, None
+            )
+        return self._secrets[(username, namespace)]
+
+
+@lru_cache(maxsize=None)
+def _resolution_context(kubeconfig: str) -> ResolutionContext:
+    return ResolutionContext(kubeconfig)
+
+
+def get_resolution_context() -> ResolutionContext:
+    """Return the resolution context of the kubeconfig in use, shared by all the helper functions of the process."""
+    return _resolution_context(get_kube_config())
+
+
 def get_dynamic_defaults(user_name: str, name_space: str) -> Dict:
     """Get setup scripts generated config values overridden with config properties kept in the service account.
 
@@ -497,19 +571,15 @@ def get_dynamic_defaults(user_name: str, name_space: str) -> Dict:
         user_name: username to point to the service account and it's secret config properties
         name_space: namespace of the username provided
     """
-    kubeconfig = get_kube_config()
-    setup_dynamic_defaults = retrieve_primary_service_account_details(
-        None, kubeconfig, None
-    )
+    context = get_resolution_context()
+    setup_dynamic_defaults = context.primary
     username = user_name or setup_dynamic_defaults.get(
         "spark.kubernetes.authenticate.driver.serviceAccountName"
     )
     namespace = name_space or setup_dynamic_defaults.get("spark.kubernetes.namespace")
     logging.debug(f"Dynamic defaults conf: username={username}")
     logging.debug(f"Dynamic defaults conf: namespace={namespace}")
-    setup_dynamic_defaults_conf = retrieve_kubernetes_secret(
-        username, namespace, kubeconfig, None, None
-    )
+    setup_dynamic_defaults_conf = context.secret(username, namespace)
     return merge_configurations([setup_dynamic_defaults, setup_dynamic_defaults_conf])
 
 
@@ -640,6 +710,79 @@ def get_defaults_from_kubeconfig(kube_config: str, context: str = None) -> Dict:
     return defaults
 
 
+def execute_kubectl_batch(cmds: Dict[str, Optional[str]]) -> Dict[str, int]:
+    """Execute provided kubectl commands in parallel and return their exit statuses.
+
+    Args:
+        cmds: commands to execute, mapped to the text fed to their standard input, if any
+    """
+
+    def execute(cmd: str) -> int:
+        logging.debug(cmd)
+        return subprocess.run(cmd, shell=True, input=cmds[cmd], text=True).returncode
+
+    with ThreadPoolExecutor(max_workers=max(len(cmds), 1)) as executor:
+        return dict(zip(cmds, executor.map(execute, cmds)))
+
+
+def check_exit_statuses(statuses: Dict[str, int], exit_code_on_error: int) -> None:
+    """Report all the failed commands of a batch together, then exit if any failed.
+
+    Args:
+        statuses: exit statuses of the commands, as returned by execute_kubectl_batch
+        exit_code_on_error: On error, sys.exit() called with this code.
+    """
+    failed = {cmd: status for cmd, status in statuses.items() if status != 0}
+    for cmd, status in failed.items():
+        logging.error(f"Command exited with status {status}: {cmd}")
+    if failed:
+        sys.exit(exit_code_on_error)
+
+
+def build_service_account_resources(
+    username: str, namespace: str, labels: Dict[str, str]
+) -> Dict:
+    """Return the list of resources backing a service account, to be applied in a single request.
+
+    Args:
+        username: username corresponding to the service account
+        namespace: namespace of the provided username
+        labels: labels to be set on the service account and its role binding
+    """
+    return {
+        "apiVersion": "v1",
+        "kind": "List",
+        "items": [
+            {
+                "apiVersion": "v1",
+                "kind": "ServiceAccount",
+                "metadata": {
+                    "name": username,
+                    "namespace": namespace,
+                    "labels": labels,
+                },
+            },
+            {
+                "apiVersion": "rbac.authorization.k8s.io/v1",
+                "kind": "RoleBinding",
+                "metadata": {
+                    "name": f"{username}-role",
+                    "namespace": namespace,
+                    "labels": labels,
+                },
+                "roleRef": {
+                    "apiGroup": "rbac.authorization.k8s.io",
+                    "kind": "Role",
+                    "name": "view",
+                },
+                "subjects": [
+                    {"kind": "ServiceAccount", "name": username, "namespace": namespace}
+                ],
+            },
+        ],
+    }
+
+
 def set_up_user(
     username: str,
     name_space: str,
@@ -647,9 +790,14 @@ def set_up_user(
     k8s_context: str,
     defaults: Dict,
     mark_primary: bool,
-) -> None:
+) -> Dict[str, int]:
     """Set up all resources related to a service account.
 
+    After looking up the current primary service account, the service account and its role binding are applied with
+    their final labels in a single request. When the primary account is reassigned, the primary label is removed from
+    the previous primary service account once the apply succeeded only, so that the cluster is never left without a
+    primary account. Returns the exit status of each command, exiting if any failed.
+
     Args:
         username: username corresponding to the service account to be set up.
         name_space: namespace of the provided username.
@@ -663,68 +811,69 @@ def set_up_user(
     context_name = k8s_context or defaults["context"]
     kubectl_cmd = build_kubectl_cmd(kubeconfig, namespace, context_name)
 
-    rolebindingname = username + "-role"
-    roleaccess = "view"
-    label = get_management_label()
-
-    os.system(f"{kubectl_cmd} create serviceaccount {username}")
-    os.system(
-        f"{kubectl_cmd} create rolebinding {rolebindingname} --role={roleaccess} --serviceaccount={namespace}:{username}"
-    )
-
-    primary_label_to_remove = get_primary_label(label=False)
-    primary_label_full = get_primary_label()
-
     primary = retrieve_primary_service_account_details(
         namespace, kubeconfig, context_name
     )
     is_primary_defined = len(primary.keys()) > 0
+    is_primary = is_primary_defined and (
+        primary["spark.kubernetes.authenticate.driver.serviceAccountName"],
+        primary["spark.kubernetes.namespace"],
+    ) == (username, namespace)
 
     logging.debug(f"is_primary_defined={is_primary_defined}")
     logging.debug(f"mark_primary={mark_primary}")
 
-    if is_primary_defined and mark_primary:
+    labels = dict([get_management_label().split("=")])
+    # the applied labels replace the previous ones, hence the current primary keeps its label when set up again
+    if mark_primary or not is_primary_defined or is_primary:
+        labels.update([get_primary_label().split("=")])
+
+    cmd_apply = f"{kubectl_cmd} apply -f -"
+    statuses = execute_kubectl_batch(
+        {
+            cmd_apply: yaml.safe_dump(
+                build_service_account_resources(username, namespace, labels)
+            )
+        }
+    )
+    check_exit_statuses(statuses, constants.EXIT_CODE_SET_UP_RESOURCES_FAILED)
+
+    if (
+        statuses[cmd_apply] == 0
+        and is_primary_defined
+        and mark_primary
+        and not is_primary
+    ):
         sa_to_unlabel = primary[
             "spark.kubernetes.authenticate.driver.serviceAccountName"
         ]
         namespace_of_sa_to_unlabel = primary["spark.kubernetes.namespace"]
-        rolebindingname_to_unlabel = sa_to_unlabel + "-role"
+
         kubectl_cmd_unlabel = build_kubectl_cmd(
             kubeconfig, namespace_of_sa_to_unlabel, context_name
         )
-
-        os.system(
-            f"{kubectl_cmd_unlabel} label serviceaccount --namespace={namespace_of_sa_to_unlabel} {sa_to_unlabel} {primary_label_to_remove}-"
+        unlabel_statuses = execute_kubectl_batch(
+            {
+                f"{kubectl_cmd_unlabel} label serviceaccount/{sa_to_unlabel} "
+                f"rolebinding/{sa_to_unlabel}-role {get_primary_label(label=False)}-": None
+            }
         )
-        os.system(
-            f"{kubectl_cmd_unlabel} label rolebinding --namespace={namespace_of_sa_to_unlabel} {rolebindingname_to_unlabel} {primary_label_to_remove}-"
+        check_exit_statuses(
+            unlabel_statuses, constants.EXIT_CODE_SET_UP_RESOURCES_FAILED
         )
+        statuses.update(unlabel_statuses)
 
-        os.system(
-            f"{kubectl_cmd} label serviceaccount {username} {label} {primary_label_full}"
-        )
-        os.system(
-            f"{kubectl_cmd} label rolebinding {rolebindingname} {label} {primary_label_full}"
-        )
-    elif is_primary_defined and not mark_primary:
-        os.system(f"{kubectl_cmd} label serviceaccount {username} {label}")
-        os.system(f"{kubectl_cmd} label rolebinding {rolebindingname} {label}")
-    elif not is_primary_defined:
-        os.system(
-            f"{kubectl_cmd} label serviceaccount {username} {label} {primary_label_full}"
-        )
-        os.system(
-            f"{kubectl_cmd} label rolebinding {rolebindingname} {label} {primary_label_full}"
-        )
-    else:
-        logging.warning("Labeling logic issue.....")
+    return statuses
 
 
 def cleanup_user(
     username: str, namespace: str, kubeconfig: str, k8s_context: str
-) -> None:
+) -> Dict[str, int]:
     """Clean up all resources related to a service account.
 
+    The service account, its role binding and its configuration secret are deleted in a single request. Returns the
+    exit status of the command, exiting if it failed.
+
     Args:
         username: username corresponding to the service account to be cleaned up.
         namespace: namespace of the provided username.
@@ -733,10 +882,16 @@ def cleanup_user(
     """
     kubectl_cmd = build_kubectl_cmd(kubeconfig, namespace, k8s_context)
     rolebindingname = username + "-role"
+    secret_name = build_secret_name(username)
 
-    os.system(f"{kubectl_cmd} delete serviceaccount {username}")
-    os.system(f"{kubectl_cmd} delete rolebinding {rolebindingname}")
-    delete_kubernetes_secret(username, namespace, kubeconfig, k8s_context)
+    statuses = execute_kubectl_batch(
+        {
+            f"{kubectl_cmd} delete serviceaccount/{username} rolebinding/{rolebindingname} "
+            f"secret/{secret_name} --ignore-not-found": None
+        }
+    )
+    check_exit_statuses(statuses, constants.EXIT_CODE_CLEANUP_RESOURCES_FAILED)
+    return statuses
 
 
 def mkdir(path: PathLike) -> None:
@@ -0,0 +1,225 @@
+"""Module for the resident spark-client agent, resolving service accounts over a Unix socket from warm state."""
+
+import json
+import os
+import socket
+import socketserver
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from spark_client.domain import ServiceAccount
+from spark_client.exceptions import AgentUnavailable
+from spark_client.services import AbstractServiceAccountRegistry, KubeInterface
+from spark_client.utils import WithLogging
+
+
+class AgentServer(WithLogging):
+    """Class for a long-running process holding the parsed kube config and registry caches.
+
+    Requests and responses are exchanged as single JSON lines over a Unix socket.
+    """
+
+    def __init__(
+        self,
+        socket_path: str,
+        kube_interface: KubeInterface,
+        registry_factory: Optional[
+            Callable[[KubeInterface], AbstractServiceAccountRegistry]
+        ] = None,
+    ):
+        """Initialise the agent.
+
+        Args:
+            socket_path: path of the Unix socket to listen on
+            kube_interface: KubeInterface used to resolve service accounts
+            registry_factory: callable building the registry for a given context. Default uses a started
+                              WatchedK8sServiceAccountRegistry, keeping accounts and configurations in memory.
+        """
+        # imported here, so that the agent clients embedded in the CLIs do not load the thread pools
+        from spark_client.client import SparkClient, watched_registry
+
+        self.socket_path = socket_path
+        self.registry_factory = registry_factory or watched_registry
+        self.client = SparkClient(
+            kube_interface=kube_interface, registry_factory=self.registry_factory
+        )
+
+        self._lock = threading.Lock()
+        self._server: Optional[socketserver.UnixStreamServer] = None
+        self._kube_config_mtime = self._get_kube_config_mtime()
+
+    @property
+    def kube_interface(self) -> KubeInterface:
+        """Return the KubeInterface currently used by the agent."""
+        return self.client.kube_interface
+
+    def _get_kube_config_mtime(self) -> Optional[float]:
+        kube_config_file = self.kube_interface.kube_config_file
+        if isinstance(kube_config_file, str) and os.path.exists(kube_config_file):
+            return os.path.getmtime(kube_config_file)
+        return None
+
+    def _reload_if_changed(self):
+        from spark_client.client import SparkClient
+
+        with self._lock:
+            mtime = self._get_kube_config_mtime()
+            if mtime == self._kube_config_mtime:
+                return
+
+            self.logger.info("Kube config file changed. Reloading.")
+
+            previous_client = self.client
+            self.client = SparkClient(
+                kube_interface=self.kube_interface.reloaded(),
+                registry_factory=self.registry_factory,
+            )
+            self._kube_config_mtime = mtime
+
+        previous_client.close()
+
+    def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Return the response to a request.
+
+        Args:
+            request: dictionary with the "action" to be performed and its arguments
+        """
+        if request.get("kube_config") != self.kube_interface.kube_config_file:
+            return {"error": "The agent serves a different kube config file."}
+
+        self._reload_if_changed()
+
+        action = request.get("action")
+
+        if action == "ping":
+            return {}
+
+        if action == "resolve":
+            service_account = self.client.resolve(
+                request.get("master"),
+                request.get("username"),
+                request.get("namespace"),
+            )
+            return {
+                "account": (
+                    service_account.to_dict() if service_account is not None else None
+                )
+            }
+
+        return {"error": f"Unknown action {action}"}
+
+    def serve_forever(self):
+        """Listen on the Unix socket and serve requests until shutdown."""
+        agent = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                try:
+                    response = agent.handle(json.loads(self.rfile.readline()))
+                except Exception as e:
+                    agent.logger.exception("Error while handling request")
+                    response = {"error": str(e)}
+                self.wfile.write((json.dumps(response) + "\n").encode("utf-8"))
+
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+        self._server = socketserver.ThreadingUnixStreamServer(self.socket_path, Handler)
+        self._server.daemon_threads = True
+        os.chmod(self.socket_path, 0o600)
+
+        self.logger.info("Agent listening on %s", self.socket_path)
+
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            self.client.close()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+    def shutdown(self):
+        """Stop serving requests."""
+        if self._server is not None:
+            self._server.shutdown()
+
+
+class AgentClient(WithLogging):
+    """Class for sending requests to a running spark-client agent."""
+
+    def __init__(self, socket_path: str, timeout: float = 10.0):
+        """Initialise the client.
+
+        Args:
+            socket_path: path of the Unix socket the agent listens on
+            timeout: timeout in seconds for connecting and receiving a response
+        """
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def _request(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        if not os.path.exists(self.socket_path):
+            raise AgentUnavailable(self.socket_path)
+
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(self.timeout)
+                sock.connect(self.socket_path)
+                sock.sendall((json.dumps(request) + "\n").encode("utf-8"))
+                with sock.makefile("rb") as fid:
+                    line = fid.readline()
+        except OSError as e:
+            self.logger.debug("Agent at %s not reachable: %s", self.socket_path, e)
+            raise AgentUnavailable(self.socket_path)
+
+        if not line:
+            raise AgentUnavailable(self.socket_path)
+
+        response = json.loads(line)
+
+        if "error" in response:
+            self.logger.warning("Agent could not serve request: %s", response["error"])
+            raise AgentUnavailable(self.socket_path)
+
+        return response
+
+    def ping(self, kube_config: str) -> bool:
+        """Return whether an agent serving the provided kube config file is running.
+
+        Args:
+            kube_config: path of the kube config file
+        """
+        try:
+            self._request({"action": "ping", "kube_config": kube_config})
+            return True
+        except AgentUnavailable:
+            return False
+
+    def resolve(
+        self,
+        kube_config: str,
+        master: Optional[str],
+        username: Optional[str],
+        namespace: Optional[str],
+    ) -> Optional[ServiceAccount]:
+        """Return the service account resolved by the agent, None if no account was found.
+
+        Raises AgentUnavailable if the agent is not running or cannot serve the request.
+
+        Args:
+            kube_config: path of the kube config file used by the client
+            master: K8s master URI, used to select the context
+            username: name of the service account
+            namespace: namespace of the service account
+        """
+        response = self._request(
+            {
+                "action": "resolve",
+                "kube_config": kube_config,
+                "master": master,
+                "username": username,
+                "namespace": namespace,
+            }
+        )
+        account = response.get("account")
+        return ServiceAccount.from_dict(account) if account is not None else None
@@ -0,0 +1,757 @@
+"""Module for resolving spark.jars.packages into a local content-addressed cache of jars."""
+
+import hashlib
+import json
+import os
+import re
+from collections import deque
+from dataclasses import dataclass
+from fnmatch import fnmatchcase
+from functools import cmp_to_key
+from tempfile import NamedTemporaryFile
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple
+from urllib.error import URLError
+from urllib.request import urlopen
+from xml.etree import ElementTree
+
+from spark_client.domain import PropertyFile
+from spark_client.exceptions import ArtifactResolutionError
+from spark_client.instrumentation import measure
+from spark_client.utils import WithLogging, expand_vars
+
+MAVEN_CENTRAL = "https://repo1.maven.org/maven2"
+
+SPARK_PACKAGES = "https://repos.spark-packages.org"
+
+# checksums verified, as by Ivy, when published next to a file
+CHECKSUM_ALGORITHMS = ("sha1", "sha256")
+
+# special meanings of the version qualifiers, as by the latest-revision strategy of Ivy
+VERSION_QUALIFIERS = {"dev": -1, "rc": 1, "final": 2}
+
+MAX_CONFLICT_ROUNDS = 20
+
+RESOLVED_SCOPES = ("compile", "runtime")
+
+MAX_PARENTS = 20
+
+SPARK_DISTRIBUTION_MODULES = (
+    "catalyst",
+    "core",
+    "graphx",
+    "kvstore",
+    "launcher",
+    "mllib",
+    "mllib-local",
+    "network-common",
+    "network-shuffle",
+    "repl",
+    "sketch",
+    "sql",
+    "streaming",
+    "tags",
+    "unsafe",
+)
+
+# modules of the Spark distribution, whatever their Scala version, excluded from the resolution as by spark-submit
+SPARK_EXCLUDES = frozenset(
+    ("org.apache.spark", f"spark-{module}_*") for module in SPARK_DISTRIBUTION_MODULES
+)
+
+
+@dataclass(frozen=True)
+class Coordinate:
+    """Class representing the Maven coordinate of a jar, as listed in spark.jars.packages."""
+
+    group: str
+    artifact: str
+    version: str
+
+    @classmethod
+    def parse(cls, value: str) -> "Coordinate":
+        """Return the coordinate of a groupId:artifactId:version string.
+
+        Args:
+            value: coordinate in the groupId:artifactId:version format
+        """
+        parts = [part.strip() for part in value.strip().split(":")]
+        if len(parts) != 3 or not all(parts):
+            raise ArtifactResolutionError(
+                f"Invalid package {value}, expected groupId:artifactId:version"
+            )
+        return cls(*parts)
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        """Return the groupId and artifactId, identifying the artifact regardless of its version."""
+        return self.group, self.artifact
+
+    def path(self, extension: str) -> str:
+        """Return the path of a file of the artifact, relative to the root of a Maven repository.
+
+        Args:
+            extension: extension of the file, e.g. jar or pom
+        """
+        return (
+            f"{self.group.replace('.', '/')}/{self.artifact}/{self.version}/"
+            f"{self.artifact}-{self.version}.{extension}"
+        )
+
+    def __str__(self) -> str:
+        return f"{self.group}:{self.artifact}:{self.version}"
+
+
+@dataclass(frozen=True)
+class Dependency:
+    """Class representing a dependency declared in a POM, after interpolation of the properties."""
+
+    coordinate: Coordinate
+    scope: str
+    exclusions: FrozenSet[Tuple[str, str]]
+
+
+def parse_excludes(value: Optional[str]) -> FrozenSet[Tuple[str, str]]:
+    """Return the groupId and artifactId pairs listed in spark.jars.excludes.
+
+    Args:
+        value: comma-separated list of groupId:artifactId pairs
+    """
+    excludes = set()
+    for item in (value or "").split(","):
+        if item.strip():
+            group, _, artifact = item.strip().partition(":")
+            excludes.add((group, artifact or "*"))
+    return frozenset(excludes)
+
+
+def compare_versions(first: str, second: str) -> int:
+    """Compare two versions as the latest-revision strategy of Ivy, returning a negative number if first is older.
+
+    Versions are split into numeric and textual parts, compared numerically and lexically respectively, numbers
+    being more recent than text. The dev, rc and final qualifiers are ordered as by Ivy.
+
+    Args:
+        first: first version
+        second: second version
+    """
+
+    def split(version: str) -> List[str]:
+        version = re.sub(r"([a-zA-Z])(\d)", r"\1.\2", version)
+        version = re.sub(r"(\d)([a-zA-Z])", r"\1.\2", version)
+        return re.split(r"[._\-+]", version)
+
+    first_parts, second_parts = split(first), split(second)
+    for a, b in zip(first_parts, second_parts):
+        if a == b:
+            continue
+        if a.isdigit() and b.isdigit():
+            return (int(a) > int(b)) - (int(a) < int(b))
+        if a.isdigit() != b.isdigit():
+            return 1 if a.isdigit() else -1
+        a_meaning = VERSION_QUALIFIERS.get(a.lower())
+        b_meaning = VERSION_QUALIFIERS.get(b.lower())
+        if a_meaning is not None or b_meaning is not None:
+            return (a_meaning or 0) - (b_meaning or 0)
+        return (a > b) - (a < b)
+
+    common = min(len(first_parts), len(second_parts))
+    if len(first_parts) > common:
+        return 1 if first_parts[common].isdigit() else -1
+    if len(second_parts) > common:
+        return -1 if second_parts[common].isdigit() else 1
+    return 0
+
+
+def in_ivy_local(coordinate: "Coordinate", ivy_local: Optional[str]) -> bool:
+    """Return whether an artifact is published to the local Ivy repository, which only Spark resolves.
+
+    Args:
+        coordinate: coordinate of the artifact
+        ivy_local: folder of the local Ivy repository, if any
+    """
+    return ivy_local is not None and os.path.isdir(
+        os.path.join(
+            ivy_local, coordinate.group, coordinate.artifact, coordinate.version
+        )
+    )
+
+
+def _is_excluded(key: Tuple[str, str], exclusions: FrozenSet[Tuple[str, str]]) -> bool:
+    group, artifact = key
+    return any(
+        fnmatchcase(group, excluded_group) and fnmatchcase(artifact, excluded_artifact)
+        for excluded_group, excluded_artifact in exclusions
+    )
+
+
+class MavenResolver(WithLogging):
+    """Class for resolving the transitive dependencies of Maven artifacts from a list of repositories.
+
+    Repositories are accessed by URL, hence both remote (https://) and local (file://) repositories are supported.
+    The compile and runtime dependencies that are not optional are resolved, taking into account the parent POMs,
+    the properties, the dependency management (including imported BOMs) and the exclusions, whose groupId and
+    artifactId may contain * wildcards. As by Ivy, used by spark-submit, the latest version of a dependency required
+    with different versions wins, and the checksums published next to the files are verified. Version ranges,
+    classified artifacts and artifacts of the local Ivy repository are not supported, and raise an
+    ArtifactResolutionError.
+    """
+
+    def __init__(
+        self,
+        repositories: List[str],
+        timeout: float = 30.0,
+        ivy_local: Optional[str] = None,
+    ):
+        """Initialise the resolver.
+
+        Args:
+            repositories: URLs of the Maven repositories, looked up in order
+            timeout: timeout in seconds of the download of a single file
+            ivy_local: folder of the local Ivy repository, whose artifacts are left to Spark
+        """
+        self.repositories = [repository.rstrip("/") for repository in repositories]
+        self.timeout = timeout
+        self.ivy_local = ivy_local
+        self._poms: Dict[Coordinate, Dict[str, Any]] = {}
+        self._models: Dict[Coordinate, Dict[str, Any]] = {}
+
+    def fetch(self, path: str) -> bytes:
+        """Return the content of a file from the first repository providing it.
+
+        Args:
+            path: path of the file, relative to the root of the repositories
+        """
+        for repository in self.repositories:
+            content = self._download(f"{repository}/{path}")
+            if content is not None:
+                self._verify(f"{repository}/{path}", content)
+                return content
+        raise ArtifactResolutionError(
+            f"{path} not found in repositories {', '.join(self.repositories)}"
+        )
+
+    def _download(self, url: str) -> Optional[bytes]:
+        try:
+            with urlopen(url, timeout=self.timeout) as response:
+                return response.read()
+        except (URLError, OSError, ValueError) as e:
+            self.logger.debug("%s not available: %s", url, e)
+            return None
+
+    def _verify(self, url: str, content: bytes):
+        """Check the content of a file against the first checksum published next to it, if any."""
+        for algorithm in CHECKSUM_ALGORITHMS:
+            checksum = self._download(f"{url}.{algorithm}")
+            if checksum is None:
+                continue
+            expected = checksum.decode("utf-8", errors="replace").strip().split()
+            if (
+                not expected
+                or expected[0].lower() != hashlib.new(algorithm, content).hexdigest()
+            ):
+                raise ArtifactResolutionError(f"Invalid {algorithm} checksum of {url}")
+            return
+
+    def _raw_pom(self, coordinate: Coordinate) -> Dict[str, Any]:
+        """Return the parent, properties, dependency management and dependencies of a POM, not interpolated."""
+        if coordinate in self._poms:
+            return self._poms[coordinate]
+
+        try:
+            root = ElementTree.fromstring(self.fetch(coordinate.path("pom")))
+        except ElementTree.ParseError as e:
+            raise ArtifactResolutionError(f"Invalid POM of {coordinate}: {e}")
+
+        ns = root.tag[: root.tag.index("}") + 1] if root.tag.startswith("{") else ""
+
+        def text(element, tag: str, default: Optional[str] = None) -> Optional[str]:
+            child = element.find(f"{ns}{tag}")
+            return (
+                child.text.strip()
+                if child is not None and child.text is not None
+                else default
+            )
+
+        def dependencies(*tags: str) -> List[Dict[str, Any]]:
+            return [
+                {
+                    "group": text(dependency, "groupId"),
+                    "artifact": text(dependency, "artifactId"),
+                    "version": text(dependency, "version"),
+                    "scope": text(dependency, "scope"),
+                    "type": text(dependency, "type", "jar"),
+                    "classifier": text(dependency, "classifier"),
+                    "optional": text(dependency, "optional", "false"),
+                    "exclusions": [
+                        (text(exclusion, "groupId"), text(exclusion, "artifactId"))
+                        for exclusion in dependency.findall(
+                            f"{ns}exclusions/{ns}exclusion"
+                        )
+                    ],
+                }
+                for dependency in root.findall("/".join(f"{ns}{tag}" for tag in tags))
+            ]
+
+        parent = root.find(f"{ns}parent")
+        parent_coordinate = (
+            Coordinate(
+                str(text(parent, "groupId")),
+                str(text(parent, "artifactId")),
+                str(text(parent, "version")),
+            )
+            if parent is not None
+            else None
+        )
+
+        properties = root.find(f"{ns}properties")
+
+        pom = {
+            "parent": parent_coordinate,
+            "group": text(root, "groupId")
+            or (parent_coordinate.group if parent_coordinate else coordinate.group),
+            "version": text(root, "version")
+            or (parent_coordinate.version if parent_coordinate else coordinate.version),
+            "properties": {
+                child.tag[len(ns) :]: (child.text or "").strip()
+                for child in (properties if properties is not None else [])
+                if isinstance(child.tag, str)
+            },
+            "managed": dependencies(
+                "dependencyManagement", "dependencies", "dependency"
+            ),
+            "dependencies": dependencies("dependencies", "dependency"),
+        }
+        self._poms[coordinate] = pom
+        return pom
+
+    def _parent_chain(self, coordinate: Coordinate) -> List[Dict[str, Any]]:
+        """Return the POM of an artifact followed by the ones of its parents, nearest first."""
+        chain = [self._raw_pom(coordinate)]
+        while chain[-1]["parent"] is not None:
+            if len(chain) > MAX_PARENTS:
+                raise ArtifactResolutionError(f"Too many parent POMs for {coordinate}")
+            chain.append(self._raw_pom(chain[-1]["parent"]))
+        return chain
+
+    @staticmethod
+    def _properties(
+        coordinate: Coordinate, chain: List[Dict[str, Any]]
+    ) -> Dict[str, str]:
+        """Return the properties of an artifact, inherited from its parents, with the built-in project properties."""
+        properties: Dict[str, str] = {}
+        for pom in reversed(chain):
+            properties.update(pom["properties"])
+
+        project = chain[0]
+        for prefix in ("project.", "pom.", ""):
+            properties[f"{prefix}groupId"] = project["group"]
+            properties[f"{prefix}artifactId"] = coordinate.artifact
+            properties[f"{prefix}version"] = project["version"]
+        if project["parent"] is not None:
+            properties["project.parent.groupId"] = project["parent"].group
+            properties["project.parent.version"] = project["parent"].version
+        return properties
+
+    @staticmethod
+    def _interpolate(value: Optional[str], properties: Dict[str, str]) -> Optional[str]:
+        """Return the value with the properties it refers to expanded, recursively."""
+        for _ in range(MAX_PARENTS):
+            if value is None or "${" not in value:
+                break
+            expanded = expand_vars(value, properties)
+            if expanded == value:
+                break
+            value = expanded
+        return value
+
+    def _key(
+        self, entry: Dict[str, Any], properties: Dict[str, str]
+    ) -> Tuple[str, str]:
+        return (
+            str(self._interpolate(entry["group"], properties)),
+            str(self._interpolate(entry["artifact"], properties)),
+        )
+
+    def _managed(
+        self, managed: List[Dict[str, Any]], properties: Dict[str, str]
+    ) -> Tuple[Dict[Tuple[str, str], str], Dict[Tuple[str, str], str]]:
+        """Return the managed versions and scopes, the versions declared directly taking precedence over the BOMs."""
+        versions: Dict[Tuple[str, str], str] = {}
+        scopes: Dict[Tuple[str, str], str] = {}
+        imported: Dict[Tuple[str, str], str] = {}
+        for entry in managed:
+            key = self._key(entry, properties)
+            version = self._interpolate(entry["version"], properties)
+            if entry["scope"] == "import" and entry["type"] == "pom":
+                for bom_key, bom_version in self._model(
+                    Coordinate(key[0], key[1], str(version))
+                )["managed"].items():
+                    imported.setdefault(bom_key, bom_version)
+                continue
+            if version is not None:
+                versions[key] = version
+            if entry["scope"] is not None:
+                scopes[key] = str(self._interpolate(entry["scope"], properties))
+        for key, version in imported.items():
+            versions.setdefault(key, version)
+        return versions, scopes
+
+    def _dependency(
+        self,
+        coordinate: Coordinate,
+        entry: Dict[str, Any],
+        properties: Dict[str, str],
+        versions: Dict[Tuple[str, str], str],
+        scopes: Dict[Tuple[str, str], str],
+    ) -> Optional[Dependency]:
+        """Return a declared dependency, None if it is not part of the runtime classpath."""
+        key = self._key(entry, properties)
+        scope = self._interpolate(entry["scope"], properties) or scopes.get(
+            key, "compile"
+        )
+        if (
+            scope not in RESOLVED_SCOPES
+            or self._interpolate(entry["optional"], properties) == "true"
+            or self._interpolate(entry["type"], properties) not in ("jar", "bundle")
+        ):
+            return None
+
+        version = self._interpolate(entry["version"], properties) or versions.get(key)
+        if not version or "${" in version or version[0] in "[(":
+            raise ArtifactResolutionError(
+                f"Unsupported version {version} of {key[0]}:{key[1]} required by {coordinate}"
+            )
+        if entry["classifier"] is not None:
+            raise ArtifactResolutionError(
+                f"Unsupported classifier of {key[0]}:{key[1]} required by {coordinate}"
+            )
+
+        return Dependency(
+            Coordinate(key[0], key[1], version),
+            scope,
+            frozenset(
+                (
+                    str(self._interpolate(group, properties)),
+                    str(self._interpolate(artifact, properties) or "*"),
+                )
+                for group, artifact in entry["exclusions"]
+            ),
+        )
+
+    def _model(self, coordinate: Coordinate) -> Dict[str, Any]:
+        """Return the managed versions and the dependencies of an artifact, inherited from its parents."""
+        if coordinate in self._models:
+            return self._models[coordinate]
+
+        chain = self._parent_chain(coordinate)
+        properties = self._properties(coordinate, chain)
+        versions, scopes = self._managed(
+            [entry for pom in reversed(chain) for entry in pom["managed"]], properties
+        )
+
+        dependencies = []
+        for entry in [
+            entry for pom in reversed(chain) for entry in pom["dependencies"]
+        ]:
+            dependency = self._dependency(
+                coordinate, entry, properties, versions, scopes
+            )
+            if dependency is not None:
+                dependencies.append(dependency)
+
+        model = {"managed": versions, "dependencies": dependencies}
+        self._models[coordinate] = model
+        return model
+
+    def resolve(
+        self,
+        coordinates: List[Coordinate],
+        excludes: FrozenSet[Tuple[str, str]] = frozenset(),
+    ) -> List[Coordinate]:
+        """Return the artifacts and their transitive dependencies, in breadth-first order.
+
+        The dependency graph is traversed again whenever a later version of an artifact is required, until the
+        latest version of each artifact is selected, the dependencies of the evicted versions being dropped.
+
+        Args:
+            coordinates: artifacts to be resolved
+            excludes: groupId and artifactId pairs excluded from the resolution, as in spark.jars.excludes
+        """
+        versions: Dict[Tuple[str, str], str] = {}
+        for _ in range(MAX_CONFLICT_ROUNDS):
+            selected, required = self._traverse(coordinates, excludes, versions)
+            latest = {
+                key: max(candidates, key=cmp_to_key(compare_versions))
+                for key, candidates in required.items()
+            }
+            if latest == versions:
+                return selected
+            versions = latest
+
+        raise ArtifactResolutionError(
+            f"Conflicting versions of the dependencies of {', '.join(map(str, coordinates))} do not converge"
+        )
+
+    def _traverse(
+        self,
+        coordinates: List[Coordinate],
+        excludes: FrozenSet[Tuple[str, str]],
+        versions: Dict[Tuple[str, str], str],
+    ) -> Tuple[List[Coordinate], Dict[Tuple[str, str], List[str]]]:
+        """Return the artifacts reached with the selected versions, and the versions required of each artifact."""
+        queue = deque((coordinate, excludes) for coordinate in coordinates)
+        selected: Dict[Tuple[str, str], Coordinate] = {}
+        required: Dict[Tuple[str, str], List[str]] = {}
+
+        while queue:
+            coordinate, exclusions = queue.popleft()
+            if _is_excluded(coordinate.key, exclusions):
+                continue
+            required.setdefault(coordinate.key, []).append(coordinate.version)
+            if coordinate.key in selected:
+                continue
+
+            coordinate = Coordinate(
+                coordinate.group,
+                coordinate.artifact,
+                versions.get(coordinate.key, coordinate.version),
+            )
+            if in_ivy_local(coordinate, self.ivy_local):
+                raise ArtifactResolutionError(
+                    f"{coordinate} is published to the local Ivy repository {self.ivy_local}"
+                )
+            selected[coordinate.key] = coordinate
+
+            for dependency in self._model(coordinate)["dependencies"]:
+                queue.append(
+                    (dependency.coordinate, exclusions | dependency.exclusions)
+                )
+
+        return list(selected.values()), required
+
+
+class ArtifactCache(WithLogging):
+    """Class for a local cache of jars, shared by the submissions of the user.
+
+    Jars are stored by the SHA-256 of their content under objects/, hence identical jars are stored once. The
+    resolution of a list of packages is recorded in a manifest under manifests/, keyed by the packages, the
+    repositories and the excludes, so that later submissions of the same packages only check that the jars exist.
+    Packages are looked up in the same repositories as spark-submit: the local Maven repository, Maven Central and
+    the Spark Packages repository, followed by the ones of spark.jars.repositories.
+    """
+
+    def __init__(self, folder: str, timeout: float = 30.0, home: Optional[str] = None):
+        """Initialise the cache.
+
+        Args:
+            folder: root folder of the cache, created on first use
+            timeout: timeout in seconds of the download of a single file
+            home: home folder of the user, holding the local Maven and Ivy repositories. Default is the one of the
+                  current user.
+        """
+        self.folder = folder
+        self.timeout = timeout
+        self.home = home or os.path.expanduser("~")
+
+    def repositories(self, repositories: Optional[str] = None) -> List[str]:
+        """Return the URLs of the repositories looked up by spark-submit, in order.
+
+        Args:
+            repositories: comma-separated list of additional repositories, as in spark.jars.repositories
+        """
+        return [
+            f"file://{os.path.join(self.home, '.m2', 'repository')}",
+            os.environ.get("DEFAULT_ARTIFACT_REPOSITORY", MAVEN_CENTRAL),
+            SPARK_PACKAGES,
+        ] + [
+            repository.strip()
+            for repository in (repositories or "").split(",")
+            if repository.strip()
+        ]
+
+    @staticmethod
+    def key(
+        packages: List[str],
+        repositories: List[str],
+        excludes: FrozenSet[Tuple[str, str]],
+    ) -> str:
+        """Return the key of the manifest of a resolution.
+
+        Args:
+            packages: coordinates of the packages
+            repositories: URLs of the repositories
+            excludes: excluded groupId and artifactId pairs
+        """
+        return hashlib.sha256(
+            json.dumps(
+                {
+                    "packages": packages,
+                    "repositories": repositories,
+                    "excludes": sorted(excludes),
+                },
+                sort_keys=True,
+            ).encode("utf-8")
+        ).hexdigest()
+
+    def _manifest_file(self, key: str) -> str:
+        return os.path.join(self.folder, "manifests", f"{key}.json")
+
+    def _write_atomically(self, filename: str, content: bytes):
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with NamedTemporaryFile(
+            dir=os.path.dirname(filename), prefix=".artifact-", delete=False
+        ) as t:
+            t.write(content)
+        os.replace(t.name, filename)
+
+    def lookup(self, key: str, ivy_local: Optional[str] = None) -> Optional[List[str]]:
+        """Return the paths of the jars of a resolution, None if the manifest or any of the jars is missing.
+
+        Args:
+            key: key of the manifest
+            ivy_local: folder of the local Ivy repository. Resolutions of artifacts published there since are missed.
+        """
+        try:
+            with open(self._manifest_file(key)) as fid:
+                manifest = json.load(fid)
+        except (OSError, ValueError):
+            return None
+
+        if any(
+            in_ivy_local(Coordinate.parse(artifact["coordinate"]), ivy_local)
+            for artifact in manifest.get("artifacts", [])
+        ):
+            return None
+
+        paths = [
+            os.path.join(self.folder, artifact["path"])
+            for artifact in manifest.get("artifacts", [])
+        ]
+        return paths if all(os.path.exists(path) for path in paths) else None
+
+    def store(self, coordinate: Coordinate, content: bytes) -> str:
+        """Store a jar in the cache, if not already present, and return its path relative to the cache folder.
+
+        Args:
+            coordinate: coordinate of the jar, giving its file name
+            content: content of the jar
+        """
+        digest = hashlib.sha256(content).hexdigest()
+        path = os.path.join(
+            "objects",
+            digest[:2],
+            digest,
+            f"{coordinate.artifact}-{coordinate.version}.jar",
+        )
+        if not os.path.exists(os.path.join(self.folder, path)):
+            self._write_atomically(os.path.join(self.folder, path), content)
+        return path
+
+    def resolve(
+        self,
+        packages: str,
+        repositories: Optional[str] = None,
+        excludes: Optional[str] = None,
+        ivy: Optional[str] = None,
+    ) -> List[str]:
+        """Return the local paths of the jars of packages and their dependencies, populating the cache if needed.
+
+        Args:
+            packages: comma-separated list of coordinates, as in spark.jars.packages
+            repositories: comma-separated list of additional repositories, as in spark.jars.repositories
+            excludes: comma-separated list of excluded groupId:artifactId pairs, as in spark.jars.excludes, added to
+                      the modules of the Spark distribution
+            ivy: Ivy home folder, as in spark.jars.ivy. Default is .ivy2 in the home folder.
+        """
+        coordinates = [
+            Coordinate.parse(package)
+            for package in packages.split(",")
+            if package.strip()
+        ]
+        repository_urls = self.repositories(repositories)
+        ivy_local = os.path.join(ivy or os.path.join(self.home, ".ivy2"), "local")
+        exclusions = SPARK_EXCLUDES | parse_excludes(excludes)
+
+        key = self.key([str(c) for c in coordinates], repository_urls, exclusions)
+
+        with measure("artifacts.resolve", packages=len(coordinates)) as m:
+            paths = self.lookup(key, ivy_local)
+            if paths is not None:
+                self.logger.debug("Packages %s found in the artifact cache", packages)
+                m.attributes["result"] = "hit"
+                return paths
+
+            resolver = MavenResolver(repository_urls, self.timeout, ivy_local)
+            artifacts = []
+            for coordinate in resolver.resolve(coordinates, exclusions):
+                path = self.store(coordinate, resolver.fetch(coordinate.path("jar")))
+                artifacts.append({"coordinate": str(coordinate), "path": path})
+
+            self._write_atomically(
+                self._manifest_file(key),
+                json.dumps(
+                    {
+                        "packages": [str(c) for c in coordinates],
+                        "repositories": repository_urls,
+                        "excludes": sorted(exclusions),
+                        "artifacts": artifacts,
+                    },
+                    indent=2,
+                ).encode("utf-8"),
+            )
+            self.logger.info(
+                "Resolved %d jars for packages %s into the artifact cache",
+                len(artifacts),
+                packages,
+            )
+            m.attributes["result"] = "miss"
+
+            return [
+                os.path.join(self.folder, artifact["path"]) for artifact in artifacts
+            ]
+
+
+def with_cached_packages(
+    properties: PropertyFile, cache: ArtifactCache
+) -> PropertyFile:
+    """Return the properties with spark.jars.packages replaced by the local paths of the jars in spark.jars.
+
+    The properties are returned unchanged when the packages cannot be resolved, e.g. offline, with version ranges or
+    when published to the local Ivy repository, Spark then resolving them as usual. A custom Ivy configuration (spark.jars.ivySettings) is always left to Spark.
+
+    Args:
+        properties: merged properties of the submission
+        cache: artifact cache the packages are resolved into
+    """
+    props = properties.props
+    packages = props.get("spark.jars.packages")
+    if not packages or props.get("spark.jars.ivySettings"):
+        return properties
+
+    try:
+        paths = cache.resolve(
+            packages,
+            props.get("spark.jars.repositories"),
+            props.get("spark.jars.excludes"),
+            props.get("spark.jars.ivy"),
+        )
+    except (ArtifactResolutionError, OSError) as e:
+        cache.logger.warning(
+            "Could not resolve packages from the artifact cache, Spark will resolve them: %s",
+            e,
+        )
+        return properties
+
+    jars: Set[str] = set()
+    ordered = []
+    for jar in [j for j in str(props.get("spark.jars", "")).split(",") if j] + paths:
+        if jar not in jars:
+            jars.add(jar)
+            ordered.append(jar)
+
+    return PropertyFile(
+        {
+            **{k: v for k, v in props.items() if k != "spark.jars.packages"},
+            "spark.jars": ",".join(ordered),
+        }
+    )
@@ -0,0 +1,195 @@
+"""Module for submitting batches of Spark jobs sharing the same service account and base configuration."""
+
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+from spark_client.domain import PropertyFile
+from spark_client.exceptions import FormatError
+from spark_client.instrumentation import launch_hook, measure
+from spark_client.services import SparkDeployMode, SparkInterface
+from spark_client.utils import WithLogging
+
+
+@dataclass
+class BatchJob:
+    """Class representing a job of a batch, as described in the manifest."""
+
+    name: str
+    args: List[str]
+    conf: PropertyFile = field(default_factory=PropertyFile.empty)
+    deploy_mode: Optional[SparkDeployMode] = None
+
+
+@dataclass
+class BatchJobResult:
+    """Class representing the outcome of a job of a batch.
+
+    The latency is the time from the start of the job until spark-submit is launched, or until the job failed if it
+    was not, and the duration the time from the start of the job until spark-submit exited.
+    """
+
+    name: str
+    exit_code: Optional[int]
+    latency: float
+    duration: float
+    error: Optional[str] = None
+
+    @property
+    def succeeded(self) -> bool:
+        """Return whether spark-submit was launched and exited successfully."""
+        return self.exit_code == 0
+
+
+def read_manifest(filename: str) -> List[BatchJob]:
+    """Return the jobs described in a YAML or JSON manifest.
+
+    The manifest is a list of jobs, each a mapping with the arguments of spark-submit (args) and optionally a name,
+    configuration overrides (conf) and a deploy mode (deploy-mode).
+
+    Args:
+        filename: path of the manifest
+    """
+    import yaml
+
+    with open(filename) as fid:
+        raw = yaml.safe_load(fid)
+
+    if not isinstance(raw, list):
+        raise FormatError(f"Manifest {filename} must contain a list of jobs.")
+
+    jobs = []
+    for index, item in enumerate(raw):
+        try:
+            if not isinstance(item, dict) or not isinstance(item.get("args"), list):
+                raise ValueError("args must be a list")
+            jobs.append(
+                BatchJob(
+                    name=str(item.get("name", f"job-{index}")),
+                    args=[str(arg) for arg in item["args"]],
+                    conf=PropertyFile(
+                        {str(k): str(v) for k, v in (item.get("conf") or {}).items()}
+                    ),
+                    deploy_mode=(
+                        SparkDeployMode(item["deploy-mode"])
+                        if "deploy-mode" in item
+                        else None
+                    ),
+                )
+            )
+        except (ValueError, AttributeError) as e:
+            raise FormatError(f"Invalid job #{index} in manifest {filename}: {e}")
+
+    return jobs
+
+
+class BatchSubmitter(WithLogging):
+    """Class for launching the jobs of a batch through a single SparkInterface, with bounded parallelism.
+
+    The service account is resolved and the base configuration merged once for all the jobs.
+    """
+
+    def __init__(
+        self,
+        spark: SparkInterface,
+        deploy_mode: SparkDeployMode,
+        properties_file: Optional[str] = None,
+        concurrency: int = 4,
+    ):
+        """Initialise the submitter.
+
+        Args:
+            spark: SparkInterface the jobs are submitted through
+            deploy_mode: deploy mode of the jobs not specifying one
+            properties_file: property-file path with the configurations shared by the jobs
+            concurrency: maximum number of spark-submit processes running at the same time
+        """
+        self.spark = spark
+        self.deploy_mode = deploy_mode
+        self.properties_file = properties_file
+        self.concurrency = max(concurrency, 1)
+
+    def _submit(self, job: BatchJob) -> BatchJobResult:
+        start = time.monotonic()
+        launched: List[float] = []
+        exit_code, error = None, None
+
+        with measure("batch.job", job=job.name) as m, launch_hook(
+            lambda: launched.append(time.monotonic())
+        ):
+            try:
+                exit_code = self.spark.spark_submit(
+                    job.deploy_mode or self.deploy_mode,
+                    self.properties_file,
+                    job.args,
+                    conf_overrides=job.conf,
+                )
+            except Exception as e:
+                self.logger.error("Could not launch job %s: %s", job.name, e)
+                error = f"{e.__class__.__name__}: {e}"
+            m.attributes["exit_code"] = exit_code
+
+        end = time.monotonic()
+        return BatchJobResult(
+            job.name,
+            exit_code,
+            (launched[0] if launched else end) - start,
+            end - start,
+            error,
+        )
+
+    def run(self, jobs: List[BatchJob]) -> List[BatchJobResult]:
+        """Submit the jobs and return their results, in the order of the jobs.
+
+        Args:
+            jobs: jobs to be submitted
+        """
+        with ThreadPoolExecutor(
+            max_workers=self.concurrency, thread_name_prefix="spark-client-batch"
+        ) as executor:
+            futures = [
+                executor.submit(contextvars.copy_context().run, self._submit, job)
+                for job in jobs
+            ]
+            return [future.result() for future in futures]
+
+
+def summary(results: List[BatchJobResult]) -> Dict[str, Any]:
+    """Return the summary of a batch, with the exit status, launch latency and duration of each job.
+
+    Args:
+        results: results of the jobs of the batch
+    """
+    latencies = sorted(result.latency for result in results)
+    return {
+        "jobs": [asdict(result) for result in results],
+        "succeeded": sum(result.succeeded for result in results),
+        "failed": sum(not result.succeeded for result in results),
+        "latency_p50": latencies[len(latencies) // 2] if latencies else 0.0,
+        "latency_max": latencies[-1] if latencies else 0.0,
+    }
+
+
+def format_summary(results: List[BatchJobResult]) -> str:
+    """Return the summary of a batch as a table.
+
+    Args:
+        results: results of the jobs of the batch
+    """
+    header = f"{'job':<40}{'exit code':>10}{'latency ms':>12}{'duration s':>12}"
+    lines = [header, "-" * len(header)]
+    for result in results:
+        exit_code = "-" if result.exit_code is None else str(result.exit_code)
+        lines.append(
+            f"{result.name:<40}{exit_code:>10}{result.latency * 1000:>12.1f}{result.duration:>12.1f}"
+        )
+
+    totals = summary(results)
+    lines.append("-" * len(header))
+    lines.append(
+        f"{totals['succeeded']} succeeded, {totals['failed']} failed, "
+        f"latency p50 {totals['latency_p50'] * 1000:.1f} ms, max {totals['latency_max'] * 1000:.1f} ms"
+    )
+    return "\n".join(lines)
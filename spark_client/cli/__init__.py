@@ -1,5 +1,200 @@
+"""Module for the helpers shared by the CLI entry points, importing the heavy modules on first use only."""
+
 import os
+import re
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Iterator, Optional
+
+from spark_client.domain import Defaults, ServiceAccount
+from spark_client.instrumentation import Profile, add_launch_hook, measure
 
-from spark_client.domain import Defaults
+if TYPE_CHECKING:
+    from spark_client.metrics import PrometheusTextfileExporter
+    from spark_client.services import KubeInterface, SparkInterface
+    from spark_client.tracing import Tracer
 
 defaults = Defaults(dict(os.environ))
+
+
+def start_profile(enabled: bool, on_launch: bool = True) -> Optional[Profile]:
+    """Return a started Profile if enabled, None otherwise.
+
+    Args:
+        enabled: whether profiling was requested
+        on_launch: whether the breakdown is printed right before handing over to Spark
+    """
+    if not enabled:
+        return None
+
+    profile = Profile().start()
+    if on_launch:
+        add_launch_hook(profile.print)
+    return profile
+
+
+def start_tracing() -> Optional["Tracer"]:
+    """Return a started Tracer if an endpoint or a file is configured in the environment, None otherwise."""
+    if not (defaults.trace_endpoint or defaults.trace_file):
+        return None
+
+    from spark_client.tracing import (
+        JsonLinesSpanExporter,
+        OtlpHttpSpanExporter,
+        SpanExporter,
+        Tracer,
+    )
+
+    exporter: SpanExporter
+
+    if defaults.trace_endpoint:
+        exporter = OtlpHttpSpanExporter(defaults.trace_endpoint)
+    else:
+        exporter = JsonLinesSpanExporter(str(defaults.trace_file))
+
+    return Tracer(exporter, defaults.trace_sample_ratio).start()
+
+
+def start_metrics(command: str) -> Optional["PrometheusTextfileExporter"]:
+    """Return a started PrometheusTextfileExporter if a metrics file is configured in the environment, None otherwise.
+
+    Args:
+        command: name of the command being run
+    """
+    if not defaults.metrics_file:
+        return None
+
+    from spark_client.metrics import PrometheusTextfileExporter
+
+    return PrometheusTextfileExporter(defaults.metrics_file, command).start()
+
+
+@contextmanager
+def instrument_command(
+    command: str, profile: bool = False, on_launch: bool = True
+) -> Iterator[None]:
+    """Run the enclosed block as the root span of the command, profiling, tracing and metering it if requested.
+
+    Args:
+        command: name of the command
+        profile: whether the breakdown is printed to stderr
+        on_launch: whether the breakdown is printed right before handing over to Spark, or once the block completes
+    """
+    maybe_profile = start_profile(profile, on_launch)
+    maybe_tracer = start_tracing()
+    maybe_metrics = start_metrics(command)
+
+    try:
+        with measure("command", command=command):
+            yield
+    finally:
+        if maybe_metrics is not None:
+            maybe_metrics.stop()
+        if maybe_tracer is not None:
+            maybe_tracer.stop()
+        if maybe_profile is not None:
+            maybe_profile.stop()
+            if not on_launch:
+                maybe_profile.print()
+
+
+def get_kube_interface() -> "KubeInterface":
+    """Return the KubeInterface for the configured kube config, rate limiting and retrying its calls."""
+    from spark_client.services import KubeInterface
+    from spark_client.throttling import RetryPolicy, TokenBucket
+
+    return KubeInterface(
+        defaults.kube_config,
+        kubectl_cmd=defaults.kubectl_cmd,
+        rate_limiter=TokenBucket(defaults.kube_qps, defaults.kube_burst),
+        retry_policy=RetryPolicy(
+            max_attempts=defaults.kube_max_attempts,
+            timeout=defaults.kube_request_timeout,
+        ),
+    )
+
+
+def get_service_account(
+    kube_interface: "KubeInterface",
+    master: Optional[str],
+    username: Optional[str],
+    namespace: Optional[str],
+) -> ServiceAccount:
+    """Return the service account to be used, resolved by the agent if running, in-process otherwise.
+
+    The in-process resolution is bounded by the resolution timeout. When it times out or K8s cannot be reached, the
+    last known-good snapshot of the account is used, provided that it is not older than the configured bound.
+
+    Args:
+        kube_interface: KubeInterface used for the in-process resolution
+        master: K8s master URI, used to select the context
+        username: name of the service account. Default uses the primary account.
+        namespace: namespace of the service account. Default uses the primary account.
+    """
+    from spark_client.agent import AgentClient
+    from spark_client.exceptions import AgentUnavailable
+    from spark_client.services import K8sServiceAccountRegistry
+    from spark_client.snapshot import AccountSnapshotStore
+
+    store = AccountSnapshotStore(defaults.account_snapshot_folder)
+    key = store.key(kube_interface.kube_config_file, master, username, namespace)
+
+    def resolve() -> Optional[ServiceAccount]:
+        registry = K8sServiceAccountRegistry(
+            kube_interface.select_by_master(re.compile("^k8s://").sub("", master))
+            if master is not None
+            else kube_interface
+        )
+        return registry.resolve(username, namespace)
+
+    with measure("account.resolve") as m:
+        try:
+            # the agent serves a kube config file, watched for changes
+            if not isinstance(kube_interface.kube_config_file, str):
+                raise AgentUnavailable(defaults.agent_socket)
+            service_account = AgentClient(defaults.agent_socket).resolve(
+                kube_interface.kube_config_file, master, username, namespace
+            )
+            m.attributes["source"] = "agent"
+            if service_account is not None:
+                store.save(key, service_account)
+        except AgentUnavailable:
+            service_account, age = store.resolve(
+                key, resolve, defaults.resolution_timeout, defaults.snapshot_max_age
+            )
+            m.attributes["source"] = "kubernetes" if age is None else "snapshot"
+
+        if service_account is not None:
+            m.attributes["account"] = service_account.id
+
+    if service_account is None:
+        raise ValueError("Service account provided does not exist.")
+
+    return service_account
+
+
+def get_spark_interface(
+    master: Optional[str], username: Optional[str], namespace: Optional[str]
+) -> "SparkInterface":
+    """Return the SparkInterface for the given master, resolving the service account only when running on K8s.
+
+    Args:
+        master: master URI. Default uses the K8s cluster of the current context.
+        username: name of the service account. Default uses the primary account.
+        namespace: namespace of the service account. Default uses the primary account.
+    """
+    from spark_client.services import SparkInterface, is_kubernetes_master
+
+    if not is_kubernetes_master(master):
+        return SparkInterface(
+            service_account=None, kube_interface=None, defaults=defaults, master=master
+        )
+
+    kube_interface = get_kube_interface()
+
+    return SparkInterface(
+        service_account=get_service_account(
+            kube_interface, master, username, namespace
+        ),
+        kube_interface=kube_interface,
+        defaults=defaults,
+    )
@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+
+import argparse
+import logging
+
+from spark_client.agent import AgentServer
+from spark_client.cli import defaults, get_kube_interface
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--log-level", default="INFO", type=str, help="Level for logging."
+    )
+    parser.add_argument(
+        "--socket",
+        default=defaults.agent_socket,
+        type=str,
+        help="Unix socket to listen on.",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)s %(message)s", level=args.log_level
+    )
+
+    AgentServer(args.socket, get_kube_interface()).serve_forever()
@@ -2,16 +2,11 @@
 
 import argparse
 import logging
-import re
-from typing import Optional
+import sys
 
-from spark_client.cli import defaults
-from spark_client.domain import ServiceAccount
-from spark_client.services import (
-    K8sServiceAccountRegistry,
-    KubeInterface,
-    SparkInterface,
-)
+from spark_client.cli import get_spark_interface, instrument_command
+from spark_client.exceptions import PythonDependencyError
+from spark_client.utils import add_python_dependency_arguments
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -19,7 +14,15 @@ if __name__ == "__main__":
         "--log-level", default="ERROR", type=str, help="Level for logging."
     )
     parser.add_argument(
-        "--master", default=None, type=str, help="Kubernetes control plane uri."
+        "--profile",
+        action="store_true",
+        help="Print a breakdown of the time spent in each operation to stderr.",
+    )
+    parser.add_argument(
+        "--master",
+        default=None,
+        type=str,
+        help="Kubernetes control plane uri, or e.g. local[*] to run without Kubernetes.",
     )
     parser.add_argument(
         "--properties-file",
@@ -39,33 +42,23 @@ if __name__ == "__main__":
         type=str,
         help="Namespace of service account name to use other than primary.",
     )
+    add_python_dependency_arguments(parser)
     args, extra_args = parser.parse_known_args()
 
     logging.basicConfig(
         format="%(asctime)s %(levelname)s %(message)s", level=args.log_level
     )
 
-    kube_interface = KubeInterface(
-        defaults.kube_config, kubectl_cmd=defaults.kubectl_cmd
-    )
-
-    registry = K8sServiceAccountRegistry(
-        kube_interface.select_by_master(re.compile("^k8s://").sub("", args.master))
-        if args.master is not None
-        else kube_interface
-    )
-
-    service_account: Optional[ServiceAccount] = (
-        registry.get_primary()
-        if args.username is None and args.namespace is None
-        else registry.get(f"{args.namespace or 'default'}:{args.username or 'spark'}")
-    )
-
-    if service_account is None:
-        raise ValueError("Service account provided does not exist.")
-
-    SparkInterface(
-        service_account=service_account,
-        kube_interface=kube_interface,
-        defaults=defaults,
-    ).pyspark_shell(args.properties_file, extra_args)
+    try:
+        with instrument_command("pyspark", args.profile):
+            get_spark_interface(
+                args.master, args.username, args.namespace
+            ).pyspark_shell(
+                args.properties_file,
+                extra_args,
+                py_source=args.py_source,
+                py_requirements=args.py_requirements,
+            )
+    except PythonDependencyError as e:
+        logging.error(e)
+        sys.exit(1)
@@ -5,14 +5,9 @@ import json
 import logging
 from enum import Enum
 
-from spark_client.cli import defaults
+from spark_client.cli import get_kube_interface, instrument_command
 from spark_client.domain import PropertyFile, ServiceAccount
 from spark_client.exceptions import NoAccountFound
-from spark_client.services import (
-    K8sServiceAccountRegistry,
-    KubeInterface,
-    parse_conf_overrides,
-)
 
 
 def build_service_account_from_args(args) -> ServiceAccount:
@@ -39,6 +34,11 @@ if __name__ == "__main__":
     parser.add_argument(
         "--log-level", default="ERROR", type=str, help="Level for logging."
     )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print a breakdown of the time spent in each operation to stderr.",
+    )
     parser.add_argument(
         "--kubeconfig", default=None, help="Kubernetes configuration file"
     )
@@ -109,7 +109,13 @@ if __name__ == "__main__":
     #  subparser for resources-primary-sa
     parser_account = subparsers.add_parser(Actions.PRIMARY.value)
 
+    #  subparser for list
     parser_account = subparsers.add_parser(Actions.LIST.value)
+    parser_account.add_argument(
+        "--no-confs",
+        action="store_true",
+        help="Do not retrieve the configurations of the service accounts.",
+    )
 
     args = parser.parse_args()
 
@@ -117,67 +123,70 @@ if __name__ == "__main__":
         format="%(asctime)s %(levelname)s %(message)s", level=args.log_level
     )
 
-    kube_interface = KubeInterface(
-        defaults.kube_config, kubectl_cmd=defaults.kubectl_cmd
-    )
+    with instrument_command("service-account-registry", args.profile, on_launch=False):
+        from spark_client.services import (
+            K8sServiceAccountRegistry,
+            parse_conf_overrides,
+        )
 
-    context = args.context or kube_interface.context_name
+        kube_interface = get_kube_interface()
 
-    logging.info(f"Using K8s context: {context}")
+        context = args.context or kube_interface.context_name
 
-    registry = K8sServiceAccountRegistry(kube_interface.with_context(context))
+        logging.info(f"Using K8s context: {context}")
 
-    if args.action == Actions.CREATE:
-        service_account = build_service_account_from_args(args)
-        service_account.extra_confs = (
-            PropertyFile.read(args.properties_file)
-            if args.properties_file is not None
-            else PropertyFile.empty()
-        ) + parse_conf_overrides(args.conf)
+        registry = K8sServiceAccountRegistry(kube_interface.with_context(context))
 
-        registry.create(service_account)
+        if args.action == Actions.CREATE:
+            service_account = build_service_account_from_args(args)
+            service_account.extra_confs = (
+                PropertyFile.read(args.properties_file)
+                if args.properties_file is not None
+                else PropertyFile.empty()
+            ) + parse_conf_overrides(args.conf)
 
-    elif args.action == Actions.DELETE:
-        registry.delete(build_service_account_from_args(args).id)
+            registry.create(service_account)
 
-    elif args.action == Actions.UPDATE_CONF:
-        account_configuration = (
-            PropertyFile.read(args.properties_file)
-            if args.properties_file is not None
-            else PropertyFile.empty()
-        ) + parse_conf_overrides(args.conf)
+        elif args.action == Actions.DELETE:
+            registry.delete(build_service_account_from_args(args).id)
 
-        registry.set_configurations(
-            build_service_account_from_args(args).id, account_configuration
-        )
+        elif args.action == Actions.UPDATE_CONF:
+            account_configuration = (
+                PropertyFile.read(args.properties_file)
+                if args.properties_file is not None
+                else PropertyFile.empty()
+            ) + parse_conf_overrides(args.conf)
 
-    elif args.action == Actions.GET_CONF:
-        input_service_account = build_service_account_from_args(args)
+            registry.set_configurations(
+                build_service_account_from_args(args).id, account_configuration
+            )
 
-        maybe_service_account = registry.get(input_service_account.id)
+        elif args.action == Actions.GET_CONF:
+            input_service_account = build_service_account_from_args(args)
 
-        if maybe_service_account is None:
-            raise NoAccountFound(input_service_account.id)
+            maybe_service_account = registry.get(input_service_account.id)
 
-        maybe_service_account.configurations.log(print)
+            if maybe_service_account is None:
+                raise NoAccountFound(input_service_account.id)
 
-    elif args.action == Actions.DELETE_CONF:
-        registry.set_configurations(
-            build_service_account_from_args(args).id, PropertyFile.empty()
-        )
+            maybe_service_account.configurations.log(print)
 
-    elif args.action == Actions.PRIMARY:
-        maybe_service_account = registry.get_primary()
+        elif args.action == Actions.DELETE_CONF:
+            registry.set_configurations(
+                build_service_account_from_args(args).id, PropertyFile.empty()
+            )
 
-        if maybe_service_account is None:
-            raise NoAccountFound()
+        elif args.action == Actions.PRIMARY:
+            maybe_service_account = registry.get_primary()
 
-        maybe_service_account.configurations.log(print)
+            if maybe_service_account is None:
+                raise NoAccountFound()
 
-    elif args.action == Actions.LIST:
-        for service_account in registry.all():
-            print(
-                str.expandtabs(
-                    f"{service_account.id}\t{service_account.primary}\t{json.dumps(service_account.extra_confs.props)}"
-                )
-            )
+            maybe_service_account.configurations.log(print)
+
+        elif args.action == Actions.LIST:
+            for service_account in registry.stream():
+                line = f"{service_account.id}\t{service_account.primary}"
+                if not args.no_confs:
+                    line += f"\t{json.dumps(service_account.extra_confs.props)}"
+                print(str.expandtabs(line), flush=True)
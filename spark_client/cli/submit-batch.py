@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+import json
+import logging
+import sys
+
+from spark_client.cli import get_spark_interface, instrument_command
+from spark_client.utils import (
+    add_batch_arguments,
+    add_deploy_arguments,
+    add_logging_arguments,
+    add_profile_arguments,
+    custom_parser,
+    parse_arguments_with,
+)
+
+if __name__ == "__main__":
+    args, extra_args = parse_arguments_with(
+        [
+            add_logging_arguments,
+            add_profile_arguments,
+            custom_parser,
+            add_deploy_arguments,
+            add_batch_arguments,
+        ]
+    )
+
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)s %(message)s", level=args.log_level
+    )
+
+    if extra_args:
+        logging.warning(f"Ignoring arguments not in the manifest: {extra_args}")
+
+    with instrument_command("submit-batch", args.profile, on_launch=False):
+        from spark_client.batch import (
+            BatchSubmitter,
+            format_summary,
+            read_manifest,
+            summary,
+        )
+
+        jobs = read_manifest(args.manifest)
+
+        results = BatchSubmitter(
+            get_spark_interface(args.master, args.username, args.namespace),
+            args.deploy_mode,
+            args.properties_file,
+            args.concurrency,
+        ).run(jobs)
+
+    print(format_summary(results))
+
+    if args.summary_file is not None:
+        with open(args.summary_file, "w") as fid:
+            json.dump(summary(results), fid, indent=2)
+
+    sys.exit(0 if all(result.succeeded for result in results) else 1)
@@ -0,0 +1,276 @@
+"""Module for embedding spark-client in long-running Python processes submitting many Spark jobs."""
+
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from spark_client.domain import Defaults, ServiceAccount
+from spark_client.services import (
+    AbstractServiceAccountRegistry,
+    KubeInterface,
+    SparkDeployMode,
+    SparkInterface,
+    WatchedK8sServiceAccountRegistry,
+    is_kubernetes_master,
+)
+from spark_client.utils import WithLogging
+
+
+def watched_registry(kube_interface: KubeInterface) -> AbstractServiceAccountRegistry:
+    """Return a started WatchedK8sServiceAccountRegistry for the provided KubeInterface.
+
+    Args:
+        kube_interface: KubeInterface pointing to the context of the registry
+    """
+    return WatchedK8sServiceAccountRegistry(kube_interface).start()
+
+
+class SparkSubmission:
+    """Class representing a handle to a job submitted through a SparkClient."""
+
+    def __init__(self):
+        """Initialise a handle for a submission that has not started yet."""
+        self.timings: Dict[str, float] = {}
+        self._future: "Future[int]" = Future()
+
+    @property
+    def exit_code(self) -> Optional[int]:
+        """Return the exit code of spark-submit, None if it has not completed yet or failed before launching."""
+        if not self._future.done() or self._future.exception() is not None:
+            return None
+        return self._future.result()
+
+    def done(self) -> bool:
+        """Return whether the submission has completed."""
+        return self._future.done()
+
+    def wait(self, timeout: Optional[float] = None) -> "SparkSubmission":
+        """Wait for the submission to complete, re-raising any error raised while submitting.
+
+        Args:
+            timeout: maximum number of seconds to wait. Default waits indefinitely.
+        """
+        self._future.result(timeout)
+        return self
+
+
+class SparkClient(WithLogging):
+    """Class for submitting Spark jobs, sharing the kube config and registries across submissions.
+
+    The client is thread-safe and can be used for concurrent submissions.
+    """
+
+    def __init__(
+        self,
+        defaults: Optional[Defaults] = None,
+        kube_interface: Optional[KubeInterface] = None,
+        registry_factory: Callable[
+            [KubeInterface], AbstractServiceAccountRegistry
+        ] = watched_registry,
+        max_workers: int = 8,
+    ):
+        """Initialise the client.
+
+        Args:
+            defaults: Defaults class containing relevant default settings. Default uses the process environment.
+            kube_interface: KubeInterface to be used. Default uses the kube config and kubectl given by the defaults.
+            registry_factory: callable building the registry for a given context, called once per context.
+            max_workers: maximum number of submissions run concurrently by submit_async
+        """
+        self.defaults = defaults or Defaults()
+        self.kube_interface = kube_interface or KubeInterface(
+            self.defaults.kube_config, kubectl_cmd=self.defaults.kubectl_cmd
+        )
+        self.registry_factory = registry_factory
+        self.max_workers = max_workers
+
+        self._interfaces: Dict[str, KubeInterface] = {}
+        self._registries: Dict[str, AbstractServiceAccountRegistry] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def interface(self, master: Optional[str] = None) -> KubeInterface:
+        """Return the KubeInterface for the context matching the provided master, selected on first use.
+
+        Args:
+            master: K8s master URI, used to select the context. Default uses the current context.
+        """
+        if master is None:
+            return self.kube_interface
+
+        with self._lock:
+            if master not in self._interfaces:
+                self._interfaces[master] = self.kube_interface.select_by_master(
+                    re.compile("^k8s://").sub("", master)
+                )
+            return self._interfaces[master]
+
+    def registry(self, master: Optional[str] = None) -> AbstractServiceAccountRegistry:
+        """Return the registry for the context matching the provided master, building it on first use.
+
+        Args:
+            master: K8s master URI, used to select the context. Default uses the current context.
+        """
+        kube_interface = self.interface(master)
+
+        with self._lock:
+            if kube_interface.context_name not in self._registries:
+                self._registries[kube_interface.context_name] = self.registry_factory(
+                    kube_interface
+                )
+            return self._registries[kube_interface.context_name]
+
+    def resolve(
+        self,
+        master: Optional[str] = None,
+        username: Optional[str] = None,
+        namespace: Optional[str] = None,
+    ) -> Optional[ServiceAccount]:
+        """Return the service account to be used, None if no account was found.
+
+        Args:
+            master: K8s master URI, used to select the context. Default uses the current context.
+            username: name of the service account. Default uses the primary account.
+            namespace: namespace of the service account. Default uses the primary account.
+        """
+        return self.registry(master).resolve(username, namespace)
+
+    def _submit(
+        self,
+        submission: SparkSubmission,
+        args: List[str],
+        deploy_mode: SparkDeployMode,
+        properties_file: Optional[str],
+        master: Optional[str],
+        username: Optional[str],
+        namespace: Optional[str],
+    ) -> int:
+        start = time.monotonic()
+
+        if is_kubernetes_master(master):
+            service_account = self.resolve(master, username, namespace)
+            if service_account is None:
+                raise ValueError("Service account provided does not exist.")
+            spark = SparkInterface(
+                service_account=service_account,
+                kube_interface=self.interface(master),
+                defaults=self.defaults,
+            )
+        else:
+            spark = SparkInterface(
+                service_account=None,
+                kube_interface=None,
+                defaults=self.defaults,
+                master=master,
+            )
+
+        resolved = time.monotonic()
+        submission.timings["resolve"] = resolved - start
+
+        exit_code = spark.spark_submit(deploy_mode, properties_file, args)
+
+        submission.timings["spark_submit"] = time.monotonic() - resolved
+        submission.timings["total"] = time.monotonic() - start
+
+        return exit_code
+
+    def _run(self, submission: SparkSubmission, *args) -> SparkSubmission:
+        if not submission._future.set_running_or_notify_cancel():
+            return submission
+        try:
+            submission._future.set_result(self._submit(submission, *args))
+        except BaseException as e:
+            submission._future.set_exception(e)
+        return submission
+
+    def submit(
+        self,
+        args: List[str],
+        deploy_mode: SparkDeployMode = SparkDeployMode.CLIENT,
+        properties_file: Optional[str] = None,
+        master: Optional[str] = None,
+        username: Optional[str] = None,
+        namespace: Optional[str] = None,
+    ) -> SparkSubmission:
+        """Submit a spark job in the calling thread and return its completed handle.
+
+        Args:
+            args: extra arguments provided to the spark submit command, e.g. the application and its arguments
+            deploy_mode: "client" or "cluster" depending where the driver will run
+            properties_file: property-file path with job specific configurations
+            master: K8s master URI, used to select the context. Default uses the current context. Non-K8s masters,
+                    e.g. local[*], are launched without resolving any service account.
+            username: name of the service account. Default uses the primary account.
+            namespace: namespace of the service account. Default uses the primary account.
+        """
+        return self._run(
+            SparkSubmission(),
+            args,
+            deploy_mode,
+            properties_file,
+            master,
+            username,
+            namespace,
+        ).wait()
+
+    def submit_async(
+        self,
+        args: List[str],
+        deploy_mode: SparkDeployMode = SparkDeployMode.CLIENT,
+        properties_file: Optional[str] = None,
+        master: Optional[str] = None,
+        username: Optional[str] = None,
+        namespace: Optional[str] = None,
+    ) -> SparkSubmission:
+        """Submit a spark job in a background thread and return its handle straight away.
+
+        Args:
+            args: extra arguments provided to the spark submit command, e.g. the application and its arguments
+            deploy_mode: "client" or "cluster" depending where the driver will run
+            properties_file: property-file path with job specific configurations
+            master: K8s master URI, used to select the context. Default uses the current context. Non-K8s masters,
+                    e.g. local[*], are launched without resolving any service account.
+            username: name of the service account. Default uses the primary account.
+            namespace: namespace of the service account. Default uses the primary account.
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="spark-client"
+                )
+            executor = self._executor
+
+        submission = SparkSubmission()
+        executor.submit(
+            self._run,
+            submission,
+            args,
+            deploy_mode,
+            properties_file,
+            master,
+            username,
+            namespace,
+        )
+        return submission
+
+    def close(self):
+        """Wait for pending submissions and release the resources held by the client."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            registries, self._registries = self._registries, {}
+            self._interfaces = {}
+
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+        for registry in registries.values():
+            if isinstance(registry, WatchedK8sServiceAccountRegistry):
+                registry.stop()
+
+    def __enter__(self) -> "SparkClient":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,10 +1,12 @@
 import io
+import logging
 import os
 import re
 from dataclasses import dataclass
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Mapping, Optional
 
-from spark_client.utils import WithLogging, union
+from spark_client.instrumentation import instrumented, measure
+from spark_client.utils import WithLogging, expand_vars, union
 
 
 class PropertyFile(WithLogging):
@@ -32,12 +34,16 @@ class PropertyFile(WithLogging):
         return key in ["spark.driver.extraJavaOptions"]
 
     @classmethod
-    def _read_property_file_unsafe(cls, name: str) -> Dict:
+    def _read_property_file_unsafe(
+        cls, name: str, environ: Optional[Mapping[str, str]] = None
+    ) -> Dict:
         """Read properties in given file into a dictionary.
 
         Args:
             name: file name to be read
+            environ: mapping used to expand variables in the values. Default uses os.environ.
         """
+        variables = os.environ if environ is None else environ
         defaults = dict()
         with open(name) as f:
             for line in f:
@@ -48,21 +54,27 @@ class PropertyFile(WithLogging):
                     value = option_assignment[1].strip()
                 else:
                     value = prop_assignment[1].strip()
-                defaults[prop_key] = os.path.expandvars(value)
+                defaults[prop_key] = expand_vars(value, variables)
         return defaults
 
     @classmethod
-    def read(cls, filename: str) -> "PropertyFile":
+    def read(
+        cls, filename: str, environ: Optional[Mapping[str, str]] = None
+    ) -> "PropertyFile":
         """Read properties file and return a PropertyFile object.
 
         Args:
             filename: input filename
+            environ: mapping used to expand variables in the values. Default uses os.environ.
         """
         try:
-            return PropertyFile(cls._read_property_file_unsafe(filename))
+            with measure("properties.read") as m:
+                m.bytes = os.path.getsize(filename)
+                return PropertyFile(cls._read_property_file_unsafe(filename, environ))
         except FileNotFoundError as e:
             raise e
 
+    @instrumented("properties.write")
     def write(self, fp: io.TextIOWrapper) -> "PropertyFile":
         """Write out a property file to disk.
 
@@ -74,17 +86,35 @@ class PropertyFile(WithLogging):
             fp.write(line + "\n")
         return self
 
-    def log(self, log_func: Optional[Callable[[str], None]] = None) -> "PropertyFile":
+    def log(
+        self,
+        log_func: Optional[Callable[[str], None]] = None,
+        max_items: Optional[int] = None,
+        reference: Optional[str] = None,
+    ) -> "PropertyFile":
         """Print a given dictionary to screen.
 
         Args:
             log_func: callable to specify another custom printer function. Default uses the class logger with an
-                      INFO level.
+                      INFO level, and nothing is formatted if INFO is not enabled.
+            max_items: maximum number of properties to be printed, the remaining ones being summarised in a single
+                       line. Default prints all the properties.
+            reference: location where the full set of properties can be found, mentioned in the summary line
         """
-
-        printer = (lambda msg: self.logger.info(msg)) if log_func is None else log_func
-
-        for k, v in self.props.items():
+        if log_func is None:
+            if not self.logger.isEnabledFor(logging.INFO):
+                return self
+            printer: Callable[[str], None] = self.logger.info
+        else:
+            printer = log_func
+
+        for index, (k, v) in enumerate(self.props.items()):
+            if max_items is not None and index >= max_items:
+                printer(
+                    f"... {len(self.props) - index} more properties"
+                    + (f" in {reference}" if reference else "")
+                )
+                break
             printer(f"{k}={v}")
         return self
 
@@ -128,6 +158,7 @@ class PropertyFile(WithLogging):
     def __add__(self, other: "PropertyFile"):
         return self.union([other])
 
+    @instrumented("properties.union")
     def union(self, others: List["PropertyFile"]) -> "PropertyFile":
         """Merge multiple PropertyFile objects, with right to left priority.
 
@@ -144,6 +175,35 @@ class PropertyFile(WithLogging):
         return PropertyFile(union(*[simple_properties, merged_options]))
 
 
+class LazyPropertyFile(PropertyFile):
+    """Class for a PropertyFile whose properties are retrieved on first access and then memoized."""
+
+    def __init__(self, loader: Callable[[], Dict[str, Any]]):
+        """Initialize a LazyPropertyFile class with a function returning the properties dictionary.
+
+        Args:
+            loader: callable returning the properties dictionary, invoked at most once on first access
+        """
+        self._loader = loader
+        self._props: Optional[Dict[str, Any]] = None
+
+    @property
+    def is_loaded(self) -> bool:
+        """Return whether the properties have already been retrieved."""
+        return self._props is not None
+
+    @property
+    def props(self) -> Dict[str, Any]:
+        """Return the properties, invoking the loader on first access."""
+        if self._props is None:
+            self._props = self._loader()
+        return self._props
+
+    @props.setter
+    def props(self, props: Dict[str, Any]):
+        self._props = props
+
+
 class Defaults:
     """Class containing all relevant defaults for the application."""
 
@@ -156,6 +216,9 @@ class Defaults:
 
         self.environ = environ if environ is not None else {}
 
+    def _is_enabled(self, name: str) -> bool:
+        return self.environ.get(name, "").lower() in ("1", "true", "yes")
+
     @property
     def snap_folder(self) -> str:
         """Return the SNAP folder"""
@@ -181,6 +244,137 @@ class Defaults:
         """Return /tmp directory as seen by the snap, for user's reference."""
         return "/tmp/snap.spark-client"
 
+    @property
+    def account_snapshot_folder(self) -> str:
+        """Return the folder keeping the last known-good resolved service accounts."""
+        return f"{self.environ.get('SNAP_USER_DATA')}/accounts"
+
+    @property
+    def resolution_timeout(self) -> float:
+        """Return the time budget in seconds for resolving the service account against K8s. Default is 30 seconds."""
+        return float(self.environ.get("SPARK_CLIENT_RESOLUTION_TIMEOUT", "30"))
+
+    @property
+    def snapshot_max_age(self) -> float:
+        """Return the maximum age in seconds of a snapshot used when K8s cannot be reached. Default is 7 days."""
+        return float(self.environ.get("SPARK_CLIENT_SNAPSHOT_MAX_AGE", "604800"))
+
+    @property
+    def kube_qps(self) -> float:
+        """Return the sustained rate of kubectl calls per second, across threads. Default is 20, zero disables it."""
+        return float(self.environ.get("SPARK_CLIENT_KUBE_QPS", "20"))
+
+    @property
+    def kube_burst(self) -> int:
+        """Return the number of kubectl calls that can be issued back-to-back above the rate. Default is 40."""
+        return int(self.environ.get("SPARK_CLIENT_KUBE_BURST", "40"))
+
+    @property
+    def kube_max_attempts(self) -> int:
+        """Return the maximum number of attempts of a retried kubectl call. Default is 4."""
+        return int(self.environ.get("SPARK_CLIENT_KUBE_MAX_ATTEMPTS", "4"))
+
+    @property
+    def kube_request_timeout(self) -> Optional[float]:
+        """Return the timeout in seconds of a single kubectl call, if set by the user."""
+        timeout = self.environ.get("SPARK_CLIENT_KUBE_REQUEST_TIMEOUT")
+        return float(timeout) if timeout else None
+
+    @property
+    def queue_max_concurrent(self) -> int:
+        """Return the maximum number of submissions running at once per namespace. Default is 0, disabling the queue."""
+        return int(self.environ.get("SPARK_CLIENT_QUEUE_MAX_CONCURRENT", "0"))
+
+    @property
+    def queue_priority(self) -> int:
+        """Return the priority of the submissions in the queue, higher priorities being started first. Default is 0."""
+        return int(self.environ.get("SPARK_CLIENT_QUEUE_PRIORITY", "0"))
+
+    @property
+    def queue_file(self) -> str:
+        """Return the SQLite database backing the submission queue."""
+        return self.environ.get(
+            "SPARK_CLIENT_QUEUE_FILE",
+            f"{self.environ.get('SNAP_USER_DATA')}/submissions.db",
+        )
+
+    @property
+    def artifact_cache(self) -> bool:
+        """Return whether spark.jars.packages are resolved into the local artifact cache. Default is disabled."""
+        return self._is_enabled("SPARK_CLIENT_ARTIFACT_CACHE")
+
+    @property
+    def artifact_cache_folder(self) -> str:
+        """Return the folder of the local artifact cache."""
+        return f"{self.environ.get('SNAP_USER_DATA')}/artifacts"
+
+    @property
+    def upload_cache(self) -> bool:
+        """Return whether the local dependencies of cluster-mode submissions are staged by content. Default is disabled."""
+        return self._is_enabled("SPARK_CLIENT_UPLOAD_CACHE")
+
+    @property
+    def pyfiles_folder(self) -> str:
+        """Return the folder of the cached archives of the Python dependencies of the jobs."""
+        return f"{self.environ.get('SNAP_USER_DATA')}/pyfiles"
+
+    @property
+    def pip_cmd(self) -> str:
+        """Return the command running pip to install the Python requirements of the jobs."""
+        return self.environ.get("SPARK_CLIENT_PIP_CMD", "python3 -m pip")
+
+    @property
+    def py_target_version(self) -> Optional[str]:
+        """Return the Python version of the executor image the requirements are installed for, None for the local one."""
+        return self.environ.get("SPARK_CLIENT_PY_TARGET_VERSION", "3.10") or None
+
+    @property
+    def py_target_platforms(self) -> List[str]:
+        """Return the platforms of the executor image the requirements are installed for, empty for the local one."""
+        return [
+            platform.strip()
+            for platform in self.environ.get(
+                "SPARK_CLIENT_PY_TARGET_PLATFORM", "manylinux2014_x86_64"
+            ).split(",")
+            if platform.strip()
+        ]
+
+    @property
+    def autotune(self) -> bool:
+        """Return whether the executors are sized to the nodes and quota of the cluster. Default is disabled."""
+        return self._is_enabled("SPARK_CLIENT_AUTOTUNE")
+
+    @property
+    def agent_socket(self) -> str:
+        """Return the Unix socket the resident spark-client agent listens on."""
+        return f"{self.environ.get('SNAP_USER_DATA')}/agent.sock"
+
+    @property
+    def trace_file(self) -> Optional[str]:
+        """Return the JSON-lines file trace spans are written to, if set by the user."""
+        return self.environ.get("SPARK_CLIENT_TRACE_FILE")
+
+    @property
+    def trace_endpoint(self) -> Optional[str]:
+        """Return the OTLP/HTTP collector endpoint trace spans are sent to, if set by the user."""
+        return self.environ.get("SPARK_CLIENT_TRACE_ENDPOINT")
+
+    @property
+    def trace_sample_ratio(self) -> float:
+        """Return the fraction of the traces to be exported. Default exports all traces."""
+        return float(self.environ.get("SPARK_CLIENT_TRACE_SAMPLE_RATIO", "1.0"))
+
+    @property
+    def metrics_file(self) -> Optional[str]:
+        """Return the Prometheus textfile client-side metrics are accumulated into, if set by the user."""
+        return self.environ.get("SPARK_CLIENT_METRICS_FILE")
+
+    @property
+    def config_dump_limit(self) -> Optional[int]:
+        """Return the maximum number of Spark properties logged on launch. Default logs up to 50, negative logs all."""
+        limit = int(self.environ.get("SPARK_CLIENT_CONFIG_DUMP_LIMIT", "50"))
+        return limit if limit >= 0 else None
+
     @property
     def service_account(self):
         return "spark"
@@ -250,3 +444,28 @@ class ServiceAccount:
     def configurations(self) -> PropertyFile:
         """Return the service account configuration, associated to a given spark service account."""
         return self.extra_confs + self._k8s_configurations
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the service account as a JSON-serializable dictionary."""
+        return {
+            "name": self.name,
+            "namespace": self.namespace,
+            "api_server": self.api_server,
+            "primary": self.primary,
+            "extra_confs": self.extra_confs.props,
+        }
+
+    @classmethod
+    def from_dict(cls, raw: Dict[str, Any]) -> "ServiceAccount":
+        """Return the service account represented by a dictionary built with to_dict.
+
+        Args:
+            raw: dictionary representation of the service account
+        """
+        return cls(
+            name=raw["name"],
+            namespace=raw["namespace"],
+            api_server=raw["api_server"],
+            primary=raw["primary"],
+            extra_confs=PropertyFile(raw["extra_confs"]),
+        )
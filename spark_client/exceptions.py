@@ -14,3 +14,21 @@ class FormatError(SyntaxError):
 class NoResourceFound(FileNotFoundError):
     def __init__(self, resource_name: str):
         self.resource_name = resource_name
+
+
+class AgentUnavailable(ConnectionError):
+    def __init__(self, socket_path: str):
+        self.socket_path = socket_path
+
+
+class ResolutionTimeout(TimeoutError):
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+
+
+class ArtifactResolutionError(Exception):
+    pass
+
+
+class PythonDependencyError(Exception):
+    pass
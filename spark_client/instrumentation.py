@@ -0,0 +1,240 @@
+"""Module for instrumenting spark-client operations, recording their wall time, call counts and bytes parsed."""
+
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional, TextIO, Tuple
+
+Listener = Callable[["Measurement"], None]
+
+_listeners: List[Listener] = []
+_launch_hooks: List[Callable[[], None]] = []
+
+
+@dataclass
+class Measurement:
+    """Class representing a single measured operation."""
+
+    name: str
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    bytes: int = 0
+    start: float = 0.0
+    duration: float = 0.0
+    error: Optional[BaseException] = None
+    timestamp: float = 0.0
+    trace_id: str = ""
+    span_id: str = ""
+    parent_id: Optional[str] = None
+
+    @property
+    def is_root(self) -> bool:
+        """Return whether the operation was not nested within another measured operation."""
+        return self.parent_id is None
+
+
+_current: ContextVar[Optional[Measurement]] = ContextVar(
+    "spark_client_measurement", default=None
+)
+
+
+def add_listener(listener: Listener) -> Listener:
+    """Register a callable invoked with every completed Measurement and return it.
+
+    Args:
+        listener: callable receiving the Measurement once the operation has completed
+    """
+    _listeners.append(listener)
+    return listener
+
+
+def remove_listener(listener: Listener):
+    """Unregister a previously registered listener.
+
+    Args:
+        listener: callable to be removed
+    """
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+
+def add_launch_hook(hook: Callable[[], None]) -> Callable[[], None]:
+    """Register a callable invoked right before control is handed over to Spark and return it.
+
+    Args:
+        hook: callable with no arguments
+    """
+    _launch_hooks.append(hook)
+    return hook
+
+
+def remove_launch_hook(hook: Callable[[], None]):
+    """Unregister a previously registered launch hook.
+
+    Args:
+        hook: callable to be removed
+    """
+    if hook in _launch_hooks:
+        _launch_hooks.remove(hook)
+
+
+_context_launch_hooks: ContextVar[Tuple[Callable[[], None], ...]] = ContextVar(
+    "spark_client_launch_hooks", default=()
+)
+
+
+@contextmanager
+def launch_hook(hook: Callable[[], None]) -> Iterator[None]:
+    """Invoke a callable right before control is handed over to Spark by the launches of the enclosed block only.
+
+    Unlike add_launch_hook, the hook is bound to the current context, hence launches in other threads are ignored.
+
+    Args:
+        hook: callable with no arguments
+    """
+    token = _context_launch_hooks.set(_context_launch_hooks.get() + (hook,))
+    try:
+        yield
+    finally:
+        _context_launch_hooks.reset(token)
+
+
+def notify_launch():
+    """Invoke the registered launch hooks, then the ones bound to the current context."""
+    for hook in list(_launch_hooks) + list(_context_launch_hooks.get()):
+        hook()
+
+
+@contextmanager
+def measure(name: str, **attributes) -> Iterator[Measurement]:
+    """Measure the wall time of the enclosed block and notify the listeners when it completes.
+
+    The yielded Measurement can be used to record the bytes parsed and further attributes. Measurements started
+    within the block are nested below it, sharing its trace id. Nothing is timed when no listener is registered.
+
+    Args:
+        name: name of the operation
+        attributes: extra attributes describing the operation
+    """
+    measurement = Measurement(name, attributes)
+
+    if not _listeners:
+        yield measurement
+        return
+
+    parent = _current.get()
+    measurement.trace_id = (
+        parent.trace_id if parent is not None else os.urandom(16).hex()
+    )
+    measurement.span_id = os.urandom(8).hex()
+    measurement.parent_id = parent.span_id if parent is not None else None
+
+    token = _current.set(measurement)
+    measurement.timestamp = time.time()
+    measurement.start = time.perf_counter()
+    try:
+        yield measurement
+    except BaseException as e:
+        measurement.error = e
+        raise
+    finally:
+        measurement.duration = time.perf_counter() - measurement.start
+        _current.reset(token)
+        for listener in list(_listeners):
+            listener(measurement)
+
+
+def instrumented(name: str) -> Callable:
+    """Return a decorator measuring every call of the decorated function.
+
+    Args:
+        name: name of the operation
+    """
+
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _listeners:
+                return func(*args, **kwargs)
+            with measure(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+@dataclass
+class OperationStats:
+    """Class representing the aggregated statistics of an operation."""
+
+    calls: int = 0
+    errors: int = 0
+    total: float = 0.0
+    max: float = 0.0
+    bytes: int = 0
+
+
+class Profile:
+    """Class aggregating measurements into a per-operation breakdown."""
+
+    def __init__(self):
+        """Initialise an empty profile."""
+        self.stats: Dict[str, OperationStats] = {}
+        self.start_time = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def record(self, measurement: Measurement):
+        """Add a measurement to the profile.
+
+        Args:
+            measurement: completed Measurement
+        """
+        with self._lock:
+            stats = self.stats.setdefault(measurement.name, OperationStats())
+            stats.calls += 1
+            stats.errors += measurement.error is not None
+            stats.total += measurement.duration
+            stats.max = max(stats.max, measurement.duration)
+            stats.bytes += measurement.bytes
+
+    def start(self) -> "Profile":
+        """Start recording measurements."""
+        self.start_time = time.perf_counter()
+        add_listener(self.record)
+        return self
+
+    def stop(self) -> "Profile":
+        """Stop recording measurements."""
+        remove_listener(self.record)
+        return self
+
+    def report(self) -> str:
+        """Return the breakdown as a table, sorted by total time. Times include nested operations."""
+        elapsed = time.perf_counter() - self.start_time
+
+        with self._lock:
+            rows = sorted(self.stats.items(), key=lambda item: -item[1].total)
+
+        header = f"{'operation':<32}{'calls':>7}{'errors':>8}{'total ms':>11}{'mean ms':>10}{'max ms':>10}{'bytes':>11}"
+        lines = [header, "-" * len(header)]
+        for name, stats in rows:
+            lines.append(
+                f"{name:<32}{stats.calls:>7}{stats.errors:>8}{stats.total * 1000:>11.1f}"
+                f"{stats.total * 1000 / stats.calls:>10.1f}{stats.max * 1000:>10.1f}{stats.bytes:>11}"
+            )
+        lines.append("-" * len(header))
+        lines.append(f"{'elapsed':<32}{'':>7}{'':>8}{elapsed * 1000:>11.1f}")
+        return "\n".join(lines)
+
+    def print(self, file: Optional[TextIO] = None):
+        """Print the breakdown.
+
+        Args:
+            file: stream to print to. Default is stderr.
+        """
+        print(self.report(), file=file or sys.stderr, flush=True)
@@ -0,0 +1,283 @@
+"""Module for maintaining client-side metrics in a Prometheus textfile, e.g. for the node-exporter textfile collector."""
+
+import fcntl
+import os
+import re
+import threading
+import time
+from tempfile import NamedTemporaryFile
+from typing import Dict, List, Optional, Tuple
+
+from spark_client.instrumentation import (
+    Measurement,
+    add_launch_hook,
+    add_listener,
+    remove_launch_hook,
+    remove_listener,
+)
+from spark_client.utils import WithLogging
+
+Labels = Tuple[Tuple[str, str], ...]
+Sample = Tuple[str, Labels]
+
+_SAMPLE_PATTERN = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})?\s+(\S+)$")
+_LABEL_PATTERN = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _unescape(value: str) -> str:
+    return re.sub(r"\\(.)", lambda m: "\n" if m.group(1) == "n" else m.group(1), value)
+
+
+def parse_samples(content: str) -> Dict[Sample, float]:
+    """Return the samples contained in a Prometheus text exposition, keyed by metric name and labels.
+
+    Args:
+        content: text in the Prometheus exposition format
+    """
+    samples: Dict[Sample, float] = {}
+    for line in content.splitlines():
+        match = _SAMPLE_PATTERN.match(line.strip())
+        if line.startswith("#") or match is None:
+            continue
+        name, raw_labels, value = match.groups()
+        labels = tuple(
+            sorted(
+                (k, _unescape(v)) for k, v in _LABEL_PATTERN.findall(raw_labels or "")
+            )
+        )
+        samples[(name, labels)] = float(value)
+    return samples
+
+
+class PrometheusTextfileExporter(WithLogging):
+    """Class accumulating counters and histograms of the measured operations into a Prometheus textfile.
+
+    All the metrics are cumulative, so that the file can be shared by many commands: on flush, the values recorded
+    since the previous flush are added to the ones found in the file, which is then atomically replaced.
+    """
+
+    PREFIX = "spark_client"
+    BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+    METRICS = {
+        "kubectl_calls_total": (
+            "counter",
+            "Calls to the K8s API via kubectl, by verb and result (success, throttled, server_error, ...).",
+        ),
+        "registry_operation_seconds": (
+            "histogram",
+            "Latency of the service account registry operations.",
+        ),
+        "resolution_cache_requests_total": (
+            "counter",
+            "Service account resolutions served by the agent cache (hit), by K8s (miss) or by a snapshot (stale).",
+        ),
+        "config_merge_seconds": (
+            "histogram",
+            "Time spent merging the Spark configuration layers.",
+        ),
+        "submission_queue_seconds": (
+            "histogram",
+            "Time spent waiting in the local submission queue, by namespace.",
+        ),
+        "artifact_cache_requests_total": (
+            "counter",
+            "Resolutions of spark.jars.packages served by the artifact cache (hit), populating it (miss) or failed.",
+        ),
+        "upload_cache_requests_total": (
+            "counter",
+            "Local dependencies of cluster-mode submissions already staged (hit) or staged (miss) under the upload path.",
+        ),
+        "prelaunch_seconds": (
+            "histogram",
+            "Time from the start of the command until Spark is started.",
+        ),
+        "command_seconds": (
+            "histogram",
+            "Duration of the spark-client commands, by command and result.",
+        ),
+    }
+
+    def __init__(self, filename: str, command: Optional[str] = None):
+        """Initialise the exporter.
+
+        Args:
+            filename: path of the textfile, e.g. ending with .prom to be picked up by the textfile collector
+            command: name of the command being run, used to label the pre-launch latency
+        """
+        self.filename = filename
+        self.command = command
+        self.start_time = time.perf_counter()
+        self._pending: Dict[Sample, float] = {}
+        self._lock = threading.Lock()
+
+    def _labels(self, **labels: str) -> Labels:
+        return tuple(sorted(labels.items()))
+
+    def _add(self, name: str, labels: Dict[str, str], value: float):
+        key = (f"{self.PREFIX}_{name}", self._labels(**labels))
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0.0) + value
+
+    def _inc(self, name: str, value: float = 1.0, **labels: str):
+        self._add(name, labels, value)
+
+    def _observe(self, name: str, value: float, **labels: str):
+        for bucket in self.BUCKETS + [float("inf")]:
+            if value <= bucket:
+                self._add(
+                    f"{name}_bucket",
+                    dict(labels, le="+Inf" if bucket == float("inf") else str(bucket)),
+                    1.0,
+                )
+        self._add(f"{name}_sum", labels, value)
+        self._add(f"{name}_count", labels, 1.0)
+
+    def record(self, measurement: Measurement):
+        """Update the metrics with a completed measurement.
+
+        Args:
+            measurement: completed Measurement
+        """
+        result = "success" if measurement.error is None else "error"
+
+        if measurement.name == "kubectl":
+            self._inc(
+                "kubectl_calls_total",
+                verb=str(measurement.attributes.get("verb", "unknown")),
+                result=str(measurement.attributes.get("outcome", result)),
+            )
+        elif measurement.name.startswith("registry."):
+            self._observe(
+                "registry_operation_seconds",
+                measurement.duration,
+                operation=measurement.name[len("registry.") :],
+            )
+        elif measurement.name == "account.resolve" and measurement.error is None:
+            self._inc(
+                "resolution_cache_requests_total",
+                result={"agent": "hit", "snapshot": "stale"}.get(
+                    str(measurement.attributes.get("source")), "miss"
+                ),
+            )
+        elif measurement.name == "spark.merge_config":
+            self._observe("config_merge_seconds", measurement.duration)
+        elif measurement.name == "spark.queue":
+            self._observe(
+                "submission_queue_seconds",
+                measurement.duration,
+                namespace=str(measurement.attributes.get("namespace", "unknown")),
+            )
+        elif measurement.name == "artifacts.resolve":
+            self._inc(
+                "artifact_cache_requests_total",
+                result=str(measurement.attributes.get("result", result)),
+            )
+        elif measurement.name == "uploads.stage":
+            self._inc(
+                "upload_cache_requests_total",
+                result=str(measurement.attributes.get("result", result)),
+            )
+        elif measurement.name == "command":
+            self._observe(
+                "command_seconds",
+                measurement.duration,
+                command=str(measurement.attributes.get("command", "unknown")),
+                result=result,
+            )
+
+    def on_launch(self):
+        """Record the pre-launch latency and flush the metrics, right before Spark is started."""
+        self._observe(
+            "prelaunch_seconds",
+            time.perf_counter() - self.start_time,
+            command=self.command or "unknown",
+        )
+        self.flush()
+
+    @staticmethod
+    def _sort_key(sample: Sample) -> Tuple[str, Labels, float]:
+        name, labels = sample
+        le = dict(labels).get("le")
+        return (
+            name,
+            tuple((k, v) for k, v in labels if k != "le"),
+            float(le) if le is not None else 0.0,
+        )
+
+    def _render(self, samples: Dict[Sample, float]) -> str:
+        lines: List[str] = []
+        for metric, (kind, description) in self.METRICS.items():
+            name = f"{self.PREFIX}_{metric}"
+            metric_samples = sorted(
+                (
+                    (key, value)
+                    for key, value in samples.items()
+                    if key[0] == name
+                    or (kind == "histogram" and key[0].startswith(f"{name}_"))
+                ),
+                key=lambda item: self._sort_key(item[0]),
+            )
+            if not metric_samples:
+                continue
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (sample_name, labels), value in metric_samples:
+                formatted_labels = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+                lines.append(
+                    f"{sample_name}{{{formatted_labels}}} {value!r}"
+                    if labels
+                    else f"{sample_name} {value!r}"
+                )
+        return "\n".join(lines) + "\n"
+
+    def flush(self):
+        """Add the values recorded since the previous flush to the textfile, replacing it atomically."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        if not pending:
+            return
+
+        directory = os.path.dirname(os.path.abspath(self.filename))
+
+        try:
+            with open(f"{self.filename}.lock", "w") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+
+                samples: Dict[Sample, float] = {}
+                if os.path.exists(self.filename):
+                    with open(self.filename) as fid:
+                        samples = parse_samples(fid.read())
+
+                for key, value in pending.items():
+                    samples[key] = samples.get(key, 0.0) + value
+
+                with NamedTemporaryFile(
+                    mode="w", dir=directory, prefix=".spark-client-", delete=False
+                ) as t:
+                    t.write(self._render(samples))
+                os.chmod(t.name, 0o644)
+                os.replace(t.name, self.filename)
+        except OSError as e:
+            self.logger.warning(
+                "Could not update metrics file %s: %s", self.filename, e
+            )
+
+    def start(self) -> "PrometheusTextfileExporter":
+        """Start recording measurements."""
+        self.start_time = time.perf_counter()
+        add_listener(self.record)
+        add_launch_hook(self.on_launch)
+        return self
+
+    def stop(self) -> "PrometheusTextfileExporter":
+        """Stop recording measurements and flush the metrics."""
+        remove_listener(self.record)
+        remove_launch_hook(self.on_launch)
+        self.flush()
+        return self
@@ -0,0 +1,279 @@
+"""Module for packaging the Python dependencies of PySpark jobs into archives cached by the hash of their inputs."""
+
+import hashlib
+import os
+import shlex
+import shutil
+import subprocess
+import tarfile
+import zipfile
+from tempfile import NamedTemporaryFile, TemporaryDirectory, mkdtemp
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+from spark_client.domain import PropertyFile
+from spark_client.exceptions import PythonDependencyError
+from spark_client.instrumentation import measure
+from spark_client.utils import WithLogging
+
+DEPENDENCIES_ALIAS = "pydeps"
+
+EXCLUDED_FOLDERS = ("__pycache__",)
+
+EXCLUDED_SUFFIXES = (".pyc", ".pyo")
+
+
+def _source_files(folder: str) -> Iterator[Tuple[str, str]]:
+    """Yield the path and the path relative to the folder of the files to be packaged, in a stable order."""
+    for root, folders, files in os.walk(folder):
+        folders[:] = sorted(
+            f for f in folders if not f.startswith(".") and f not in EXCLUDED_FOLDERS
+        )
+        for name in sorted(files):
+            if not name.startswith(".") and not name.endswith(EXCLUDED_SUFFIXES):
+                path = os.path.join(root, name)
+                yield path, os.path.relpath(path, folder)
+
+
+class PythonPackager(WithLogging):
+    """Class for building the archives of the Python dependencies of PySpark jobs, at most once per content.
+
+    A source folder is zipped, to be shipped with spark.submit.pyFiles. A requirements file is installed with pip into
+    a folder, which is packed into a tar.gz archive to be shipped with spark.archives and added to the PYTHONPATH of
+    the driver and the executors. Archives are stored in the cache folder under the SHA-256 of their inputs, hence
+    unchanged inputs only cost the computation of the hash.
+
+    When a target Python version or platform is given, pip installs the binary wheels matching the executor image
+    rather than the local interpreter, as the archive is extracted and imported by the executors. Missing inputs and
+    failed installations raise a PythonDependencyError.
+    """
+
+    def __init__(
+        self,
+        folder: str,
+        pip_cmd: str = "python3 -m pip",
+        python_version: Optional[str] = None,
+        platforms: Sequence[str] = (),
+    ):
+        """Initialise the packager.
+
+        Args:
+            folder: cache folder of the archives, created on first use
+            pip_cmd: command running pip, used to install the requirements
+            python_version: Python version of the executor image, e.g. 3.10. Default uses the local interpreter.
+            platforms: platforms of the executor image, e.g. manylinux2014_x86_64. Default uses the local platform.
+        """
+        self.folder = folder
+        self.pip_cmd = pip_cmd
+        self.python_version = python_version
+        self.platforms = list(platforms)
+
+    @property
+    def target_args(self) -> List[str]:
+        """Return the pip arguments selecting the wheels of the target Python version and platforms."""
+        if self.python_version is None and not self.platforms:
+            return []
+        return (
+            ["--only-binary=:all:"]
+            + (
+                ["--python-version", self.python_version]
+                if self.python_version is not None
+                else []
+            )
+            + [arg for platform in self.platforms for arg in ["--platform", platform]]
+        )
+
+    def _path(self, *inputs: bytes, name: str) -> str:
+        digest = hashlib.sha256()
+        for value in inputs:
+            digest.update(hashlib.sha256(value).digest())
+        key = digest.hexdigest()
+        return os.path.join(self.folder, key[:2], key, name)
+
+    def _build(self, path: str, build) -> str:
+        """Build the archive at path with the build callable, unless already built, and return the path."""
+        with measure("pyfiles.package", archive=os.path.basename(path)) as m:
+            if os.path.exists(path):
+                m.attributes["result"] = "hit"
+                return path
+
+            m.attributes["result"] = "miss"
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with NamedTemporaryFile(
+                dir=os.path.dirname(path), prefix=".pyfiles-", delete=False
+            ) as t:
+                try:
+                    build(t)
+                except BaseException:
+                    os.remove(t.name)
+                    raise
+            os.chmod(t.name, 0o644)
+            os.replace(t.name, path)
+            self.logger.info("Built %s", path)
+            return path
+
+    def package_sources(self, source_folder: str) -> str:
+        """Return the path of the zip of the Python files of a folder, built if the content changed.
+
+        The content of the folder is at the root of the zip, e.g. src/pkg/module.py is zipped as pkg/module.py.
+
+        Args:
+            source_folder: folder containing the Python packages and modules of the job
+        """
+        if not os.path.isdir(source_folder):
+            raise PythonDependencyError(
+                f"Python source folder {source_folder} does not exist"
+            )
+
+        files = list(_source_files(source_folder))
+
+        inputs = [b"sources"]
+        for path, name in files:
+            with open(path, "rb") as fid:
+                inputs += [name.encode("utf-8"), fid.read()]
+
+        def build(fid):
+            with zipfile.ZipFile(fid, "w", zipfile.ZIP_DEFLATED) as archive:
+                for path, name in files:
+                    archive.write(path, name)
+
+        name = os.path.basename(os.path.normpath(os.path.abspath(source_folder)))
+        return self._build(self._path(*inputs, name=f"{name}.zip"), build)
+
+    def package_requirements(self, requirements_file: str) -> str:
+        """Return the path of the tar.gz of the installed requirements, built if the requirements changed.
+
+        Args:
+            requirements_file: pip requirements file of the job
+        """
+        try:
+            with open(requirements_file, "rb") as fid:
+                requirements = fid.read()
+        except OSError as e:
+            raise PythonDependencyError(
+                f"Could not read the Python requirements file {requirements_file}: {e}"
+            )
+
+        def build(fid):
+            with TemporaryDirectory(prefix="spark-client-pydeps-") as target:
+                try:
+                    subprocess.check_call(
+                        shlex.split(self.pip_cmd)
+                        + [
+                            "install",
+                            "--quiet",
+                            "--no-compile",
+                            "--target",
+                            target,
+                            "--requirement",
+                            os.path.abspath(requirements_file),
+                        ]
+                        + self.target_args
+                    )
+                except (subprocess.CalledProcessError, OSError) as e:
+                    raise PythonDependencyError(
+                        f"Could not install the Python requirements of {requirements_file} with {self.pip_cmd}: {e}"
+                    )
+                with tarfile.open(fileobj=fid, mode="w:gz") as archive:
+                    for name in sorted(os.listdir(target)):
+                        archive.add(os.path.join(target, name), name)
+
+        return self._build(
+            self._path(
+                b"requirements",
+                self.pip_cmd.encode("utf-8"),
+                " ".join(self.target_args).encode("utf-8"),
+                requirements,
+                name=f"{DEPENDENCIES_ALIAS}.tar.gz",
+            ),
+            build,
+        )
+
+    def extract(self, archive: str) -> str:
+        """Return the folder the tar.gz of the installed requirements is extracted to, next to it, extracted once.
+
+        Args:
+            archive: path of the archive, as returned by package_requirements
+        """
+        folder = os.path.join(os.path.dirname(archive), DEPENDENCIES_ALIAS)
+        if os.path.isdir(folder):
+            return folder
+
+        target = mkdtemp(dir=os.path.dirname(archive), prefix=".pyfiles-")
+        try:
+            with measure("pyfiles.extract"), tarfile.open(archive, "r:gz") as fid:
+                fid.extractall(target)
+            os.rename(target, folder)
+        except BaseException:
+            shutil.rmtree(target, ignore_errors=True)
+            # unless extracted concurrently by another submission
+            if not os.path.isdir(folder):
+                raise
+        return folder
+
+
+def _append(value: Optional[str], item: str) -> str:
+    return ",".join(filter(None, [value, item]))
+
+
+def with_python_dependencies(
+    properties: PropertyFile,
+    packager: PythonPackager,
+    source_folder: Optional[str] = None,
+    requirements_file: Optional[str] = None,
+) -> PropertyFile:
+    """Return the properties shipping the archives of the Python dependencies, built or found in the cache.
+
+    The zip of the sources is appended to spark.submit.pyFiles. The archive of the requirements is appended to
+    spark.archives, extracted as pydeps, which is prepended to the PYTHONPATH of the executors and of the driver
+    running in the cluster. A driver running locally imports the requirements from local_driver_pythonpath instead.
+
+    Args:
+        properties: merged properties of the job
+        packager: PythonPackager building the archives
+        source_folder: folder containing the Python packages and modules of the job
+        requirements_file: pip requirements file of the job
+    """
+    props = properties.props
+    updates = {}
+
+    if source_folder is not None:
+        updates["spark.submit.pyFiles"] = _append(
+            props.get("spark.submit.pyFiles"), packager.package_sources(source_folder)
+        )
+
+    if requirements_file is not None:
+        archive = packager.package_requirements(requirements_file)
+        updates["spark.archives"] = _append(
+            props.get("spark.archives"), f"{archive}#{DEPENDENCIES_ALIAS}"
+        )
+        for key in [
+            "spark.executorEnv.PYTHONPATH",
+            "spark.kubernetes.driverEnv.PYTHONPATH",
+        ]:
+            updates[key] = ":".join(
+                filter(None, [f"./{DEPENDENCIES_ALIAS}", props.get(key)])
+            )
+
+    return properties + PropertyFile(updates) if updates else properties
+
+
+def local_driver_pythonpath(packager: PythonPackager, requirements_file: str) -> str:
+    """Return the PYTHONPATH of a driver running locally, i.e. in client mode, importing the requirements of the job.
+
+    The requirements are installed for the local interpreter, whatever the target of the packager, as the driver is
+    not run by the executor image.
+
+    Args:
+        packager: PythonPackager building the archives
+        requirements_file: pip requirements file of the job
+    """
+    local = PythonPackager(packager.folder, packager.pip_cmd)
+    return ":".join(
+        filter(
+            None,
+            [
+                local.extract(local.package_requirements(requirements_file)),
+                os.environ.get("PYTHONPATH"),
+            ],
+        )
+    )
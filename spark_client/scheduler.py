@@ -0,0 +1,156 @@
+"""Module for queueing the local submissions, bounding the number of submissions running at once per namespace."""
+
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from spark_client.instrumentation import measure
+from spark_client.utils import WithLogging
+
+
+def _start_time(pid: int) -> Optional[int]:
+    """Return the start time of a process in clock ticks since boot, None if it cannot be read, e.g. out of Linux."""
+    try:
+        with open(f"/proc/{pid}/stat") as fid:
+            stat = fid.read()
+        # the name of the command, the second field, may contain spaces and parentheses
+        return int(stat.rsplit(")", 1)[1].split()[19])
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def _is_alive(pid: int, started: Optional[int] = None) -> bool:
+    """Return whether a process is running, and is the one started at the given time when known."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return started is None or _start_time(pid) in (None, started)
+
+
+class SubmissionScheduler(WithLogging):
+    """Class for a local queue of submissions, backed by a SQLite database shared by the local processes.
+
+    At most max_concurrent submissions run at the same time in a namespace, the others waiting in the queue. Waiting
+    submissions are started by decreasing priority, then in order of arrival. The entries of processes that are no
+    longer alive are discarded, so that a crashed process does not hold its slot. Processes are identified by their
+    pid and start time, hence an entry whose pid has been reused by another process is discarded as well.
+    """
+
+    def __init__(self, filename: str, max_concurrent: int, poll_interval: float = 0.5):
+        """Initialise the scheduler.
+
+        Args:
+            filename: path of the SQLite database, created on first use
+            max_concurrent: maximum number of submissions running at the same time in a namespace
+            poll_interval: seconds between two checks of the queue while waiting
+        """
+        self.filename = filename
+        self.max_concurrent = max(max_concurrent, 1)
+        self.poll_interval = poll_interval
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(os.path.abspath(self.filename)), exist_ok=True)
+        connection = sqlite3.connect(self.filename, timeout=30, isolation_level=None)
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS submissions ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "namespace TEXT NOT NULL, "
+            "priority INTEGER NOT NULL, "
+            "pid INTEGER NOT NULL, "
+            "started INTEGER, "
+            "running INTEGER NOT NULL DEFAULT 0, "
+            "enqueued REAL NOT NULL)"
+        )
+        return connection
+
+    def _try_start(self, connection: sqlite3.Connection, entry_id: int) -> bool:
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for other_id, pid, started in connection.execute(
+                "SELECT id, pid, started FROM submissions"
+            ).fetchall():
+                if not _is_alive(pid, started):
+                    connection.execute(
+                        "DELETE FROM submissions WHERE id = ?", (other_id,)
+                    )
+
+            (namespace,) = connection.execute(
+                "SELECT namespace FROM submissions WHERE id = ?", (entry_id,)
+            ).fetchone()
+            (running,) = connection.execute(
+                "SELECT COUNT(*) FROM submissions WHERE namespace = ? AND running = 1",
+                (namespace,),
+            ).fetchone()
+            (head,) = connection.execute(
+                "SELECT id FROM submissions WHERE namespace = ? AND running = 0 "
+                "ORDER BY priority DESC, id LIMIT 1",
+                (namespace,),
+            ).fetchone()
+
+            started = running < self.max_concurrent and head == entry_id
+            if started:
+                connection.execute(
+                    "UPDATE submissions SET running = 1 WHERE id = ?", (entry_id,)
+                )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return started
+
+    @contextmanager
+    def slot(self, namespace: str, priority: int = 0) -> Iterator[float]:
+        """Wait for a free slot in the namespace and hold it within the enclosed block, yielding the time waited.
+
+        The wait is measured as the spark.queue operation, separately from the time spent running the submission.
+
+        Args:
+            namespace: namespace of the service account the submission runs with
+            priority: priority of the submission. Submissions with a higher priority are started first.
+        """
+        connection = self._connect()
+        try:
+            with measure("spark.queue", namespace=namespace, priority=priority):
+                start = time.monotonic()
+                entry_id = connection.execute(
+                    "INSERT INTO submissions (namespace, priority, pid, started, enqueued) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (
+                        namespace,
+                        priority,
+                        os.getpid(),
+                        _start_time(os.getpid()),
+                        time.time(),
+                    ),
+                ).lastrowid
+                if entry_id is None:
+                    raise sqlite3.DatabaseError("Could not enqueue the submission")
+
+                try:
+                    while not self._try_start(connection, entry_id):
+                        time.sleep(self.poll_interval)
+                except BaseException:
+                    connection.execute(
+                        "DELETE FROM submissions WHERE id = ?", (entry_id,)
+                    )
+                    raise
+
+                waited = time.monotonic() - start
+
+            self.logger.info(
+                "Waited %.1fs in the submission queue of namespace %s",
+                waited,
+                namespace,
+            )
+
+            try:
+                yield waited
+            finally:
+                connection.execute("DELETE FROM submissions WHERE id = ?", (entry_id,))
+        finally:
+            connection.close()
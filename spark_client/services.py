@@ -1,18 +1,50 @@
 import base64
+import json
+import logging
 import os
+import shlex
 import subprocess
+import sys
+import threading
+import time
 from abc import ABC, abstractmethod
+from contextlib import nullcontext
+from dataclasses import replace
 from enum import Enum
 from functools import cached_property
-from typing import Any, Callable, Dict, List, Optional, Union
-
-import yaml
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Union,
+)
+from urllib.parse import urlencode
 
-from spark_client.domain import Defaults, PropertyFile, ServiceAccount
+from spark_client.domain import (
+    Defaults,
+    LazyPropertyFile,
+    PropertyFile,
+    ServiceAccount,
+)
 from spark_client.exceptions import FormatError, NoAccountFound, NoResourceFound
+from spark_client.instrumentation import instrumented, measure, notify_launch
+from spark_client.throttling import (
+    SUCCESS,
+    TIMEOUT,
+    RetryPolicy,
+    TokenBucket,
+    classify_error,
+    time_left,
+)
 from spark_client.utils import (
     WithLogging,
-    environ,
+    expand_vars,
     listify,
     parse_yaml_shell_output,
     umask_named_temporary_file,
@@ -27,6 +59,8 @@ class KubeInterface(WithLogging):
         kube_config_file: Union[str, Dict[str, Any]],
         context_name: Optional[str] = None,
         kubectl_cmd: str = "kubectl",
+        rate_limiter: Optional[TokenBucket] = None,
+        retry_policy: Optional[RetryPolicy] = None,
     ):
         """Initialise a KubeInterface class from a kube config file.
 
@@ -34,10 +68,27 @@ class KubeInterface(WithLogging):
             kube_config_file: kube config path
             context_name: name of the context to be used
             kubectl_cmd: path to the kubectl command to be used to interact with the K8s API
+            rate_limiter: token bucket every kubectl call takes a token from, shared by the KubeInterface objects
+                          derived from this one. Default does not limit the rate of the calls.
+            retry_policy: timeout and retries of the kubectl calls. Default retries throttled calls, and failed calls
+                          of idempotent verbs, up to 4 attempts without timeout.
         """
         self.kube_config_file = kube_config_file
         self._context_name = context_name
         self.kubectl_cmd = kubectl_cmd
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy or RetryPolicy()
+        self._lists: Dict[str, List[Dict[str, Any]]] = {}
+        self._lists_lock = threading.Lock()
+
+    def _derive(self, context_name: Optional[str], kubectl_cmd: str):
+        return KubeInterface(
+            self.kube_config_file,
+            context_name,
+            kubectl_cmd,
+            rate_limiter=self.rate_limiter,
+            retry_policy=self.retry_policy,
+        )
 
     def with_context(self, context_name: str):
         """Return a new KubeInterface object using a different context.
@@ -45,7 +96,11 @@ class KubeInterface(WithLogging):
         Args:
             context_name: context to be used
         """
-        return KubeInterface(self.kube_config_file, context_name, self.kubectl_cmd)
+        return self._derive(context_name, self.kubectl_cmd)
+
+    def reloaded(self):
+        """Return a new KubeInterface object with the same settings, reading the kube config file afresh."""
+        return self._derive(self._context_name, self.kubectl_cmd)
 
     def with_kubectl_cmd(self, kubectl_cmd: str):
         """Return a new KubeInterface object using a different kubectl command.
@@ -53,14 +108,21 @@ class KubeInterface(WithLogging):
         Args:
             kubectl_cmd: path to the kubectl command to be used
         """
-        return KubeInterface(self.kube_config_file, self.context_name, kubectl_cmd)
+        return self._derive(self.context_name, kubectl_cmd)
 
     @cached_property
     def kube_config(self) -> Dict[str, Any]:
         """Return the kube config file parsed as a dictionary"""
         if isinstance(self.kube_config_file, str):
-            with open(self.kube_config_file, "r") as fid:
-                return yaml.safe_load(fid)
+            with measure("kubeconfig.parse") as m, open(
+                self.kube_config_file, "r"
+            ) as fid:
+                content = fid.read()
+                m.bytes = len(content)
+
+                import yaml
+
+                return yaml.safe_load(content)
         else:
             return self.kube_config_file
 
@@ -111,6 +173,56 @@ class KubeInterface(WithLogging):
         """Return current admin user."""
         return self.context.get("user", "default")
 
+    def _check_output(self, cmd: str, verb: str) -> bytes:
+        """Run a kubectl command and return its output, rate limited and retried according to the retry policy.
+
+        Each attempt is measured as a kubectl operation, whose attributes report the attempt number and its outcome.
+        The error output of a failed call is forwarded to stderr, unless the call is retried. kubectl is run without
+        a shell, so that a call timing out kills kubectl itself.
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            outcome, stderr = SUCCESS, b""
+
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+
+            self.logger.debug("Executing command: %s", cmd)
+
+            try:
+                with measure("kubectl", verb=verb, attempt=attempt) as m:
+                    try:
+                        raw = subprocess.check_output(
+                            shlex.split(cmd),
+                            stderr=subprocess.PIPE,
+                            timeout=time_left(self.retry_policy.timeout),
+                        )
+                        m.bytes = len(raw)
+                    except subprocess.TimeoutExpired as e:
+                        outcome, stderr = TIMEOUT, e.stderr or b""
+                        raise
+                    except subprocess.CalledProcessError as e:
+                        outcome, stderr = classify_error(e.stderr), e.stderr or b""
+                        raise
+                    finally:
+                        m.attributes["outcome"] = outcome
+            except (subprocess.TimeoutExpired, subprocess.CalledProcessError):
+                if (
+                    not self.retry_policy.should_retry(verb, outcome, attempt)
+                    or time_left() == 0
+                ):
+                    sys.stderr.write(stderr.decode("utf-8", errors="replace"))
+                    raise
+                delay = self.retry_policy.delay(attempt)
+                self.logger.debug(
+                    "kubectl %s failed (%s), retrying in %.2fs", verb, outcome, delay
+                )
+                time.sleep(delay)
+                continue
+
+            return raw
+
     def exec(
         self,
         cmd: str,
@@ -136,14 +248,14 @@ class KubeInterface(WithLogging):
 
         base_cmd += f"{cmd} -o {output or 'yaml'} "
 
-        self.logger.debug(f"Executing command: {base_cmd}")
+        raw = self._check_output(base_cmd, cmd.split()[0])
+
+        import yaml
 
         return (
-            parse_yaml_shell_output(base_cmd)
+            yaml.safe_load(raw.decode("utf-8"))
             if (output is None) or (output == "yaml")
-            else subprocess.check_output(base_cmd, shell=True, stderr=None).decode(
-                "utf-8"
-            )
+            else raw.decode("utf-8")
         )
 
     def get_service_accounts(
@@ -170,31 +282,163 @@ class KubeInterface(WithLogging):
 
         return all_service_accounts_raw["items"]
 
+    def _raw_cmd(self, path: str, params: Dict[str, Any]) -> str:
+        query = urlencode({k: v for k, v in params.items() if v is not None})
+        url = f"{path}?{query}" if query else path
+
+        return (
+            f"{self.kubectl_cmd} --kubeconfig {self.kube_config_file} "
+            f" --context {self.context_name} get --raw '{url}'"
+        )
+
+    def get_raw(self, path: str, **params) -> Dict[str, Any]:
+        """Execute a GET request against the K8s API and return the JSON response as a dictionary.
+
+        Args:
+            path: API path to be requested, e.g. /api/v1/serviceaccounts
+            params: query parameters to be appended to the request. Parameters set to None are dropped.
+        """
+        return json.loads(self._check_output(self._raw_cmd(path, params), "get"))
+
+    def iter_pages(
+        self, path: str, limit: int = 500, **params
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield the pages of a K8s API list request, following the continue token returned by the server.
+
+        Args:
+            path: API path to be listed, e.g. /api/v1/serviceaccounts
+            limit: maximum number of items fetched per request
+            params: query parameters to be appended to each request. Parameters set to None are dropped.
+        """
+        continue_token = None
+        while True:
+            page = self.get_raw(
+                path, limit=limit, **params, **{"continue": continue_token}
+            )
+
+            yield page
+
+            continue_token = (page.get("metadata") or {}).get("continue")
+            if not continue_token:
+                break
+
+    def list_items(self, path: str) -> List[Dict[str, Any]]:
+        """Return the items of a K8s API list request, across all its pages.
+
+        Args:
+            path: API path to be listed, e.g. /api/v1/nodes
+        """
+        return [item for page in self.iter_pages(path) for item in page["items"]]
+
+    def list_cached(self, path: str) -> List[Dict[str, Any]]:
+        """Return the items of a K8s API list request, requested only once per KubeInterface object.
+
+        Args:
+            path: API path to be listed, e.g. /api/v1/nodes
+        """
+        with self._lists_lock:
+            if path not in self._lists:
+                self._lists[path] = self.list_items(path)
+            return self._lists[path]
+
+    def watch_raw(self, path: str, **params) -> Iterator[Dict[str, Any]]:
+        """Watch a K8s API collection and yield the events as they are received.
+
+        The iterator terminates when the server closes the watch, e.g. once timeoutSeconds has elapsed. A
+        CalledProcessError is raised once the events received are yielded, if kubectl failed.
+
+        Args:
+            path: API path to be watched, e.g. /api/v1/serviceaccounts
+            params: query parameters to be appended to the request. Parameters set to None are dropped.
+        """
+        cmd = self._raw_cmd(path, {**params, "watch": "true"})
+
+        self.logger.debug("Executing command: %s", cmd)
+
+        with subprocess.Popen(
+            shlex.split(cmd), stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        ) as process:
+            # stderr is drained in the background, so that a chatty kubectl cannot fill the pipe and block the watch
+            stderr_chunks: List[bytes] = []
+            drain = threading.Thread(
+                target=lambda: stderr_chunks.extend(process.stderr or []),
+                daemon=True,
+            )
+            drain.start()
+            try:
+                for line in process.stdout or []:
+                    if line.strip():
+                        yield json.loads(line)
+            except BaseException:
+                process.kill()
+                raise
+            finally:
+                returncode = process.wait()
+                drain.join()
+
+        if returncode != 0:
+            raise subprocess.CalledProcessError(
+                returncode, cmd, stderr=b"".join(stderr_chunks)
+            )
+
+    def iter_service_accounts(
+        self,
+        namespace: Optional[str] = None,
+        labels: Optional[List[str]] = None,
+        name: Optional[str] = None,
+        limit: int = 500,
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield service accounts, represented as dictionary, fetching them from the API server in pages.
+
+        Args:
+            namespace: namespace where to list the service accounts. Default is to None, which will return all service
+                       account in all namespaces
+            labels: label selectors, applied server-side, that the service accounts must match.
+            name: name of the service account, applied server-side as a field selector.
+            limit: maximum number of service accounts fetched per request.
+        """
+        path = (
+            "/api/v1/serviceaccounts"
+            if namespace is None
+            else f"/api/v1/namespaces/{namespace}/serviceaccounts"
+        )
+
+        for page in self.iter_pages(
+            path,
+            limit=limit,
+            labelSelector=",".join(labels) if labels else None,
+            fieldSelector=f"metadata.name={name}" if name else None,
+        ):
+            yield from page.get("items") or []
+
+    @staticmethod
+    @instrumented("secret.decode")
+    def decode_secret_data(data: Dict[str, str]) -> Dict[str, str]:
+        """Return the base64 encoded data of a secret decoded as utf-8 strings.
+
+        Args:
+            data: data field of a K8s secret
+        """
+        return {k: base64.b64decode(v).decode("utf-8") for k, v in data.items()}
+
     def get_secret(self, secret_name: str, namespace: str) -> Dict[str, Any]:
         """Return the data contained in the specified secret.
 
+        Raises NoResourceFound if the secret does not exist, while the errors of kubectl are re-raised.
+
         Args:
             secret_name: name of the secret
             namespace: namespace where the secret is contained
         """
 
-        try:
-            secret = self.exec(
-                f"get secret {secret_name} --ignore-not-found", namespace=namespace
-            )
-        except Exception:
-            raise NoResourceFound(secret_name)
+        secret = self.exec(
+            f"get secret {secret_name} --ignore-not-found", namespace=namespace
+        )
 
         if secret is None or len(secret) == 0 or isinstance(secret, str):
             raise NoResourceFound(secret_name)
 
-        result = dict()
-        for k, v in secret["data"].items():
-            # k1 = k.replace(".", "\\.")
-            # value = self.kube_interface.exec(f"get secret {secret_name}", output=f"jsonpath='{{.data.{k1}}}'")
-            result[k] = base64.b64decode(v).decode("utf-8")
-
-        secret["data"] = result
+        secret["data"] = self.decode_secret_data(secret["data"])
         return secret
 
     def set_label(
@@ -279,7 +523,7 @@ class KubeInterface(WithLogging):
             for cluster in self.kube_config["clusters"]
         }
 
-        self.logger.debug(f"Clusters API: {dict(api_servers_clusters)}")
+        self.logger.debug("Clusters API: %s", api_servers_clusters)
 
         contexts_for_api_server = [
             _context["name"]
@@ -290,9 +534,12 @@ class KubeInterface(WithLogging):
         if len(contexts_for_api_server) == 0:
             raise NoAccountFound(master)
 
-        self.logger.info(
-            f"Contexts on api server {master}: {', '.join(contexts_for_api_server)}"
-        )
+        if self.logger.isEnabledFor(logging.INFO):
+            self.logger.info(
+                "Contexts on api server %s: %s",
+                master,
+                ", ".join(contexts_for_api_server),
+            )
 
         return (
             self
@@ -346,8 +593,33 @@ class AbstractServiceAccountRegistry(WithLogging, ABC):
         """
         pass
 
-    def _retrieve_account(self, condition: Callable[[ServiceAccount], bool]):
-        all_accounts = self.all()
+    def stream(
+        self,
+        namespace: Optional[str] = None,
+        name: Optional[str] = None,
+        primary_only: bool = False,
+    ) -> Iterator[ServiceAccount]:
+        """Yield the existing service accounts matching the provided filters.
+
+        Args:
+            namespace: only yield service accounts in this namespace
+            name: only yield service accounts with this name
+            primary_only: only yield primary service accounts
+        """
+        for account in self.all():
+            if (
+                (namespace is None or account.namespace == namespace)
+                and (name is None or account.name == name)
+                and (not primary_only or account.primary is True)
+            ):
+                yield account
+
+    def _retrieve_account(
+        self,
+        condition: Callable[[ServiceAccount], bool],
+        accounts: Optional[Iterable[ServiceAccount]] = None,
+    ):
+        all_accounts = list(self.all() if accounts is None else accounts)
 
         if len(all_accounts) == 0:
             raise NoAccountFound(
@@ -372,24 +644,54 @@ class AbstractServiceAccountRegistry(WithLogging, ABC):
 
         return primary_accounts[0]
 
+    @instrumented("registry.get_primary")
     def get_primary(self) -> Optional[ServiceAccount]:
         """Return the primary service account. None is there is no primary service account."""
         try:
-            return self._retrieve_account(lambda account: account.primary is True)
+            return self._retrieve_account(
+                lambda account: account.primary is True,
+                self.stream(primary_only=True),
+            )
         except NoAccountFound:
             return None
 
+    @instrumented("registry.get")
     def get(self, account_id: str) -> Optional[ServiceAccount]:
         """Return the service account associated with the provided account id. None if no account was found.
 
         Args:
             account_id: account id to be used for retrieving the service account.
         """
+        namespace, _, name = account_id.partition(":")
+        if not namespace or not name or ":" in name:
+            return None
+
         try:
-            return self._retrieve_account(lambda account: account.id == account_id)
+            return self._retrieve_account(
+                lambda account: account.id == account_id,
+                self.stream(namespace=namespace, name=name),
+            )
         except NoAccountFound:
             return None
 
+    def resolve(
+        self, username: Optional[str] = None, namespace: Optional[str] = None
+    ) -> Optional[ServiceAccount]:
+        """Return the service account to be used for the provided username and namespace. None if no account was found.
+
+        The primary account is returned when neither username nor namespace are provided, otherwise the missing one
+        defaults to 'spark' or 'default' respectively.
+
+        Args:
+            username: name of the service account
+            namespace: namespace of the service account
+        """
+        return (
+            self.get_primary()
+            if username is None and namespace is None
+            else self.get(f"{namespace or 'default'}:{username or 'spark'}")
+        )
+
 
 class K8sServiceAccountRegistry(AbstractServiceAccountRegistry):
     """Class implementing a ServiceAccountRegistry, based on K8s."""
@@ -399,16 +701,36 @@ class K8sServiceAccountRegistry(AbstractServiceAccountRegistry):
 
     SPARK_MANAGER_LABEL = "app.kubernetes.io/managed-by"
     PRIMARY_LABEL = "app.kubernetes.io/spark-client-primary"
+    PAGE_SIZE = 500
 
+    @instrumented("registry.all")
     def all(self) -> List["ServiceAccount"]:
         """Return all existing service accounts."""
-        service_accounts = self.kube_interface.get_service_accounts(
-            labels=[f"{self.SPARK_MANAGER_LABEL}=spark-client"]
-        )
-        return [
-            self._build_service_account_from_raw(raw["metadata"])
-            for raw in service_accounts
-        ]
+        return list(self.stream())
+
+    def stream(
+        self,
+        namespace: Optional[str] = None,
+        name: Optional[str] = None,
+        primary_only: bool = False,
+    ) -> Iterator[ServiceAccount]:
+        """Yield the existing service accounts matching the provided filters, as they are fetched page by page.
+
+        Filters are applied server-side as label and field selectors.
+
+        Args:
+            namespace: only yield service accounts in this namespace
+            name: only yield service accounts with this name
+            primary_only: only yield primary service accounts
+        """
+        labels = [f"{self.SPARK_MANAGER_LABEL}=spark-client"]
+        if primary_only:
+            labels.append(self.PRIMARY_LABEL)
+
+        for raw in self.kube_interface.iter_service_accounts(
+            namespace=namespace, labels=labels, name=name, limit=self.PAGE_SIZE
+        ):
+            yield self._build_service_account_from_raw(raw["metadata"])
 
     @staticmethod
     def _get_secret_name(name):
@@ -420,10 +742,11 @@ class K8sServiceAccountRegistry(AbstractServiceAccountRegistry):
         secret_name = self._get_secret_name(name)
 
         try:
-            secret = self.kube_interface.get_secret(secret_name, namespace=namespace)[
-                "data"
-            ]
-        except Exception:
+            with measure("secret.fetch", account=f"{namespace}:{name}"):
+                secret = self.kube_interface.get_secret(
+                    secret_name, namespace=namespace
+                )["data"]
+        except NoResourceFound:
             return PropertyFile.empty()
 
         return PropertyFile(secret)
@@ -438,9 +761,12 @@ class K8sServiceAccountRegistry(AbstractServiceAccountRegistry):
             namespace=namespace,
             primary=primary,
             api_server=self.kube_interface.api_server,
-            extra_confs=self._retrieve_account_configurations(name, namespace),
+            extra_confs=LazyPropertyFile(
+                lambda: self._retrieve_account_configurations(name, namespace).props
+            ),
         )
 
+    @instrumented("registry.set_primary")
     def set_primary(self, account_id: str) -> str:
         """Set the primary account to the one related to the provided account id.
 
@@ -485,6 +811,7 @@ class K8sServiceAccountRegistry(AbstractServiceAccountRegistry):
 
         return account_id
 
+    @instrumented("registry.create")
     def create(self, service_account: ServiceAccount) -> str:
         """Create a new service account and return ids associated id.
 
@@ -554,7 +881,7 @@ class K8sServiceAccountRegistry(AbstractServiceAccountRegistry):
             mode="w", prefix="spark-dynamic-conf-k8s-", suffix=".conf"
         ) as t:
             self.logger.debug(
-                f"Spark dynamic props available for reference at {t.name}\n"
+                "Spark dynamic props available for reference at %s", t.name
             )
 
             service_account.extra_confs.write(t.file)
@@ -568,6 +895,14 @@ class K8sServiceAccountRegistry(AbstractServiceAccountRegistry):
                 **{"from-env-file": str(t.name)},
             )
 
+        self.kube_interface.set_label(
+            "secret",
+            secret_name,
+            f"{self.SPARK_MANAGER_LABEL}=spark-client",
+            namespace=service_account.namespace,
+        )
+
+    @instrumented("registry.set_configurations")
     def set_configurations(self, account_id: str, configurations: PropertyFile) -> str:
         """Set a new service account configuration for the provided service account id.
 
@@ -589,6 +924,7 @@ class K8sServiceAccountRegistry(AbstractServiceAccountRegistry):
 
         return account_id
 
+    @instrumented("registry.delete")
     def delete(self, account_id: str) -> str:
         """Delete the service account associated with the provided id.
 
@@ -649,7 +985,7 @@ class InMemoryAccountRegistry(AbstractServiceAccountRegistry):
             for account_id, account in self.cache.items():
                 if account.primary is True:
                     self.logger.debug(
-                        f"Setting primary of account {account.id} to False"
+                        "Setting primary of account %s to False", account.id
                     )
                     account.primary = False
 
@@ -678,7 +1014,7 @@ class InMemoryAccountRegistry(AbstractServiceAccountRegistry):
             for account in self.cache.values():
                 if account.primary is True:
                     self.logger.debug(
-                        f"Setting primary of account {account.id} to False"
+                        "Setting primary of account %s to False", account.id
                     )
                     account.primary = False
 
@@ -700,56 +1036,348 @@ class InMemoryAccountRegistry(AbstractServiceAccountRegistry):
         return account_id
 
 
+class WatchedK8sServiceAccountRegistry(InMemoryAccountRegistry):
+    """Class implementing a ServiceAccountRegistry that mirrors the K8s spark service accounts in memory.
+
+    The mirror is populated by an initial list and then kept up to date by watching service accounts and their
+    configuration secrets, so that reads never hit the API server. Writes are delegated to a K8sServiceAccountRegistry
+    and reflected in the mirror once the corresponding watch events are received.
+    """
+
+    SERVICE_ACCOUNTS = "serviceaccounts"
+    SECRETS = "secrets"
+
+    RETRY_BASE_DELAY = 1.0
+    RETRY_MAX_DELAY = 30.0
+
+    def __init__(self, kube_interface: KubeInterface, timeout_seconds: int = 300):
+        """Initialise the mirror, listing the service accounts and their configuration secrets.
+
+        Args:
+            kube_interface: KubeInterface used to list and watch the K8s resources
+            timeout_seconds: duration after which the server closes each watch, which is then re-established
+        """
+        self.registry = K8sServiceAccountRegistry(kube_interface)
+        self.kube_interface = kube_interface
+        self.timeout_seconds = timeout_seconds
+
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._secrets: Dict[str, Dict[str, str]] = {}
+        self._resource_versions: Dict[str, Optional[str]] = {}
+
+        super().__init__(cache={})
+
+        self.resync(self.SECRETS)
+        self.resync(self.SERVICE_ACCOUNTS)
+
+    @property
+    def _label_selector(self) -> str:
+        return f"{K8sServiceAccountRegistry.SPARK_MANAGER_LABEL}=spark-client"
+
+    def _secret_key(self, namespace: str, name: str) -> str:
+        return f"{namespace}:{self.registry._get_secret_name(name)}"
+
+    def _with_mirrored_configurations(self, account: ServiceAccount) -> ServiceAccount:
+        key = self._secret_key(account.namespace, account.name)
+        if key not in self._secrets:
+            # Configuration secrets created before they were labelled are not mirrored, hence lazily retrieved
+            return account
+        return replace(account, extra_confs=PropertyFile(dict(self._secrets[key])))
+
+    def _apply_service_account(self, event_type: str, raw: Dict[str, Any]):
+        metadata = raw["metadata"]
+        account_id = f"{metadata['namespace']}:{metadata['name']}"
+
+        if event_type == "DELETED":
+            self.cache.pop(account_id, None)
+        else:
+            self.cache[account_id] = self._with_mirrored_configurations(
+                self.registry._build_service_account_from_raw(metadata)
+            )
+
+    def _apply_secret(self, event_type: str, raw: Dict[str, Any]):
+        metadata = raw["metadata"]
+        key = f"{metadata['namespace']}:{metadata['name']}"
+
+        if event_type == "DELETED":
+            self._secrets.pop(key, None)
+        else:
+            self._secrets[key] = KubeInterface.decode_secret_data(raw.get("data") or {})
+
+        for account_id, account in self.cache.items():
+            if self._secret_key(account.namespace, account.name) == key:
+                self.cache[account_id] = (
+                    self._with_mirrored_configurations(account)
+                    if event_type != "DELETED"
+                    else replace(account, extra_confs=PropertyFile.empty())
+                )
+
+    def _apply(self, kind: str, event_type: str, raw: Dict[str, Any]):
+        if kind == self.SERVICE_ACCOUNTS:
+            self._apply_service_account(event_type, raw)
+        else:
+            self._apply_secret(event_type, raw)
+
+    def resync(self, kind: str):
+        """List all resources of the given kind and replace their mirrored state.
+
+        Args:
+            kind: either "serviceaccounts" or "secrets"
+        """
+        items: List[Dict[str, Any]] = []
+        resource_version = None
+
+        for page in self.kube_interface.iter_pages(
+            f"/api/v1/{kind}",
+            limit=K8sServiceAccountRegistry.PAGE_SIZE,
+            labelSelector=self._label_selector,
+        ):
+            items.extend(page.get("items") or [])
+            resource_version = (page.get("metadata") or {}).get("resourceVersion")
+
+        with self._lock:
+            if kind == self.SERVICE_ACCOUNTS:
+                self.cache.clear()
+            else:
+                self._secrets.clear()
+
+            for raw in items:
+                self._apply(kind, "ADDED", raw)
+
+            self._resource_versions[kind] = resource_version
+
+        self.logger.debug(
+            "Resynced %d %s at resource version %s", len(items), kind, resource_version
+        )
+
+        if kind == self.SERVICE_ACCOUNTS:
+            self._consistency_check()
+
+    def watch_once(self, kind: str) -> bool:
+        """Apply the events of a single watch on the given kind, until the server closes it or the mirror is stopped.
+
+        The mirror is resynced if the watch fails or expires, e.g. with a 410 Gone error event. Return whether the
+        watch completed without failing.
+
+        Args:
+            kind: either "serviceaccounts" or "secrets"
+        """
+        try:
+            for event in self.kube_interface.watch_raw(
+                f"/api/v1/{kind}",
+                labelSelector=self._label_selector,
+                resourceVersion=self._resource_versions.get(kind),
+                timeoutSeconds=self.timeout_seconds,
+                allowWatchBookmarks="true",
+            ):
+                if self._stop.is_set():
+                    return True
+
+                event_type, raw = event["type"], event["object"]
+
+                if event_type == "ERROR":
+                    self.logger.info(
+                        "Watch on %s expired: %s. Resyncing.", kind, raw.get("message")
+                    )
+                    self.resync(kind)
+                    return True
+
+                with self._lock:
+                    if event_type != "BOOKMARK":
+                        self._apply(kind, event_type, raw)
+                    self._resource_versions[kind] = raw["metadata"].get(
+                        "resourceVersion"
+                    )
+        except subprocess.CalledProcessError as e:
+            self.logger.warning("Watch on %s failed: %s. Resyncing.", kind, e)
+            self.resync(kind)
+            return False
+
+        return True
+
+    def start(self) -> "WatchedK8sServiceAccountRegistry":
+        """Start background threads keeping the mirror up to date.
+
+        Failed watches and resyncs are retried with an exponential backoff, up to RETRY_MAX_DELAY seconds.
+        """
+        self._stop.clear()
+
+        def loop(kind: str):
+            failures = 0
+            while not self._stop.is_set():
+                try:
+                    failures = 0 if self.watch_once(kind) else failures + 1
+                except Exception as e:
+                    failures += 1
+                    self.logger.error("Could not mirror %s: %s", kind, e)
+
+                if failures:
+                    self._stop.wait(
+                        min(
+                            self.RETRY_BASE_DELAY * 2 ** (failures - 1),
+                            self.RETRY_MAX_DELAY,
+                        )
+                    )
+
+        self._threads = [
+            threading.Thread(target=loop, args=(kind,), daemon=True)
+            for kind in [self.SECRETS, self.SERVICE_ACCOUNTS]
+        ]
+        for thread in self._threads:
+            thread.start()
+
+        return self
+
+    def stop(self):
+        """Stop the background threads. Events already received keep being ignored."""
+        self._stop.set()
+
+    def all(self) -> List["ServiceAccount"]:
+        """Return all existing service accounts."""
+        with self._lock:
+            return list(self.cache.values())
+
+    def get(self, account_id: str) -> Optional[ServiceAccount]:
+        """Return the service account associated with the provided account id. None if no account was found.
+
+        Args:
+            account_id: account id to be used for retrieving the service account.
+        """
+        with self._lock:
+            return self.cache.get(account_id)
+
+    def create(self, service_account: ServiceAccount) -> str:
+        """Create a new service account and return ids associated id.
+
+        Args:
+            service_account: ServiceAccount to be stored in the registry
+        """
+        return self.registry.create(service_account)
+
+    def delete(self, account_id: str) -> str:
+        """Delete the service account associated with the provided id.
+
+        Args:
+            account_id: service account id to be deleted
+        """
+        return self.registry.delete(account_id)
+
+    def set_primary(self, account_id: str) -> str:
+        """Set the primary account to the one related to the provided account id.
+
+        Args:
+            account_id: account id to be elected as new primary account
+        """
+        return self.registry.set_primary(account_id)
+
+    def set_configurations(self, account_id: str, configurations: PropertyFile) -> str:
+        """Set a new service account configuration for the provided service account id.
+
+        Args:
+            account_id: account id for which configuration ought to be set
+            configurations: PropertyFile representing the new configuration to be stored
+        """
+        return self.registry.set_configurations(account_id, configurations)
+
+
 def parse_conf_overrides(
-    conf_args: List, environ_vars: Dict = dict(os.environ)
+    conf_args: List, environ_vars: Optional[Mapping[str, str]] = None
 ) -> PropertyFile:
     """Parse --conf overrides passed to spark-submit
 
     Args:
         conf_args: list of all --conf 'k1=v1' type args passed to spark-submit.
             Note v1 expression itself could be containing '='
-        environ_vars: dictionary with environment variables as key-value pairs
+        environ_vars: mapping with environment variables as key-value pairs. Default uses os.environ.
     """
+    variables = os.environ if environ_vars is None else environ_vars
     conf_overrides = dict()
     if conf_args:
-        with environ(*os.environ.keys(), **environ_vars):
-            for c in conf_args:
-                try:
-                    kv = c.split("=")
-                    k = kv[0]
-                    v = "=".join(kv[1:])
-                    conf_overrides[k] = os.path.expandvars(v)
-                except IndexError:
-                    raise FormatError(
-                        "Configuration related arguments parsing error. "
-                        "Please check input arguments and try again."
-                    )
+        for c in conf_args:
+            try:
+                kv = c.split("=")
+                k = kv[0]
+                v = "=".join(kv[1:])
+                conf_overrides[k] = expand_vars(v, variables)
+            except IndexError:
+                raise FormatError(
+                    "Configuration related arguments parsing error. "
+                    "Please check input arguments and try again."
+                )
     return PropertyFile(conf_overrides)
 
 
+def is_kubernetes_master(master: Optional[str]) -> bool:
+    """Return whether Spark runs on K8s for the given master, K8s being used when no master is provided.
+
+    Args:
+        master: master URI provided by the user, e.g. k8s://https://host:port or local[*]
+    """
+    return master is None or master.startswith("k8s://")
+
+
 class SparkDeployMode(str, Enum):
     CLIENT = "client"
     CLUSTER = "cluster"
 
+    def __str__(self) -> str:
+        return self.value
+
 
 class SparkInterface(WithLogging):
     """Class for providing interfaces for spark commands."""
 
     def __init__(
         self,
-        service_account: ServiceAccount,
-        kube_interface: KubeInterface,
+        service_account: Optional[ServiceAccount],
+        kube_interface: Optional[KubeInterface],
         defaults: Defaults,
+        master: Optional[str] = None,
     ):
-        """Initialise spark for a given service account.
+        """Initialise spark for a given service account, or for a non-K8s master.
 
         Args:
-            service_account: spark ServiceAccount to be used for executing spark on k8s
+            service_account: spark ServiceAccount to be used for executing spark on k8s. None when Spark does not run
+                             on k8s, in which case master must be provided.
+            kube_interface: KubeInterface of the k8s cluster. None when Spark does not run on k8s.
             defaults: Defaults class containing relevant default settings.
+            master: master URI used when no service account is provided, e.g. local[*]. Neither the kube config nor
+                    the K8s API server are then accessed, and the service account configurations are not merged.
         """
+        if service_account is None and master is None:
+            raise ValueError("A master must be provided when no service account is.")
+
         self.service_account = service_account
         self.kube_interface = kube_interface
         self.defaults = defaults
+        self._master = master
+
+        self._base_properties: Dict[Optional[str], PropertyFile] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def master(self) -> str:
+        """Return the master URI Spark is launched with."""
+        if self.service_account is not None:
+            return f"k8s://{self.service_account.api_server}"
+        return str(self._master)
+
+    def _execute(self, cmd: str, environ: Optional[Dict[str, str]] = None) -> int:
+        self.logger.debug(cmd)
+        kube_config_file = (
+            self.kube_interface.kube_config_file
+            if self.kube_interface is not None
+            else None
+        )
+        if isinstance(kube_config_file, str):
+            environ = {**(environ or {}), "KUBECONFIG": kube_config_file}
+        return subprocess.run(
+            cmd,
+            shell=True,
+            env=dict(os.environ, **environ) if environ else None,
+        ).returncode
 
     @staticmethod
     def _read_properties_file(namefile: Optional[str]) -> PropertyFile:
@@ -759,114 +1387,291 @@ class SparkInterface(WithLogging):
             else PropertyFile.empty()
         )
 
-    def spark_submit(
-        self,
-        deploy_mode: SparkDeployMode,
-        cli_property: Optional[str],
-        extra_args: List[str],
-    ):
-        """Submit a spark job.
-
-        Args:
-            deploy_mode: "client" or "cluster" depending where the driver will run, locally or on the k8s cluster
-                         respectively
-            cli_property: property-file path provided via command line
-            extra_args: extra arguments provided to the spark submit command
-        """
-        with umask_named_temporary_file(
-            mode="w", prefix="spark-conf-", suffix=".conf"
-        ) as t:
-            self.logger.debug(f"Spark props available for reference at {t.name}\n")
-
-            (
+    def _merge_properties(
+        self, cli_property: Optional[str], extra: Optional[PropertyFile] = None
+    ) -> PropertyFile:
+        with measure("spark.merge_config") as m:
+            properties = (
                 self._read_properties_file(self.defaults.static_conf_file)
-                + self.service_account.configurations
+                + (extra or PropertyFile.empty())
+                + (
+                    self.service_account.configurations
+                    if self.service_account is not None
+                    else PropertyFile.empty()
+                )
                 + self._read_properties_file(self.defaults.env_conf_file)
                 + self._read_properties_file(cli_property)
-            ).log().write(t.file)
+            )
+            m.attributes["keys"] = len(properties)
+        return properties
+
+    def _merge_base_properties(self, cli_property: Optional[str]) -> PropertyFile:
+        """Return the merged properties for a properties file, merged once for all the jobs submitted."""
+        with self._lock:
+            if cli_property not in self._base_properties:
+                self._base_properties[cli_property] = self._merge_properties(
+                    cli_property
+                )
+            return self._base_properties[cli_property]
 
-            t.flush()
+    def _submission_slot(self) -> ContextManager[Any]:
+        """Return the context holding a slot of the submission queue, if enabled for submissions on K8s."""
+        if self.service_account is None or self.defaults.queue_max_concurrent <= 0:
+            return nullcontext()
 
-            submit_args = [
-                f"--master k8s://{self.service_account.api_server}",
-                f"--deploy-mode {deploy_mode}",
-                f"--properties-file {t.name}",
-            ] + extra_args
+        from spark_client.scheduler import SubmissionScheduler
 
-            submit_cmd = f"{self.defaults.spark_submit} {' '.join(submit_args)}"
+        return SubmissionScheduler(
+            self.defaults.queue_file, self.defaults.queue_max_concurrent
+        ).slot(self.service_account.namespace, self.defaults.queue_priority)
 
-            self.logger.debug(submit_cmd)
-            with environ(KUBECONFIG=self.kube_interface.kube_config_file):
-                os.system(submit_cmd)
+    def _with_cached_packages(
+        self, properties: PropertyFile, deploy_mode: Optional[SparkDeployMode] = None
+    ) -> PropertyFile:
+        """Return the properties with spark.jars.packages resolved into the artifact cache, if enabled.
 
-    def spark_shell(self, cli_property: Optional[str], extra_args: List[str]):
-        """Start an interactinve spark shell.
+        In cluster mode, the local jars of the cache are only usable when Spark uploads them, i.e. when
+        spark.kubernetes.file.upload.path is set; the packages are otherwise left to Spark.
+        """
+        if (
+            not self.defaults.artifact_cache
+            or "spark.jars.packages" not in properties.props
+        ):
+            return properties
 
-        Args:
-            cli_property: property-file path provided via command line
-            extra_args: extra arguments provided to spark shell
+        if (
+            deploy_mode == SparkDeployMode.CLUSTER
+            and self.service_account is not None
+            and "spark.kubernetes.file.upload.path" not in properties.props
+        ):
+            return properties
+
+        from spark_client.artifacts import ArtifactCache, with_cached_packages
+
+        return with_cached_packages(
+            properties,
+            ArtifactCache(
+                self.defaults.artifact_cache_folder, home=self.defaults.home_folder
+            ),
+        )
+
+    def _with_python_dependencies(
+        self,
+        properties: PropertyFile,
+        py_source: Optional[str],
+        py_requirements: Optional[str],
+    ) -> PropertyFile:
+        """Return the properties shipping the cached archives of the Python dependencies, if any is provided."""
+        if py_source is None and py_requirements is None:
+            return properties
+
+        from spark_client.pyfiles import with_python_dependencies
+
+        return with_python_dependencies(
+            properties, self._python_packager(), py_source, py_requirements
+        )
+
+    def _python_packager(self):
+        from spark_client.pyfiles import PythonPackager
+
+        return PythonPackager(
+            self.defaults.pyfiles_folder,
+            self.defaults.pip_cmd,
+            self.defaults.py_target_version,
+            self.defaults.py_target_platforms,
+        )
+
+    def _local_driver_environ(
+        self, py_requirements: Optional[str]
+    ) -> Optional[Dict[str, str]]:
+        """Return the environment of a driver running locally, importing the Python requirements if provided."""
+        if py_requirements is None:
+            return None
+
+        from spark_client.pyfiles import local_driver_pythonpath
+
+        return {
+            "PYTHONPATH": local_driver_pythonpath(
+                self._python_packager(), py_requirements
+            )
+        }
+
+    def _with_executor_sizing(
+        self, properties: PropertyFile, extra_args: List[str]
+    ) -> PropertyFile:
+        """Return the properties with the executor sizing proposed for the cluster, if enabled for jobs on K8s.
+
+        The configurations set by the spark-submit options in extra_args are considered as set by the user. The
+        nodes are listed once per KubeInterface, while the quota, changing with every job, is read on each submission.
         """
+        if (
+            not self.defaults.autotune
+            or self.service_account is None
+            or self.kube_interface is None
+        ):
+            return properties
 
+        from spark_client.sizing import (
+            capacity_from_resources,
+            propose_sizing,
+            settings_from_args,
+        )
+
+        with measure("spark.sizing"):
+            try:
+                capacity = capacity_from_resources(
+                    self.kube_interface.list_cached("/api/v1/nodes"),
+                    self.kube_interface.list_items(
+                        f"/api/v1/namespaces/{self.service_account.namespace}/resourcequotas"
+                    ),
+                )
+            except (subprocess.SubprocessError, KeyError, ValueError) as e:
+                self.logger.warning("Could not read the cluster capacity: %s", e)
+                return properties
+
+            decision = propose_sizing(
+                properties + settings_from_args(extra_args), capacity
+            )
+
+        print(decision.format(), file=sys.stderr)
+        return properties + PropertyFile(decision.properties)
+
+    def _launch(
+        self,
+        command: str,
+        properties: PropertyFile,
+        options: List[str],
+        extra_args: List[str],
+        environ: Optional[Dict[str, str]] = None,
+    ) -> int:
         with umask_named_temporary_file(
             mode="w", prefix="spark-conf-", suffix=".conf"
         ) as t:
-            self.logger.debug(f"Spark props available for reference at {t.name}\n")
-
-            (
-                self._read_properties_file(self.defaults.static_conf_file)
-                + PropertyFile(
-                    {
-                        "spark.driver.extraJavaOptions": f"-Dscala.shell.histfile={self.defaults.scala_history_file}"
-                    }
-                )
-                + self.service_account.configurations
-                + self._read_properties_file(self.defaults.env_conf_file)
-                + self._read_properties_file(cli_property)
-            ).log().write(t.file)
+            self.logger.debug("Spark props available for reference at %s", t.name)
 
-            t.flush()
+            with measure("spark.write_properties"):
+                properties.log(
+                    max_items=self.defaults.config_dump_limit, reference=t.name
+                ).write(t.file)
+                t.flush()
 
-            submit_args = [
-                f"--master k8s://{self.service_account.api_server}",
-                f"--properties-file {t.name}",
-            ] + extra_args
+            submit_args = options + [f"--properties-file {t.name}"] + extra_args
 
-            submit_cmd = f"{self.defaults.spark_shell} {' '.join(submit_args)}"
+            notify_launch()
 
-            self.logger.debug(submit_cmd)
-            with environ(KUBECONFIG=self.kube_interface.kube_config_file):
-                os.system(f"touch {self.defaults.scala_history_file}")
-                os.system(submit_cmd)
+            with measure("spark.exec", command=command):
+                return self._execute(f"{command} {' '.join(submit_args)}", environ)
 
-    def pyspark_shell(self, cli_property: Optional[str], extra_args: List[str]):
-        """Start an interactinve pyspark shell.
+    def spark_submit(
+        self,
+        deploy_mode: SparkDeployMode,
+        cli_property: Optional[str],
+        extra_args: List[str],
+        conf_overrides: Optional[PropertyFile] = None,
+        py_source: Optional[str] = None,
+        py_requirements: Optional[str] = None,
+    ) -> int:
+        """Submit a spark job and return the exit code of spark-submit.
+
+        The properties merged from the defaults, the service account and the property-file are shared by the jobs
+        submitted through the same SparkInterface, which is thread-safe. When the submission queue is enabled, the
+        job waits for a free slot in the namespace of the service account before being launched. When the artifact
+        cache is enabled, spark.jars.packages are replaced by the local jars of the cache in spark.jars. The
+        archives of the Python dependencies are built only when their inputs changed. When the executor sizing is
+        enabled, the executor configurations not set are proposed from the capacity of the cluster. When the
+        upload cache is enabled, the local dependencies of cluster-mode jobs are staged under the upload path by
+        content, and the properties and arguments rewritten to reference the staged copies.
 
         Args:
+            deploy_mode: "client" or "cluster" depending where the driver will run, locally or on the k8s cluster
+                         respectively
             cli_property: property-file path provided via command line
-            extra_args: extra arguments provided to pyspark
+            extra_args: extra arguments provided to the spark submit command
+            conf_overrides: job specific configurations, overriding all the others
+            py_source: folder of Python sources, zipped and shipped with spark.submit.pyFiles
+            py_requirements: pip requirements file, installed and shipped with spark.archives, and installed for
+                             the local interpreter when the driver runs locally
         """
+        properties = self._merge_base_properties(cli_property)
+        if conf_overrides is not None:
+            properties = properties + conf_overrides
+        properties = self._with_cached_packages(properties, deploy_mode)
+        properties = self._with_python_dependencies(
+            properties, py_source, py_requirements
+        )
+        properties = self._with_executor_sizing(properties, extra_args)
+        environ = (
+            self._local_driver_environ(py_requirements)
+            if deploy_mode == SparkDeployMode.CLIENT
+            else None
+        )
 
-        with umask_named_temporary_file(
-            mode="w", prefix="spark-conf-", suffix=".conf"
-        ) as t:
-            self.logger.debug(f"Spark props available for reference at {t.name}\n")
+        if deploy_mode == SparkDeployMode.CLUSTER and self.defaults.upload_cache:
+            from spark_client.uploads import stage_dependencies
+
+            properties, extra_args = stage_dependencies(properties, extra_args)
+
+        with self._submission_slot():
+            return self._launch(
+                self.defaults.spark_submit,
+                properties,
+                [
+                    f"--master {self.master}",
+                    f"--deploy-mode {deploy_mode}",
+                ],
+                extra_args,
+                environ,
+            )
 
-            (
-                self._read_properties_file(self.defaults.static_conf_file)
-                + self.service_account.configurations
-                + self._read_properties_file(self.defaults.env_conf_file)
-                + self._read_properties_file(cli_property)
-            ).log().write(t.file)
+    def spark_shell(self, cli_property: Optional[str], extra_args: List[str]) -> int:
+        """Start an interactinve spark shell and return its exit code.
 
-            t.flush()
+        Args:
+            cli_property: property-file path provided via command line
+            extra_args: extra arguments provided to spark shell
+        """
+        properties = self._merge_properties(
+            cli_property,
+            PropertyFile(
+                {
+                    "spark.driver.extraJavaOptions": f"-Dscala.shell.histfile={self.defaults.scala_history_file}"
+                }
+            ),
+        )
 
-            submit_args = [
-                f"--master k8s://{self.service_account.api_server}",
-                f"--properties-file {t.name}",
-            ] + extra_args
+        open(self.defaults.scala_history_file, "a").close()
 
-            submit_cmd = f"{self.defaults.pyspark} {' '.join(submit_args)}"
+        return self._launch(
+            self.defaults.spark_shell,
+            self._with_cached_packages(properties),
+            [f"--master {self.master}"],
+            extra_args,
+        )
 
-            self.logger.debug(submit_cmd)
-            with environ(KUBECONFIG=self.kube_interface.kube_config_file):
-                os.system(submit_cmd)
+    def pyspark_shell(
+        self,
+        cli_property: Optional[str],
+        extra_args: List[str],
+        py_source: Optional[str] = None,
+        py_requirements: Optional[str] = None,
+    ) -> int:
+        """Start an interactinve pyspark shell and return its exit code.
+
+        Args:
+            cli_property: property-file path provided via command line
+            extra_args: extra arguments provided to pyspark
+            py_source: folder of Python sources, zipped and shipped with spark.submit.pyFiles
+            py_requirements: pip requirements file, installed and shipped with spark.archives, and installed for
+                             the local interpreter when the driver runs locally
+        """
+        return self._launch(
+            self.defaults.pyspark,
+            self._with_python_dependencies(
+                self._with_cached_packages(self._merge_properties(cli_property)),
+                py_source,
+                py_requirements,
+            ),
+            [f"--master {self.master}"],
+            extra_args,
+            self._local_driver_environ(py_requirements),
+        )
@@ -0,0 +1,344 @@
+"""Module for sizing the executors of a job to the shape of the K8s nodes and to the quota of the namespace."""
+
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from spark_client.domain import PropertyFile
+
+NODE_HEADROOM = 0.1
+
+MAX_EXECUTOR_CORES = 5
+
+MIN_OVERHEAD_MIB = 384
+
+DEFAULT_OVERHEAD_FACTOR = 0.1
+
+DEFAULT_ALLOCATION_BATCH_SIZE = 5
+
+MIB = 1024 * 1024
+
+_QUANTITY_SUFFIXES: Dict[str, Decimal] = {
+    "Ki": Decimal(1024),
+    "Mi": Decimal(1024**2),
+    "Gi": Decimal(1024**3),
+    "Ti": Decimal(1024**4),
+    "Pi": Decimal(1024**5),
+    "Ei": Decimal(1024**6),
+    "n": Decimal("1e-9"),
+    "u": Decimal("1e-6"),
+    "m": Decimal("1e-3"),
+    "k": Decimal(1000),
+    "M": Decimal(1000**2),
+    "G": Decimal(1000**3),
+    "T": Decimal(1000**4),
+    "P": Decimal(1000**5),
+    "E": Decimal(1000**6),
+}
+
+_QUANTITY_PATTERN = re.compile(
+    r"^([0-9.eE+-]+?)(Ki|Mi|Gi|Ti|Pi|Ei|n|u|m|k|M|G|T|P|E)?$"
+)
+
+_SPARK_SIZE_PATTERN = re.compile(r"^([0-9]+)\s*([a-z]*)$")
+
+_SPARK_SIZE_UNITS = {
+    "b": 1 / MIB,
+    "k": 1 / 1024,
+    "kb": 1 / 1024,
+    "m": 1,
+    "mb": 1,
+    "g": 1024,
+    "gb": 1024,
+    "t": 1024**2,
+    "tb": 1024**2,
+    "p": 1024**3,
+    "pb": 1024**3,
+}
+
+
+def parse_quantity(quantity: str) -> Decimal:
+    """Return the value of a K8s resource quantity, e.g. 500m or 16Gi.
+
+    Args:
+        quantity: K8s resource quantity
+    """
+    match = _QUANTITY_PATTERN.match(str(quantity).strip())
+    if match is None:
+        raise ValueError(f"Invalid quantity {quantity}")
+    number, suffix = match.groups()
+    return Decimal(number) * _QUANTITY_SUFFIXES.get(suffix or "", Decimal(1))
+
+
+def parse_spark_size(value: str) -> int:
+    """Return a Spark memory size in MiB, e.g. 4g, 512m or 2048 (MiB when no unit is given).
+
+    Args:
+        value: Spark memory size
+    """
+    match = _SPARK_SIZE_PATTERN.match(str(value).strip().lower())
+    if match is None or match.group(2) not in ["", *_SPARK_SIZE_UNITS]:
+        raise ValueError(f"Invalid size {value}")
+    return int(int(match.group(1)) * _SPARK_SIZE_UNITS.get(match.group(2), 1))
+
+
+_OPTION_KEYS = {
+    "--executor-cores": "spark.executor.cores",
+    "--executor-memory": "spark.executor.memory",
+    "--num-executors": "spark.executor.instances",
+    "--driver-cores": "spark.driver.cores",
+    "--driver-memory": "spark.driver.memory",
+}
+
+
+def settings_from_args(args: List[str]) -> PropertyFile:
+    """Return the configurations set by the spark-submit options, overriding the properties file.
+
+    Args:
+        args: arguments provided to spark-submit, after the ones consumed by spark-client
+    """
+    settings = {}
+    for index, arg in enumerate(args):
+        option, equal, value = arg.partition("=")
+        if not equal:
+            option, value = arg, args[index + 1] if index + 1 < len(args) else ""
+        if option in _OPTION_KEYS:
+            settings[_OPTION_KEYS[option]] = value
+        elif option in ("--conf", "-c") and "=" in value:
+            key, _, conf = value.partition("=")
+            settings[key.strip()] = conf
+    return PropertyFile(settings)
+
+
+@dataclass(frozen=True)
+class ClusterCapacity:
+    """Class representing the resources available to the executors of a namespace.
+
+    The nodes are given by their allocatable millicores and MiB, the quota by the millicores and MiB left by the
+    ResourceQuotas of the namespace, None when not limited.
+    """
+
+    nodes: List[Tuple[int, int]]
+    quota_millicores: Optional[int] = None
+    quota_mib: Optional[int] = None
+
+
+def _is_schedulable(node: Dict) -> bool:
+    spec = node.get("spec") or {}
+    return not spec.get("unschedulable") and not any(
+        taint.get("effect") in ("NoSchedule", "NoExecute")
+        for taint in spec.get("taints") or []
+    )
+
+
+def _remaining(quotas: List[Dict], resources: List[str]) -> Optional[Decimal]:
+    remaining = [
+        parse_quantity(status["hard"][resource])
+        - parse_quantity((status.get("used") or {}).get(resource, "0"))
+        for status in (quota.get("status") or {} for quota in quotas)
+        for resource in resources
+        if resource in (status.get("hard") or {})
+    ]
+    return max(min(remaining), Decimal(0)) if remaining else None
+
+
+def capacity_from_resources(nodes: List[Dict], quotas: List[Dict]) -> ClusterCapacity:
+    """Return the capacity described by the Node and ResourceQuota resources.
+
+    Nodes that are cordoned or tainted with NoSchedule or NoExecute are ignored.
+
+    Args:
+        nodes: Node resources of the cluster
+        quotas: ResourceQuota resources of the namespace
+    """
+    cpu = _remaining(quotas, ["requests.cpu", "cpu"])
+    memory = _remaining(quotas, ["requests.memory", "memory", "limits.memory"])
+
+    return ClusterCapacity(
+        nodes=[
+            (
+                int(parse_quantity(node["status"]["allocatable"]["cpu"]) * 1000),
+                int(parse_quantity(node["status"]["allocatable"]["memory"]) / MIB),
+            )
+            for node in nodes
+            if _is_schedulable(node)
+        ],
+        quota_millicores=int(cpu * 1000) if cpu is not None else None,
+        quota_mib=int(memory / MIB) if memory is not None else None,
+    )
+
+
+@dataclass
+class SizingDecision:
+    """Class representing the executor configurations proposed for a job, with the rationale of each."""
+
+    properties: Dict[str, str] = field(default_factory=dict)
+    rationale: List[str] = field(default_factory=list)
+
+    def propose(self, props: Dict, key: str, value, reason: str):
+        """Propose a value for a configuration not set by the user.
+
+        Args:
+            props: configurations set by the user
+            key: configuration key
+            value: proposed value
+            reason: rationale of the value
+        """
+        if key in props:
+            self.rationale.append(f"{key}={props[key]} kept as set")
+        else:
+            self.properties[key] = str(value)
+            self.rationale.append(f"{key}={value}: {reason}")
+
+    def format(self) -> str:
+        """Return the decision and its rationale as text."""
+        return "\n".join(
+            ["Executor sizing:"] + [f"  {line}" for line in self.rationale]
+        )
+
+
+def _usable(node: Tuple[int, int]) -> Tuple[int, int]:
+    millicores, mib = node
+    return int(millicores * (1 - NODE_HEADROOM)) // 1000, int(mib * (1 - NODE_HEADROOM))
+
+
+def _best_cores(usable_cores: int) -> int:
+    """Return the cores per executor using the most cores of a node, preferring larger executors on ties."""
+    return max(
+        range(1, max(min(MAX_EXECUTOR_CORES, usable_cores), 1) + 1),
+        key=lambda cores: ((usable_cores // cores) * cores, cores),
+    )
+
+
+def propose_sizing(
+    properties: PropertyFile, capacity: ClusterCapacity
+) -> SizingDecision:
+    """Return the executor configurations bin-packing the executors on the most common node shape.
+
+    A share of NODE_HEADROOM of each node is left to the DaemonSets and system pods. The cores per executor are chosen
+    to use as many cores of a node as possible, up to MAX_EXECUTOR_CORES. The memory of a node is split between its
+    executors, including the memory overhead. The number of executors fills the nodes, within the quota left in the
+    namespace after the driver. Only the configurations not set by the user are proposed.
+
+    Args:
+        properties: merged properties of the job
+        capacity: resources available to the executors
+    """
+    props = properties.props
+    decision = SizingDecision()
+
+    if not capacity.nodes:
+        decision.rationale.append("no schedulable node found, sizing skipped")
+        return decision
+
+    (shape, count), *_ = Counter(capacity.nodes).most_common(1)
+    usable_cores, usable_mib = _usable(shape)
+    decision.rationale.append(
+        f"{count}/{len(capacity.nodes)} nodes allocate {shape[0]}m CPU and {shape[1]}Mi, "
+        f"{usable_cores} cores and {usable_mib}Mi usable after {NODE_HEADROOM:.0%} headroom"
+    )
+
+    cores = int(props.get("spark.executor.cores") or _best_cores(usable_cores))
+    per_node = usable_cores // cores
+    decision.propose(
+        props,
+        "spark.executor.cores",
+        cores,
+        f"{per_node} executors use {per_node * cores} of the {usable_cores} cores of a node",
+    )
+    if per_node == 0:
+        decision.rationale.append("executors do not fit the nodes, sizing stopped")
+        return decision
+
+    factor = float(
+        props.get("spark.executor.memoryOverheadFactor")
+        or props.get("spark.kubernetes.memoryOverheadFactor")
+        or DEFAULT_OVERHEAD_FACTOR
+    )
+    pyspark_mib = (
+        parse_spark_size(props["spark.executor.pyspark.memory"])
+        if props.get("spark.executor.pyspark.memory")
+        else 0
+    )
+    pod_share = usable_mib // per_node - pyspark_mib
+
+    if props.get("spark.executor.memory"):
+        memory = parse_spark_size(props["spark.executor.memory"])
+    else:
+        memory = min(int(pod_share / (1 + factor)), pod_share - MIN_OVERHEAD_MIB)
+    decision.propose(
+        props,
+        "spark.executor.memory",
+        f"{memory}m",
+        f"{per_node} executors share the {usable_mib}Mi of a node, with a {factor:.0%} overhead",
+    )
+
+    if props.get("spark.executor.memoryOverhead"):
+        overhead = parse_spark_size(props["spark.executor.memoryOverhead"])
+    elif "spark.executor.memory" in props:
+        overhead = max(int(memory * factor), MIN_OVERHEAD_MIB)
+    else:
+        overhead = pod_share - memory
+    if "spark.executor.memory" not in props or "spark.executor.memoryOverhead" in props:
+        decision.propose(
+            props,
+            "spark.executor.memoryOverhead",
+            f"{overhead}m",
+            "rest of the share of memory of an executor",
+        )
+
+    pod_mib = memory + overhead + pyspark_mib
+    if memory <= 0 or pod_mib > usable_mib:
+        decision.rationale.append("executors do not fit the nodes, sizing stopped")
+        return decision
+    per_node = min(per_node, usable_mib // pod_mib)
+
+    slots = sum(
+        min(node_cores // cores, node_mib // pod_mib)
+        for node_cores, node_mib in map(_usable, capacity.nodes)
+    )
+    reason = f"{slots} executors of {cores} cores and {pod_mib}Mi fit the nodes"
+
+    if capacity.quota_millicores is not None or capacity.quota_mib is not None:
+        driver_millicores = int(float(props.get("spark.driver.cores") or 1) * 1000)
+        driver_memory = parse_spark_size(props.get("spark.driver.memory") or "1g")
+        driver_mib = driver_memory + (
+            parse_spark_size(props["spark.driver.memoryOverhead"])
+            if props.get("spark.driver.memoryOverhead")
+            else max(int(driver_memory * factor), MIN_OVERHEAD_MIB)
+        )
+        quota_slots = min(
+            (
+                (capacity.quota_millicores - driver_millicores) // (cores * 1000)
+                if capacity.quota_millicores is not None
+                else slots
+            ),
+            (
+                (capacity.quota_mib - driver_mib) // pod_mib
+                if capacity.quota_mib is not None
+                else slots
+            ),
+        )
+        if quota_slots < slots:
+            slots = max(quota_slots, 0)
+            reason = f"{slots} executors fit the quota left in the namespace after the driver"
+
+    instances = max(slots, 1)
+    if str(props.get("spark.dynamicAllocation.enabled", "false")).lower() == "true":
+        decision.propose(
+            props, "spark.dynamicAllocation.maxExecutors", instances, reason
+        )
+    else:
+        decision.propose(props, "spark.executor.instances", instances, reason)
+
+    decision.propose(
+        props,
+        "spark.kubernetes.allocation.batch.size",
+        min(instances, max(per_node, DEFAULT_ALLOCATION_BATCH_SIZE)),
+        f"the executors of a node ({per_node}) requested at once, at least Spark's default of "
+        f"{DEFAULT_ALLOCATION_BATCH_SIZE}",
+    )
+
+    return decision
@@ -0,0 +1,190 @@
+"""Module for keeping the last known-good resolved service accounts, used when K8s cannot be reached in time."""
+
+import contextvars
+import hashlib
+import json
+import os
+import subprocess
+import threading
+import time
+from datetime import timedelta
+from tempfile import NamedTemporaryFile
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+
+from spark_client.domain import ServiceAccount
+from spark_client.exceptions import ResolutionTimeout
+from spark_client.throttling import deadline
+from spark_client.utils import WithLogging
+
+T = TypeVar("T")
+
+RESOLUTION_ERRORS = (
+    ResolutionTimeout,
+    subprocess.SubprocessError,
+    OSError,
+)
+
+
+def call_with_timeout(func: Callable[[], T], timeout: float) -> T:
+    """Return the result of func, raising ResolutionTimeout if it does not complete within the timeout.
+
+    The function runs in a daemon thread, within a copy of the current context so that its measurements are nested in
+    the current span, and is abandoned on timeout. The kubectl calls it makes share the time budget, hence the one
+    running at the deadline is killed rather than left behind.
+
+    Args:
+        func: callable without arguments
+        timeout: time budget in seconds
+    """
+    context = contextvars.copy_context()
+    outcome: Dict[str, Any] = {}
+
+    def bounded() -> T:
+        with deadline(timeout):
+            return func()
+
+    def target():
+        try:
+            outcome["result"] = context.run(bounded)
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target, name="spark-client-resolve", daemon=True)
+    thread.start()
+    thread.join(timeout)
+
+    if thread.is_alive():
+        raise ResolutionTimeout(timeout)
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
+
+
+class AccountSnapshotStore(WithLogging):
+    """Class for persisting the last known-good resolved service accounts, one JSON file per resolution request.
+
+    Snapshots may contain credentials held in the account configurations, hence they are only readable by the user.
+    """
+
+    def __init__(self, folder: str):
+        """Initialise the store.
+
+        Args:
+            folder: folder the snapshots are written to, created on first write
+        """
+        self.folder = folder
+
+    @staticmethod
+    def key(
+        kube_config: Any,
+        master: Optional[str],
+        username: Optional[str],
+        namespace: Optional[str],
+    ) -> str:
+        """Return the key identifying a resolution request.
+
+        Args:
+            kube_config: kube config file used to resolve the account
+            master: K8s master URI, used to select the context
+            username: name of the service account, None for the primary account
+            namespace: namespace of the service account, None for the primary account
+        """
+        return hashlib.sha256(
+            json.dumps([kube_config, master, username, namespace], default=str).encode(
+                "utf-8"
+            )
+        ).hexdigest()
+
+    def _filename(self, key: str) -> str:
+        return os.path.join(self.folder, f"{key}.json")
+
+    def save(self, key: str, service_account: ServiceAccount):
+        """Write the snapshot of a resolved service account, replacing the previous one atomically.
+
+        Args:
+            key: key of the resolution request
+            service_account: resolved service account
+        """
+        self._write(key, service_account.to_dict())
+
+    def _write(self, key: str, account: Dict[str, Any]):
+        try:
+            os.makedirs(self.folder, mode=0o700, exist_ok=True)
+            with NamedTemporaryFile(
+                mode="w", dir=self.folder, prefix=".snapshot-", delete=False
+            ) as t:
+                json.dump({"timestamp": time.time(), "account": account}, t)
+            os.replace(t.name, self._filename(key))
+        except OSError as e:
+            self.logger.warning("Could not write account snapshot: %s", e)
+
+    def load(self, key: str, max_age: float) -> Optional[Tuple[ServiceAccount, float]]:
+        """Return the snapshot of a service account with its age in seconds, None if missing or older than max_age.
+
+        Args:
+            key: key of the resolution request
+            max_age: maximum age in seconds of the snapshot
+        """
+        try:
+            with open(self._filename(key)) as fid:
+                raw = json.load(fid)
+            age = time.time() - raw["timestamp"]
+            account = ServiceAccount.from_dict(raw["account"])
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            self.logger.debug("No usable account snapshot: %s", e)
+            return None
+
+        if age > max_age:
+            self.logger.debug("Account snapshot is older than %s seconds", max_age)
+            return None
+
+        return account, age
+
+    def resolve(
+        self,
+        key: str,
+        func: Callable[[], Optional[ServiceAccount]],
+        timeout: float,
+        max_age: float,
+    ) -> Tuple[Optional[ServiceAccount], Optional[float]]:
+        """Resolve a service account within a time budget, falling back to its snapshot if K8s cannot be reached.
+
+        Returns the service account, with the age of the snapshot in seconds if it was used, None otherwise. The
+        account configurations, fetched lazily, are loaded within the time budget too, so that a resolution whose
+        configurations cannot be retrieved fails rather than overwriting the snapshot. A successful resolution
+        refreshes the snapshot, while the errors raised by the resolution are re-raised when no snapshot younger than
+        max_age exists.
+
+        Args:
+            key: key of the resolution request
+            func: callable resolving the service account against K8s, returning None if the account does not exist
+            timeout: time budget in seconds for the resolution
+            max_age: maximum age in seconds of the snapshot to fall back to
+        """
+
+        def resolve_and_serialize() -> Tuple[Optional[ServiceAccount], Dict[str, Any]]:
+            service_account = func()
+            return service_account, (
+                service_account.to_dict() if service_account is not None else {}
+            )
+
+        try:
+            service_account, raw = call_with_timeout(resolve_and_serialize, timeout)
+        except RESOLUTION_ERRORS as e:
+            snapshot = self.load(key, max_age)
+            if snapshot is None:
+                raise
+            service_account, age = snapshot
+            self.logger.warning(
+                "Could not resolve the service account against K8s (%s). "
+                "Using the last known-good snapshot of %s, resolved %s ago.",
+                e.__class__.__name__,
+                service_account.id,
+                timedelta(seconds=int(age)),
+            )
+            return service_account, age
+
+        if service_account is not None:
+            self._write(key, raw)
+
+        return service_account, None
@@ -0,0 +1,168 @@
+"""Module for controlling the flow of requests to the K8s API: client-side rate limiting and retries with backoff."""
+
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+IDEMPOTENT_VERBS = frozenset(["get", "delete", "patch", "apply"])
+
+THROTTLED = "throttled"
+SERVER_ERROR = "server_error"
+CONNECTION_ERROR = "connection_error"
+TIMEOUT = "timeout"
+ERROR = "error"
+SUCCESS = "success"
+
+_THROTTLED_MARKERS = ["(TooManyRequests)", "too many requests"]
+_SERVER_ERROR_MARKERS = [
+    "(InternalError)",
+    "(ServiceUnavailable)",
+    "(ServerTimeout)",
+    "(Timeout)",
+    "the server is currently unable to handle the request",
+]
+_CONNECTION_ERROR_MARKERS = [
+    "Unable to connect to the server",
+    "connection refused",
+    "connection reset",
+    "i/o timeout",
+    "TLS handshake timeout",
+    "unexpected EOF",
+]
+
+
+_deadline: ContextVar[Optional[float]] = ContextVar(
+    "spark_client_deadline", default=None
+)
+
+
+@contextmanager
+def deadline(timeout: float) -> Iterator[None]:
+    """Bound the kubectl calls made within the block to a time budget, shared with any enclosing deadline.
+
+    Calls still running when the budget is spent are killed and raise subprocess.TimeoutExpired, and are not retried.
+
+    Args:
+        timeout: time budget in seconds
+    """
+    end = time.monotonic() + timeout
+    current = _deadline.get()
+    token = _deadline.set(end if current is None else min(current, end))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def time_left(timeout: Optional[float] = None) -> Optional[float]:
+    """Return the timeout of a call, bounded by the time left before the deadline of the current context, if any.
+
+    Args:
+        timeout: timeout of the call in seconds, None if not bounded
+    """
+    end = _deadline.get()
+    if end is None:
+        return timeout
+    left = max(end - time.monotonic(), 0.0)
+    return left if timeout is None else min(timeout, left)
+
+
+def classify_error(stderr: Optional[bytes]) -> str:
+    """Return the outcome of a failed kubectl call from its error output.
+
+    Args:
+        stderr: error output of kubectl
+    """
+    message = (stderr or b"").decode("utf-8", errors="replace")
+    lowered = message.lower()
+
+    if any(marker.lower() in lowered for marker in _THROTTLED_MARKERS):
+        return THROTTLED
+    if any(marker.lower() in lowered for marker in _SERVER_ERROR_MARKERS):
+        return SERVER_ERROR
+    if any(marker.lower() in lowered for marker in _CONNECTION_ERROR_MARKERS):
+        return CONNECTION_ERROR
+    return ERROR
+
+
+class TokenBucket:
+    """Class for a thread-safe token bucket limiting the rate of requests, allowing bursts up to its capacity."""
+
+    def __init__(self, qps: float, burst: int = 1):
+        """Initialise a full bucket.
+
+        Args:
+            qps: number of tokens added per second. Non-positive values disable the limiting.
+            burst: maximum number of tokens in the bucket, i.e. of requests issued back-to-back
+        """
+        self.qps = qps
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.qps
+            )
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.qps
+
+    def acquire(self) -> float:
+        """Take a token, blocking until one is available, and return the time waited in seconds."""
+        if self.qps <= 0:
+            return 0.0
+
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Class describing the timeout of kubectl calls and how the failed ones are retried.
+
+    Throttled calls are retried for any verb, since the request was rejected by the server before being processed.
+    Server errors, connection errors and timeouts are retried only for idempotent verbs.
+    """
+
+    max_attempts: int = 4
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+    timeout: Optional[float] = None
+
+    def delay(self, attempt: int) -> float:
+        """Return the jittered exponential backoff to wait for before the next attempt.
+
+        Args:
+            attempt: number of the attempt that failed, starting from 1
+        """
+        return random.uniform(
+            0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        )
+
+    def should_retry(self, verb: str, outcome: str, attempt: int) -> bool:
+        """Return whether a failed call is to be retried.
+
+        Args:
+            verb: kubectl verb of the call, e.g. get
+            outcome: outcome of the failed call, as returned by classify_error
+            attempt: number of the attempt that failed, starting from 1
+        """
+        if attempt >= self.max_attempts:
+            return False
+        if outcome == THROTTLED:
+            return True
+        return verb in IDEMPOTENT_VERBS and outcome in [
+            SERVER_ERROR,
+            CONNECTION_ERROR,
+            TIMEOUT,
+        ]
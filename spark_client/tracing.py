@@ -0,0 +1,242 @@
+"""Module for exporting the measured operations as trace spans, to a JSON-lines file or an OTLP/HTTP endpoint."""
+
+import json
+import os
+import threading
+import urllib.request
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List
+
+from spark_client.instrumentation import Measurement, add_listener, remove_listener
+from spark_client.utils import WithLogging
+
+
+def span_to_dict(measurement: Measurement) -> Dict[str, Any]:
+    """Return the measurement as a flat dictionary, as written to the JSON-lines file.
+
+    Args:
+        measurement: completed Measurement
+    """
+    return {
+        "trace_id": measurement.trace_id,
+        "span_id": measurement.span_id,
+        "parent_id": measurement.parent_id,
+        "name": measurement.name,
+        "timestamp": measurement.timestamp,
+        "duration": measurement.duration,
+        "bytes": measurement.bytes,
+        "attributes": measurement.attributes,
+        "error": repr(measurement.error) if measurement.error is not None else None,
+    }
+
+
+class SpanExporter(WithLogging, ABC):
+    """Abstract class for exporting the spans of a completed trace."""
+
+    @abstractmethod
+    def export(self, spans: List[Measurement]):
+        """Export the spans of a trace.
+
+        Args:
+            spans: completed Measurement objects belonging to the same trace
+        """
+        pass
+
+
+class JsonLinesSpanExporter(SpanExporter):
+    """Class exporting spans as JSON lines to a file, rotated once it grows beyond a given size."""
+
+    def __init__(
+        self, filename: str, max_bytes: int = 10_000_000, backup_count: int = 5
+    ):
+        """Initialise the exporter.
+
+        Args:
+            filename: path of the file the spans are appended to
+            max_bytes: size beyond which the file is rotated
+            backup_count: number of rotated files to keep, named filename.1, filename.2, etc.
+        """
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._lock = threading.Lock()
+
+    def _rotate(self):
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.filename}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.filename}.{index + 1}")
+        if self.backup_count > 0:
+            os.replace(self.filename, f"{self.filename}.1")
+        else:
+            os.remove(self.filename)
+
+    def export(self, spans: List[Measurement]):
+        """Append the spans of a trace to the file, one JSON object per line.
+
+        Args:
+            spans: completed Measurement objects belonging to the same trace
+        """
+        content = "".join(
+            json.dumps(span_to_dict(span), default=str) + "\n" for span in spans
+        )
+
+        with self._lock:
+            if (
+                os.path.exists(self.filename)
+                and os.path.getsize(self.filename) >= self.max_bytes
+            ):
+                self._rotate()
+
+            with open(self.filename, "a") as fid:
+                fid.write(content)
+
+
+class OtlpHttpSpanExporter(SpanExporter):
+    """Class exporting spans to an OpenTelemetry collector, using the OTLP/HTTP protocol with JSON encoding."""
+
+    SERVICE_NAME = "spark-client"
+
+    def __init__(self, endpoint: str, timeout: float = 1.0):
+        """Initialise the exporter.
+
+        Args:
+            endpoint: base URL of the collector, e.g. http://localhost:4318. Spans are posted to its /v1/traces path.
+            timeout: timeout in seconds of the request to the collector
+        """
+        self.endpoint = endpoint.rstrip("/")
+        self.timeout = timeout
+
+    @staticmethod
+    def _attribute(key: str, value: Any) -> Dict[str, Any]:
+        if isinstance(value, bool):
+            return {"key": key, "value": {"boolValue": value}}
+        if isinstance(value, int):
+            return {"key": key, "value": {"intValue": str(value)}}
+        if isinstance(value, float):
+            return {"key": key, "value": {"doubleValue": value}}
+        return {"key": key, "value": {"stringValue": str(value)}}
+
+    def _span(self, measurement: Measurement) -> Dict[str, Any]:
+        start = int(measurement.timestamp * 1e9)
+        span = {
+            "traceId": measurement.trace_id,
+            "spanId": measurement.span_id,
+            "name": measurement.name,
+            "kind": 1,
+            "startTimeUnixNano": str(start),
+            "endTimeUnixNano": str(start + int(measurement.duration * 1e9)),
+            "attributes": [
+                self._attribute(k, v)
+                for k, v in {
+                    **measurement.attributes,
+                    "bytes": measurement.bytes,
+                }.items()
+            ],
+        }
+        if measurement.parent_id is not None:
+            span["parentSpanId"] = measurement.parent_id
+        if measurement.error is not None:
+            span["status"] = {"code": 2, "message": repr(measurement.error)}
+        return span
+
+    def payload(self, spans: List[Measurement]) -> Dict[str, Any]:
+        """Return the OTLP request body for the provided spans.
+
+        Args:
+            spans: completed Measurement objects belonging to the same trace
+        """
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [
+                            self._attribute("service.name", self.SERVICE_NAME)
+                        ]
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": "spark_client"},
+                            "spans": [self._span(span) for span in spans],
+                        }
+                    ],
+                }
+            ]
+        }
+
+    def export(self, spans: List[Measurement]):
+        """Post the spans of a trace to the collector. Errors are logged and never raised.
+
+        Args:
+            spans: completed Measurement objects belonging to the same trace
+        """
+        request = urllib.request.Request(
+            f"{self.endpoint}/v1/traces",
+            data=json.dumps(self.payload(spans)).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout):
+                pass
+        except Exception as e:
+            self.logger.debug("Could not export spans to %s: %s", self.endpoint, e)
+
+
+class Tracer(WithLogging):
+    """Class collecting the measured operations of sampled traces and exporting each trace once it completes."""
+
+    def __init__(self, exporter: SpanExporter, sample_ratio: float = 1.0):
+        """Initialise the tracer.
+
+        Args:
+            exporter: SpanExporter the completed traces are handed over to
+            sample_ratio: fraction of the traces to be exported, between 0 and 1. The decision is taken from the trace
+                          id, so that all the spans of a trace are either exported or dropped together.
+        """
+        self.exporter = exporter
+        self.sample_ratio = sample_ratio
+        self._pending: Dict[str, List[Measurement]] = {}
+        self._lock = threading.Lock()
+
+    def is_sampled(self, trace_id: str) -> bool:
+        """Return whether the trace with the provided id is exported.
+
+        Args:
+            trace_id: hex-encoded trace id
+        """
+        return int(trace_id[:16], 16) < self.sample_ratio * 2**64
+
+    def record(self, measurement: Measurement):
+        """Add a completed measurement to its trace, exporting the trace once its root has completed.
+
+        Args:
+            measurement: completed Measurement
+        """
+        if not self.is_sampled(measurement.trace_id):
+            return
+
+        with self._lock:
+            spans = self._pending.setdefault(measurement.trace_id, [])
+            spans.append(measurement)
+            if not measurement.is_root:
+                return
+            del self._pending[measurement.trace_id]
+
+        try:
+            self.exporter.export(spans)
+        except Exception as e:
+            self.logger.warning(
+                "Could not export trace %s: %s", measurement.trace_id, e
+            )
+
+    def start(self) -> "Tracer":
+        """Start collecting measurements."""
+        if self.sample_ratio > 0:
+            add_listener(self.record)
+        return self
+
+    def stop(self) -> "Tracer":
+        """Stop collecting measurements."""
+        remove_listener(self.record)
+        return self
@@ -0,0 +1,236 @@
+"""Module for staging the local dependencies of cluster-mode submissions under the upload path, keyed by content."""
+
+import hashlib
+import os
+import shutil
+from tempfile import NamedTemporaryFile
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from spark_client.domain import PropertyFile
+from spark_client.instrumentation import measure
+from spark_client.utils import WithLogging
+
+UPLOADED_PROPERTIES = (
+    "spark.jars",
+    "spark.files",
+    "spark.submit.pyFiles",
+    "spark.archives",
+)
+
+LIST_OPTIONS = ("--jars", "--files", "--py-files", "--archives")
+
+CONF_OPTIONS = ("--conf", "-c")
+
+OPTIONS_WITH_VALUE = (
+    LIST_OPTIONS
+    + CONF_OPTIONS
+    + (
+        "--master",
+        "--deploy-mode",
+        "--class",
+        "--name",
+        "--packages",
+        "--exclude-packages",
+        "--repositories",
+        "--properties-file",
+        "--driver-memory",
+        "--driver-java-options",
+        "--driver-library-path",
+        "--driver-class-path",
+        "--driver-cores",
+        "--executor-memory",
+        "--executor-cores",
+        "--total-executor-cores",
+        "--num-executors",
+        "--queue",
+        "--proxy-user",
+        "--principal",
+        "--keytab",
+        "--kill",
+        "--status",
+    )
+)
+
+CACHE_FOLDER = "spark-client-cache"
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path: str) -> str:
+    """Return the SHA-256 of the content of a file, read in chunks.
+
+    Args:
+        path: path of the file
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as fid:
+        for chunk in iter(lambda: fid.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class UploadCache(WithLogging):
+    """Class for staging local files under spark.kubernetes.file.upload.path, at locations keyed by their content.
+
+    Spark uploads the local dependencies of a cluster-mode submission to a new random folder of the upload path on
+    every submission. Files staged by this class are instead stored once under spark-client-cache/<sha256>/, and
+    referenced with the local:// scheme, so that Spark neither uploads them again nor copies them. The upload path
+    must hence be a folder mounted at the same path in the driver and executor pods, e.g. a shared volume.
+    Upload paths on other file systems, e.g. s3a://, are not supported and left to Spark.
+    """
+
+    def __init__(self, upload_path: str):
+        """Initialise the cache.
+
+        Args:
+            upload_path: value of spark.kubernetes.file.upload.path
+        """
+        parsed = urlparse(upload_path)
+        self.folder: Optional[str] = (
+            os.path.join(parsed.path, CACHE_FOLDER)
+            if parsed.scheme in ("", "file")
+            else None
+        )
+        self._staged: Dict[str, str] = {}
+
+    @property
+    def enabled(self) -> bool:
+        """Return whether the upload path is a folder files can be staged into."""
+        return self.folder is not None
+
+    def stage(self, path: str) -> str:
+        """Stage a local file, unless a file with the same content already is, and return the staged path.
+
+        Args:
+            path: path of the local file
+        """
+        path = os.path.abspath(path)
+        if path in self._staged:
+            return self._staged[path]
+
+        with measure("uploads.stage") as m:
+            m.bytes = os.path.getsize(path)
+            digest = file_digest(path)
+            staged = os.path.join(str(self.folder), digest, os.path.basename(path))
+
+            if os.path.exists(staged):
+                m.attributes["result"] = "hit"
+                self.logger.debug("%s already staged at %s", path, staged)
+            else:
+                m.attributes["result"] = "miss"
+                os.makedirs(os.path.dirname(staged), exist_ok=True)
+                with open(path, "rb") as source, NamedTemporaryFile(
+                    dir=os.path.dirname(staged), prefix=".upload-", delete=False
+                ) as t:
+                    shutil.copyfileobj(source, t, CHUNK_SIZE)
+                os.chmod(t.name, 0o644)
+                os.replace(t.name, staged)
+                self.logger.info("Staged %s at %s", path, staged)
+
+        self._staged[path] = staged
+        return staged
+
+    def rewrite_uri(self, uri: str) -> str:
+        """Return the local:// URI of the staged copy of a local file, other URIs being returned unchanged.
+
+        A #name suffix, renaming an archive once extracted, is preserved.
+
+        Args:
+            uri: URI or path of the dependency
+        """
+        location, hash_sign, alias = uri.partition("#")
+        parsed = urlparse(location)
+        if parsed.scheme not in ("", "file") or not os.path.isfile(parsed.path):
+            return uri
+
+        return f"local://{self.stage(parsed.path)}{hash_sign}{alias}"
+
+    def rewrite_list(self, value: str) -> str:
+        """Return a comma-separated list of dependencies, with the local files replaced by their staged copies.
+
+        Args:
+            value: comma-separated list of URIs or paths
+        """
+        return ",".join(self.rewrite_uri(item) for item in value.split(",") if item)
+
+    def rewrite_properties(self, properties: PropertyFile) -> PropertyFile:
+        """Return the properties with the local files of the dependency lists replaced by their staged copies.
+
+        Args:
+            properties: merged properties of the submission
+        """
+        rewritten = {
+            key: self.rewrite_list(str(properties.props[key]))
+            for key in UPLOADED_PROPERTIES
+            if properties.props.get(key)
+        }
+        return properties + PropertyFile(rewritten) if rewritten else properties
+
+    def _rewrite_conf(self, conf: str) -> str:
+        key, equal, value = conf.partition("=")
+        return (
+            f"{key}{equal}{self.rewrite_list(value)}"
+            if key.strip() in UPLOADED_PROPERTIES and equal
+            else conf
+        )
+
+    def rewrite_args(self, args: List[str]) -> List[str]:
+        """Return the spark-submit arguments with the local files replaced by their staged copies.
+
+        The dependency options (--jars, --files, --py-files, --archives, --conf) and the application resource are
+        rewritten, while the arguments of the application are left unchanged.
+
+        Args:
+            args: arguments provided to spark-submit, after the ones consumed by spark-client
+        """
+        rewritten = []
+        index = 0
+        while index < len(args):
+            arg = args[index]
+            option, equal, value = arg.partition("=")
+
+            if option in OPTIONS_WITH_VALUE and equal:
+                rewritten.append(f"{option}={self._rewrite_value(option, value)}")
+            elif arg in OPTIONS_WITH_VALUE and index + 1 < len(args):
+                rewritten += [arg, self._rewrite_value(arg, args[index + 1])]
+                index += 1
+            elif arg.startswith("-"):
+                rewritten.append(arg)
+            else:
+                return rewritten + [self.rewrite_uri(arg)] + args[index + 1 :]
+            index += 1
+
+        return rewritten
+
+    def _rewrite_value(self, option: str, value: str) -> str:
+        if option in LIST_OPTIONS:
+            return self.rewrite_list(value)
+        if option in CONF_OPTIONS:
+            return self._rewrite_conf(value)
+        return value
+
+
+def stage_dependencies(
+    properties: PropertyFile, args: List[str]
+) -> Tuple[PropertyFile, List[str]]:
+    """Return the properties and spark-submit arguments of a cluster-mode submission, with staged local files.
+
+    Both are returned unchanged when spark.kubernetes.file.upload.path is not set or is not a folder.
+
+    Args:
+        properties: merged properties of the submission
+        args: arguments provided to spark-submit, after the ones consumed by spark-client
+    """
+    upload_path = properties.props.get("spark.kubernetes.file.upload.path")
+    if not upload_path:
+        return properties, args
+
+    cache = UploadCache(str(upload_path))
+    if not cache.enabled:
+        cache.logger.debug(
+            "Upload path %s is not a folder, leaving the uploads to Spark", upload_path
+        )
+        return properties, args
+
+    return cache.rewrite_properties(properties), cache.rewrite_args(args)
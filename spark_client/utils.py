@@ -3,16 +3,14 @@
 import errno
 import io
 import os
-import subprocess
+import re
+import threading
 from contextlib import contextmanager
 from copy import deepcopy as copy
 from functools import reduce
 from logging import Logger, getLogger
-from tempfile import NamedTemporaryFile
 from typing import Any, Callable, Dict, List, Literal, Mapping, TypedDict, Union
 
-import yaml
-
 PathLike = Union[str, "os.PathLike[str]"]
 
 LevelTypes = Literal[
@@ -48,11 +46,15 @@ class WithLogging:
     @property
     def logger(self) -> Logger:
         """
-        Create logger.
+        Return the logger of the class, created on first access and cached on the class.
         :return: default logger
         """
-        nameLogger = str(self.__class__).replace("<class '", "").replace("'>", "")
-        return getLogger(nameLogger)
+        cls = self.__class__
+        logger = cls.__dict__.get("_class_logger")
+        if logger is None:
+            logger = getLogger(f"{cls.__module__}.{cls.__qualname__}")
+            setattr(cls, "_class_logger", logger)
+        return logger
 
     def logResult(
         self, msg: Union[Callable[..., str], str], level: StrLevelTypes = "INFO"
@@ -65,6 +67,8 @@ class WithLogging:
         """
 
         def wrap(x: Any) -> Any:
+            if not self.logger.isEnabledFor(levels[level]):
+                return x
             if isinstance(msg, str):
                 self.logger.log(levels[level], msg)
             else:
@@ -105,11 +109,18 @@ def union(*dicts: dict) -> dict:
     return reduce(__dict_merge, dicts)
 
 
+_umask_lock = threading.Lock()
+
+
 def umask_named_temporary_file(*args, **kargs):
     """Return a temporary file descriptor readable by all users."""
+    from tempfile import NamedTemporaryFile
+
     file_desc = NamedTemporaryFile(*args, **kargs)
-    mask = os.umask(0o666)
-    os.umask(mask)
+    # the umask can only be read by setting it, hence serialize concurrent reads
+    with _umask_lock:
+        mask = os.umask(0o666)
+        os.umask(mask)
     os.chmod(file_desc.name, 0o666 & ~mask)
     return file_desc
 
@@ -141,6 +152,10 @@ def create_dir_if_not_exists(directory: PathLike) -> PathLike:
 
 
 def parse_yaml_shell_output(cmd: str) -> Union[Dict[str, Any], str]:
+    import subprocess
+
+    import yaml
+
     with io.StringIO() as buffer:
         buffer.write(
             subprocess.check_output(cmd, shell=True, stderr=None).decode("utf-8")
@@ -149,6 +164,29 @@ def parse_yaml_shell_output(cmd: str) -> Union[Dict[str, Any], str]:
         return yaml.safe_load(buffer)
 
 
+_VARIABLE_PATTERN = re.compile(r"\$(\w+|\{[^}]*\})", re.ASCII)
+
+
+def expand_vars(value: str, variables: Mapping[str, str]) -> str:
+    """
+    Return the value with $VAR and ${VAR} references substituted from the provided mapping.
+    References to variables missing from the mapping are left unchanged, as in os.path.expandvars.
+    :param value: string to be expanded
+    :param variables: mapping of variable names to their values
+    :return: expanded string
+    """
+    if "$" not in value:
+        return value
+
+    def substitute(match: "re.Match[str]") -> str:
+        name = match.group(1)
+        if name.startswith("{"):
+            name = name[1:-1]
+        return variables.get(name, match.group(0))
+
+    return _VARIABLE_PATTERN.sub(substitute, value)
+
+
 @contextmanager
 def environ(*remove, **update):
     """
@@ -215,6 +253,21 @@ def add_logging_arguments(parser):
     return parser
 
 
+def add_profile_arguments(parser):
+    """
+    Add profiling argument parsing to the existing parser context
+
+    :param parser: Input parser to decorate with parsing support for the profile flag.
+    """
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print a breakdown of the time spent in each operation to stderr.",
+    )
+
+    return parser
+
+
 def custom_parser(parser):
     """
     Add Spark related argument parsing to the existing parser context
@@ -222,7 +275,10 @@ def custom_parser(parser):
     :param parser: Input parser to decorate with parsing support for Spark params.
     """
     parser.add_argument(
-        "--master", default=None, type=str, help="Kubernetes control plane uri."
+        "--master",
+        default=None,
+        type=str,
+        help="Kubernetes control plane uri, or e.g. local[*] to run without Kubernetes.",
     )
     parser.add_argument(
         "--properties-file",
@@ -259,3 +315,51 @@ def add_deploy_arguments(parser):
         help="Deployment mode for job submission. Default is 'client'.",
     )
     return parser
+
+
+def add_python_dependency_arguments(parser):
+    """
+    Add Python dependency related argument parsing to the existing parser context
+
+    :param parser: Input parser to decorate with parsing support for Python dependency arguments.
+    """
+    parser.add_argument(
+        "--py-source",
+        default=None,
+        type=str,
+        help="Folder of Python sources, zipped once per content and shipped with spark.submit.pyFiles.",
+    )
+    parser.add_argument(
+        "--py-requirements",
+        default=None,
+        type=str,
+        help="Pip requirements file, installed once per content and shipped with spark.archives.",
+    )
+    return parser
+
+
+def add_batch_arguments(parser):
+    """
+    Add batch submission related argument parsing to the existing parser context
+
+    :param parser: Input parser to decorate with parsing support for batch arguments.
+    """
+    parser.add_argument(
+        "--manifest",
+        required=True,
+        type=str,
+        help="YAML or JSON file listing the jobs, each with its args and optionally name, conf and deploy-mode.",
+    )
+    parser.add_argument(
+        "--concurrency",
+        default=4,
+        type=int,
+        help="Maximum number of jobs launched at the same time. Default is 4.",
+    )
+    parser.add_argument(
+        "--summary-file",
+        default=None,
+        type=str,
+        help="JSON file the exit status and launch latency of each job are written to.",
+    )
+    return parser
@@ -1,5 +1,6 @@
 import os
 import random
+from typing import Iterable
 from unittest import TestCase, skipIf
 
 from helpers.utils import create_dir_if_not_exists  # type: ignore
@@ -25,3 +26,40 @@ class UnittestWithTmpFolder(TestCase):
     @classmethod
     def tearDownClass(cls) -> None:
         os.system(f"rm -rf {cls.TMP_FOLDER}/*")
+
+
+def make_snap(
+    snap: str,
+    script: str = "exit 0\n",
+    spark_defaults: str = "",
+    binaries: Iterable[str] = ("spark-submit",),
+) -> str:
+    """Create a snap layout whose Spark binaries are stub shell scripts, returning the folder of the snap.
+
+    Args:
+        snap: folder of the snap, created if missing
+        script: body of the shell script run by the Spark binaries
+        spark_defaults: content of conf/spark-defaults.conf
+        binaries: names of the Spark binaries created under bin/
+    """
+    os.makedirs(os.path.join(snap, "bin"), exist_ok=True)
+    os.makedirs(os.path.join(snap, "conf"), exist_ok=True)
+    with open(os.path.join(snap, "conf", "spark-defaults.conf"), "w") as fid:
+        fid.write(spark_defaults)
+
+    for binary in binaries:
+        with open(os.path.join(snap, "bin", binary), "w") as fid:
+            fid.write(f"#!/bin/sh\n{script}")
+        os.chmod(os.path.join(snap, "bin", binary), 0o755)
+
+    return snap
+
+
+def dump_properties(output: str) -> str:
+    """Return the script of a stub Spark binary copying the properties file it is passed to the output file."""
+    return (
+        "while [ $# -gt 0 ]; do\n"
+        f'  [ "$1" = "--properties-file" ] && cat "$2" > {output}\n'
+        "  shift\n"
+        "done\n"
+    )
@@ -0,0 +1,47 @@
+"""Shared fixtures of the benchmarks, running the CLIs offline against a stub snap and the fake kubectl."""
+
+import os
+import sys
+from typing import Dict, List
+
+from tests import fake_kubectl, make_snap
+
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+CLI_FOLDER = os.path.join(ROOT_FOLDER, "spark_client", "cli")
+KUBECTL_CMD = f"{sys.executable} {fake_kubectl.__file__}"
+
+CLI_COMMANDS = {
+    "spark-submit": ["spark-submit.py", "--deploy-mode", "client", "app.py"],
+    "spark-shell": ["spark-shell.py"],
+    "pyspark": ["pyspark.py"],
+    "service-account-registry": ["service-account-registry.py", "list"],
+}
+
+
+def stub_snap(folder: str, kube_config: str) -> Dict[str, str]:
+    """Create a snap layout whose Spark binaries exit immediately and whose kubectl is the fake one.
+
+    Returns the environment the CLIs are to be run with.
+    """
+    snap = make_snap(
+        os.path.join(folder, "snap"),
+        binaries=["spark-submit", "spark-shell", "pyspark"],
+    )
+
+    with open(os.path.join(snap, "kubectl"), "w") as fid:
+        fid.write(f'#!/bin/sh\nexec {KUBECTL_CMD} "$@"\n')
+    os.chmod(os.path.join(snap, "kubectl"), 0o755)
+
+    return dict(
+        os.environ,
+        SNAP=snap,
+        SNAP_USER_DATA=folder,
+        KUBECONFIG=kube_config,
+        PYTHONPATH=ROOT_FOLDER,
+    )
+
+
+def cli_command(name: str, *python_args: str) -> List[str]:
+    """Return the command line running the given CLI entry point with the current interpreter."""
+    args = CLI_COMMANDS[name]
+    return [sys.executable, *python_args, os.path.join(CLI_FOLDER, args[0])] + args[1:]
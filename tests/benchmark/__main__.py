@@ -0,0 +1,333 @@
+"""Benchmark suite running offline against the fake kubectl, writing the results to a JSON file.
+
+Usage: python -m tests.benchmark --output benchmark.json [--sizes 10 100 1000] [--latency 0.0] [--clients 1 8 32]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+from spark_client.domain import PropertyFile, ServiceAccount
+from spark_client.services import K8sServiceAccountRegistry, KubeInterface
+from tests import fake_kubectl
+from tests.benchmark import (
+    CLI_COMMANDS,
+    KUBECTL_CMD,
+    ROOT_FOLDER,
+    cli_command,
+    stub_snap,
+)
+
+
+def timeit(
+    name: str,
+    func: Callable[[int], Any],
+    repeat: int,
+    **params,
+) -> Dict[str, Any]:
+    timings = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func(i)
+        timings.append(time.perf_counter() - start)
+
+    result = {
+        "name": name,
+        **params,
+        "runs": repeat,
+        "mean": statistics.mean(timings),
+        "median": statistics.median(timings),
+        "min": min(timings),
+        "max": max(timings),
+    }
+    print(
+        f"{name:<32}{json.dumps(params):<28}{result['median'] * 1000:>10.1f} ms",
+        file=sys.stderr,
+        flush=True,
+    )
+    return result
+
+
+def bench_registry(
+    sizes: List[int], repeat: int, kube_config: str
+) -> List[Dict[str, Any]]:
+    results = []
+    registry = K8sServiceAccountRegistry(
+        KubeInterface(kube_config, kubectl_cmd=KUBECTL_CMD)
+    )
+
+    for size in sizes:
+        fake_kubectl.seed_accounts(os.environ[fake_kubectl.STATE_ENV], size)
+
+        results.append(
+            timeit("registry.all", lambda i: registry.all(), repeat, accounts=size)
+        )
+        results.append(
+            timeit(
+                "registry.get",
+                lambda i: registry.get(f"default:spark-{i % size}").configurations.props,  # type: ignore
+                repeat,
+                accounts=size,
+            )
+        )
+        results.append(
+            timeit(
+                "registry.get_primary",
+                lambda i: registry.get_primary(),
+                repeat,
+                accounts=size,
+            )
+        )
+        results.append(
+            timeit(
+                "registry.create",
+                lambda i: registry.create(
+                    ServiceAccount(
+                        f"bench-{i}",
+                        "default",
+                        registry.kube_interface.api_server,
+                        extra_confs=PropertyFile({"spark.app.name": "bench"}),
+                    )
+                ),
+                repeat,
+                accounts=size,
+            )
+        )
+        results.append(
+            timeit(
+                "registry.delete",
+                lambda i: registry.delete(f"default:bench-{i}"),
+                repeat,
+                accounts=size,
+            )
+        )
+
+    return results
+
+
+def bench_load(
+    clients: List[int], requests: int, kube_config: str, n_accounts: int
+) -> List[Dict[str, Any]]:
+    """Resolve the primary account from concurrent clients, counting the failures due to injected faults."""
+    results = []
+    registry = K8sServiceAccountRegistry(
+        KubeInterface(kube_config, kubectl_cmd=KUBECTL_CMD)
+    )
+    fake_kubectl.seed_accounts(os.environ[fake_kubectl.STATE_ENV], n_accounts)
+
+    def resolve(_: int) -> bool:
+        try:
+            registry.get_primary()
+            return True
+        except subprocess.CalledProcessError:
+            return False
+
+    for n_clients in clients:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=n_clients) as executor:
+            outcomes = list(executor.map(resolve, range(requests)))
+        elapsed = time.perf_counter() - start
+
+        result = {
+            "name": "load.get_primary",
+            "clients": n_clients,
+            "accounts": n_accounts,
+            "requests": requests,
+            "errors": outcomes.count(False),
+            "seconds": elapsed,
+            "throughput": requests / elapsed,
+        }
+        print(
+            f"{'load.get_primary':<32}{json.dumps({'clients': n_clients}):<28}"
+            f"{result['throughput']:>10.1f} req/s ({result['errors']} errors)",
+            file=sys.stderr,
+            flush=True,
+        )
+        results.append(result)
+
+    return results
+
+
+def bench_property_file(
+    folder: str, sizes: List[int], repeat: int
+) -> List[Dict[str, Any]]:
+    results = []
+
+    for size in sizes:
+        filenames = []
+        for index in range(2):
+            filename = os.path.join(folder, f"properties-{size}-{index}.conf")
+            with open(filename, "w") as fid:
+                for key in range(size):
+                    fid.write(f"spark.bench.key{key + index * size // 2}=value-{key}\n")
+                fid.write(
+                    f"spark.driver.extraJavaOptions=-Dkey{index}=value -Dshared=value{index}\n"
+                )
+            filenames.append(filename)
+
+        results.append(
+            timeit(
+                "property_file.read",
+                lambda i: PropertyFile.read(filenames[0]),
+                repeat,
+                keys=size,
+            )
+        )
+
+        left, right = PropertyFile.read(filenames[0]), PropertyFile.read(filenames[1])
+        results.append(
+            timeit(
+                "property_file.union",
+                lambda i: left + right,
+                repeat,
+                keys=size,
+            )
+        )
+
+    return results
+
+
+def bench_cli(
+    folder: str, repeat: int, kube_config: str, n_accounts: int
+) -> List[Dict[str, Any]]:
+    env = stub_snap(folder, kube_config)
+    fake_kubectl.seed_accounts(os.environ[fake_kubectl.STATE_ENV], n_accounts)
+
+    results = []
+    for name in CLI_COMMANDS:
+        cmd = cli_command(name)
+        results.append(
+            timeit(
+                "cli.cold_start",
+                lambda i: subprocess.run(
+                    cmd,
+                    env=env,
+                    check=True,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                ),
+                repeat,
+                command=name,
+            )
+        )
+
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "HEAD"], cwd=ROOT_FOLDER, stderr=subprocess.DEVNULL
+            )
+            .decode("utf-8")
+            .strip()
+        )
+    except Exception:
+        return "unknown"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--output", default="benchmark.json", help="File the results are written to."
+    )
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        type=int,
+        default=[10, 100, 1000],
+        help="Numbers of service accounts in the fake cluster.",
+    )
+    parser.add_argument(
+        "--property-sizes",
+        nargs="+",
+        type=int,
+        default=[1000, 10000, 100000],
+        help="Numbers of keys in the benchmarked properties files.",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Number of runs of each benchmark."
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="Latency in seconds added to every kubectl call.",
+    )
+    parser.add_argument(
+        "--clients",
+        nargs="+",
+        type=int,
+        default=[1, 8, 32],
+        help="Numbers of concurrent clients in the load benchmark.",
+    )
+    parser.add_argument(
+        "--requests",
+        type=int,
+        default=64,
+        help="Number of resolutions issued in the load benchmark.",
+    )
+    parser.add_argument(
+        "--jitter",
+        type=float,
+        default=0.0,
+        help="Maximum random latency in seconds added to every kubectl call.",
+    )
+    parser.add_argument(
+        "--error-rate-429",
+        type=float,
+        default=0.0,
+        help="Probability of kubectl calls failing with 429 in the load benchmark.",
+    )
+    parser.add_argument(
+        "--error-rate-5xx",
+        type=float,
+        default=0.0,
+        help="Probability of kubectl calls failing with 500 in the load benchmark.",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        os.environ[fake_kubectl.STATE_ENV] = os.path.join(folder, "state.json")
+        os.environ[fake_kubectl.LATENCY_ENV] = str(args.latency)
+        os.environ[fake_kubectl.JITTER_ENV] = str(args.jitter)
+
+        kube_config = os.path.join(folder, "kubeconfig")
+        fake_kubectl.write_kube_config(kube_config)
+
+        results = (
+            bench_registry(args.sizes, args.repeat, kube_config)
+            + bench_property_file(folder, args.property_sizes, args.repeat)
+            + bench_cli(folder, args.repeat, kube_config, min(args.sizes))
+        )
+
+        os.environ[fake_kubectl.TOO_MANY_REQUESTS_RATE_ENV] = str(args.error_rate_429)
+        os.environ[fake_kubectl.SERVER_ERROR_RATE_ENV] = str(args.error_rate_5xx)
+        results += bench_load(args.clients, args.requests, kube_config, max(args.sizes))
+
+    with open(args.output, "w") as fid:
+        json.dump(
+            {
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "timestamp": time.time(),
+                "latency": args.latency,
+                "jitter": args.jitter,
+                "error_rate_429": args.error_rate_429,
+                "error_rate_5xx": args.error_rate_5xx,
+                "repeat": args.repeat,
+                "results": results,
+            },
+            fid,
+            indent=2,
+        )
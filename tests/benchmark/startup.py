@@ -0,0 +1,143 @@
+"""Startup benchmark checking the import time and the time-to-exec of each CLI entry point against a budget.
+
+Usage: python -m tests.benchmark.startup [--import-budget 25] [--exec-budget 150] [--repeat 5]
+
+Import times are taken from `python -X importtime`, summing the top-level imports. The time-to-exec is the wall-clock
+time of the command against a stub snap whose Spark binaries exit immediately, with the fake kubectl. Budgets are
+multiples of the same measures taken on a bare `python -c pass`, run right before each command, so that they hold on
+hosts of any speed. The exit code is non-zero when an entry point is over budget.
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Tuple
+
+from tests import fake_kubectl
+from tests.benchmark import CLI_COMMANDS, cli_command, stub_snap
+
+_IMPORT_TIME_PATTERN = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def import_time_ms(stderr: str) -> float:
+    """Return the cumulative time spent importing the top-level modules, from the output of -X importtime."""
+    total = 0
+    for line in stderr.splitlines():
+        match = _IMPORT_TIME_PATTERN.match(line)
+        # top-level imports are indented by a single space
+        if match is not None and len(match.group(3)) == 1:
+            total += int(match.group(2))
+    return total / 1000
+
+
+def timed_run(cmd: List[str], env: Dict[str, str]) -> Tuple[float, float]:
+    """Run the command with -X importtime and return its import time and wall-clock time, in milliseconds."""
+    start = time.perf_counter()
+    process = subprocess.run(
+        cmd, env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    elapsed = (time.perf_counter() - start) * 1000
+    return import_time_ms(process.stderr.decode("utf-8")), elapsed
+
+
+def bench_startup(env: Dict[str, str], repeat: int) -> List[Dict[str, Any]]:
+    baseline_cmd = [sys.executable, "-X", "importtime", "-c", "pass"]
+
+    results = []
+    for name in CLI_COMMANDS:
+        measures: Dict[str, List[float]] = {
+            key: [] for key in ["import", "exec", "import_ratio", "exec_ratio"]
+        }
+        for _ in range(repeat):
+            # the baseline is interleaved with the command, so that both are equally affected by the host load
+            baseline_import, baseline_exec = timed_run(baseline_cmd, env)
+            imports, timing = timed_run(cli_command(name, "-X", "importtime"), env)
+
+            measures["import"].append(imports)
+            measures["exec"].append(timing)
+            measures["import_ratio"].append(imports / baseline_import)
+            measures["exec_ratio"].append(timing / baseline_exec)
+
+        results.append(
+            {
+                "command": name,
+                "import_ms": statistics.median(measures["import"]),
+                "exec_ms": statistics.median(measures["exec"]),
+                "import_ratio": statistics.median(measures["import_ratio"]),
+                "exec_ratio": statistics.median(measures["exec_ratio"]),
+            }
+        )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--import-budget",
+        type=float,
+        default=25.0,
+        help="Maximum median import time of each entry point, as a multiple of the one of a bare interpreter.",
+    )
+    parser.add_argument(
+        "--exec-budget",
+        type=float,
+        default=150.0,
+        help="Maximum median time-to-exec of each entry point, as a multiple of the one of a bare interpreter.",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Number of runs of each entry point."
+    )
+    parser.add_argument(
+        "--output", default=None, help="File the results are written to, if any."
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        kube_config = os.path.join(folder, "kubeconfig")
+        fake_kubectl.write_kube_config(kube_config)
+
+        env = stub_snap(folder, kube_config)
+        env[fake_kubectl.STATE_ENV] = os.path.join(folder, "state.json")
+        fake_kubectl.seed_accounts(env[fake_kubectl.STATE_ENV], 10)
+
+        results = bench_startup(env, args.repeat)
+
+    over_budget = []
+    for result in results:
+        failures = [
+            label
+            for label, value, budget in [
+                ("import", result["import_ratio"], args.import_budget),
+                ("exec", result["exec_ratio"], args.exec_budget),
+            ]
+            if value > budget
+        ]
+        print(
+            f"{result['command']:<28}"
+            f"import {result['import_ms']:>8.1f} ms ({result['import_ratio']:>5.1f}x)"
+            f"    exec {result['exec_ms']:>8.1f} ms ({result['exec_ratio']:>5.1f}x)"
+            + (f"    OVER BUDGET ({', '.join(failures)})" if failures else ""),
+            file=sys.stderr,
+        )
+        if failures:
+            over_budget.append(result["command"])
+
+    if args.output is not None:
+        with open(args.output, "w") as fid:
+            json.dump(
+                {
+                    "import_budget": args.import_budget,
+                    "exec_budget": args.exec_budget,
+                    "results": results,
+                },
+                fid,
+                indent=2,
+            )
+
+    sys.exit(1 if over_budget else 0)
@@ -0,0 +1,568 @@
+#!/usr/bin/env python3
+"""Fake kubectl executable simulating a K8s API server, keeping the resources in a JSON state file.
+
+Point a KubeInterface to it with kubectl_cmd=f"{sys.executable} {fake_kubectl.__file__}" and select the state file with
+the FAKE_KUBECTL_STATE environment variable. Serviceaccounts, roles, rolebindings and secrets are supported, with label
+and field selectors, pagination, watch and merge patch. Concurrent invocations are serialized by a lock on the state.
+
+Faults can be injected for every invocation with the following environment variables:
+    FAKE_KUBECTL_LATENCY: delay in seconds
+    FAKE_KUBECTL_JITTER: maximum extra delay in seconds, drawn uniformly
+    FAKE_KUBECTL_429_RATE: probability of failing with 429 Too Many Requests
+    FAKE_KUBECTL_5XX_RATE: probability of failing with 500 Internal Server Error
+"""
+
+import base64
+import fcntl
+import json
+import os
+import random
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import yaml
+
+STATE_ENV = "FAKE_KUBECTL_STATE"
+LATENCY_ENV = "FAKE_KUBECTL_LATENCY"
+JITTER_ENV = "FAKE_KUBECTL_JITTER"
+TOO_MANY_REQUESTS_RATE_ENV = "FAKE_KUBECTL_429_RATE"
+SERVER_ERROR_RATE_ENV = "FAKE_KUBECTL_5XX_RATE"
+
+MANAGER_LABEL = "app.kubernetes.io/managed-by"
+PRIMARY_LABEL = "app.kubernetes.io/spark-client-primary"
+
+MAX_EVENTS = 1000
+WATCH_POLL_SECONDS = 0.05
+BOOKMARK_SECONDS = 1.0
+
+KINDS = {
+    "serviceaccount": ("ServiceAccount", "serviceaccounts"),
+    "role": ("Role", "roles"),
+    "rolebinding": ("RoleBinding", "rolebindings"),
+    "secret": ("Secret", "secrets"),
+}
+
+ALIASES = {
+    **{kind: kind for kind in KINDS},
+    **{plural: kind for kind, (_, plural) in KINDS.items()},
+    "sa": "serviceaccount",
+}
+
+
+class ApiError(Exception):
+    def __init__(self, reason: str, message: str):
+        super().__init__(f"Error from server ({reason}): {message}")
+
+
+def empty_state() -> Dict[str, Any]:
+    return {
+        "resourceVersion": 0,
+        "compacted": 0,
+        "events": [],
+        **{kind: {} for kind in KINDS},
+    }
+
+
+@contextmanager
+def locked_state(filename: str, write: bool = False) -> Iterator[Dict[str, Any]]:
+    with open(f"{filename}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX if write else fcntl.LOCK_SH)
+
+        state = empty_state()
+        if os.path.exists(filename):
+            with open(filename) as fid:
+                state = json.load(fid)
+
+        yield state
+
+        if write:
+            with open(f"{filename}.tmp", "w") as fid:
+                json.dump(state, fid)
+            os.replace(f"{filename}.tmp", filename)
+
+
+def record(state: Dict[str, Any], kind: str, event_type: str, resource: Dict[str, Any]):
+    state["resourceVersion"] += 1
+    resource["metadata"]["resourceVersion"] = str(state["resourceVersion"])
+
+    state["events"].append(
+        {"kind": kind, "type": event_type, "object": json.loads(json.dumps(resource))}
+    )
+    if len(state["events"]) > MAX_EVENTS:
+        dropped = state["events"].pop(0)
+        state["compacted"] = int(dropped["object"]["metadata"]["resourceVersion"])
+
+
+def new_resource(
+    state: Dict[str, Any],
+    kind: str,
+    name: str,
+    namespace: str,
+    labels: Optional[Dict[str, str]] = None,
+    **fields,
+) -> Dict[str, Any]:
+    resource = {
+        "apiVersion": (
+            "rbac.authorization.k8s.io/v1" if kind in ["role", "rolebinding"] else "v1"
+        ),
+        "kind": KINDS[kind][0],
+        "metadata": {
+            "name": name,
+            "namespace": namespace,
+            "labels": dict(labels or {}),
+        },
+        **fields,
+    }
+    state[kind][f"{namespace}/{name}"] = resource
+    record(state, kind, "ADDED", resource)
+    return resource
+
+
+def seed_accounts(filename: str, n_accounts: int, namespace: str = "default"):
+    """Write a state file with n_accounts spark-client service accounts, the first one being primary."""
+    state = empty_state()
+    managed = {MANAGER_LABEL: "spark-client"}
+    for index in range(n_accounts):
+        name = f"spark-{index}"
+        labels = {**managed, PRIMARY_LABEL: "True"} if index == 0 else managed
+        new_resource(state, "serviceaccount", name, namespace, labels)
+        new_resource(state, "role", f"{name}-role", namespace, managed)
+        new_resource(state, "rolebinding", f"{name}-role-binding", namespace, labels)
+        new_resource(
+            state,
+            "secret",
+            f"spark-client-sa-conf-{name}",
+            namespace,
+            managed,
+            data={
+                "spark.app.name": base64.b64encode(name.encode("utf-8")).decode("utf-8")
+            },
+        )
+
+    state["events"] = []
+    state["compacted"] = state["resourceVersion"]
+
+    with open(filename, "w") as fid:
+        json.dump(state, fid)
+
+
+def write_kube_config(filename: str, server: str = "https://fake-api-server:6443"):
+    """Write a kube config file with a single context pointing to the provided server."""
+    with open(filename, "w") as fid:
+        yaml.safe_dump(
+            {
+                "apiVersion": "v1",
+                "kind": "Config",
+                "current-context": "fake",
+                "clusters": [{"name": "fake", "cluster": {"server": server}}],
+                "contexts": [
+                    {
+                        "name": "fake",
+                        "context": {
+                            "cluster": "fake",
+                            "user": "admin",
+                            "namespace": "default",
+                        },
+                    }
+                ],
+                "users": [{"name": "admin", "user": {"token": "fake"}}],
+            },
+            fid,
+        )
+
+
+def matches_labels(resource: Dict[str, Any], selectors: List[str]) -> bool:
+    labels = resource["metadata"].get("labels") or {}
+    for selector in selectors:
+        for requirement in filter(None, selector.split(",")):
+            if "!=" in requirement:
+                key, value = requirement.split("!=", 1)
+                if labels.get(key) == value:
+                    return False
+            elif "=" in requirement:
+                key, value = requirement.replace("==", "=").split("=", 1)
+                if labels.get(key) != value:
+                    return False
+            elif requirement.startswith("!"):
+                if requirement[1:] in labels:
+                    return False
+            elif requirement not in labels:
+                return False
+    return True
+
+
+def matches_fields(resource: Dict[str, Any], selector: Optional[str]) -> bool:
+    for requirement in filter(None, (selector or "").split(",")):
+        field, value = requirement.split("=", 1)
+        if resource["metadata"].get(field.replace("metadata.", "")) != value:
+            return False
+    return True
+
+
+def matches(
+    resource: Dict[str, Any],
+    namespace: Optional[str],
+    labels: List[str],
+    fields: Optional[str] = None,
+) -> bool:
+    return (
+        (namespace is None or resource["metadata"]["namespace"] == namespace)
+        and matches_labels(resource, labels)
+        and matches_fields(resource, fields)
+    )
+
+
+def select(
+    state: Dict[str, Any],
+    kind: str,
+    namespace: Optional[str],
+    labels: List[str],
+    fields: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    return [
+        resource
+        for _, resource in sorted(state[kind].items())
+        if matches(resource, namespace, labels, fields)
+    ]
+
+
+def merge_patch(target: Any, patch: Any) -> Any:
+    if not isinstance(patch, dict):
+        return patch
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = merge_patch(result.get(key), value)
+    return result
+
+
+def parse_raw_url(url: str) -> Tuple[str, Optional[str], Dict[str, str]]:
+    parsed = urlparse(url)
+    query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+
+    parts = parsed.path.strip("/").split("/")
+    if len(parts) == 5 and parts[2] == "namespaces" and parts[4] in ALIASES:
+        return ALIASES[parts[4]], parts[3], query
+    if len(parts) == 3 and parts[2] in ALIASES:
+        return ALIASES[parts[2]], None, query
+    raise ApiError("NotFound", "the server could not find the requested resource")
+
+
+def list_raw(state: Dict[str, Any], url: str) -> str:
+    kind, namespace, query = parse_raw_url(url)
+
+    items = select(
+        state,
+        kind,
+        namespace,
+        [query["labelSelector"]] if "labelSelector" in query else [],
+        query.get("fieldSelector"),
+    )
+
+    offset = int(query.get("continue") or 0)
+    limit = int(query.get("limit") or 0) or len(items)
+    page = items[offset : offset + limit]
+    continue_token = str(offset + limit) if offset + limit < len(items) else ""
+
+    return json.dumps(
+        {
+            "kind": f"{KINDS[kind][0]}List",
+            "apiVersion": "v1",
+            "metadata": {
+                "resourceVersion": str(state["resourceVersion"]),
+                "continue": continue_token,
+            },
+            "items": page,
+        }
+    )
+
+
+def watch_raw(state_file: str, url: str) -> Iterator[Dict[str, Any]]:
+    kind, namespace, query = parse_raw_url(url)
+    labels = [query["labelSelector"]] if "labelSelector" in query else []
+    deadline = time.monotonic() + float(query.get("timeoutSeconds") or 300)
+
+    with locked_state(state_file) as state:
+        resource_version = int(query.get("resourceVersion") or state["resourceVersion"])
+        if resource_version < state["compacted"]:
+            yield {
+                "type": "ERROR",
+                "object": {
+                    "kind": "Status",
+                    "status": "Failure",
+                    "reason": "Expired",
+                    "code": 410,
+                    "message": f"too old resource version: {resource_version}",
+                },
+            }
+            return
+
+    bookmark = time.monotonic() + BOOKMARK_SECONDS
+    while time.monotonic() < deadline:
+        with locked_state(state_file) as state:
+            events = [
+                event
+                for event in state["events"]
+                if int(event["object"]["metadata"]["resourceVersion"])
+                > resource_version
+            ]
+
+        for event in events:
+            resource_version = int(event["object"]["metadata"]["resourceVersion"])
+            if event["kind"] == kind and matches(
+                event["object"], namespace, labels, query.get("fieldSelector")
+            ):
+                yield {"type": event["type"], "object": event["object"]}
+
+        if query.get("allowWatchBookmarks") == "true" and time.monotonic() >= bookmark:
+            bookmark = time.monotonic() + BOOKMARK_SECONDS
+            yield {
+                "type": "BOOKMARK",
+                "object": {
+                    "kind": KINDS[kind][0],
+                    "metadata": {"resourceVersion": str(resource_version)},
+                },
+            }
+
+        time.sleep(WATCH_POLL_SECONDS)
+
+
+def parse_args(args: List[str]) -> Tuple[List[str], Dict[str, Any]]:
+    positional: List[str] = []
+    options: Dict[str, Any] = {"labels": [], "extra": {}}
+
+    iterator = iter(args)
+    for arg in iterator:
+        if arg in ["--kubeconfig", "--context"]:
+            next(iterator)
+        elif arg in ["--namespace", "-n"]:
+            options["namespace"] = next(iterator)
+        elif arg == "-o":
+            options["output"] = next(iterator)
+        elif arg == "-l":
+            options["labels"].append(next(iterator))
+        elif arg == "-A":
+            options["all_namespaces"] = True
+        elif arg == "--ignore-not-found":
+            options["ignore_not_found"] = True
+        elif arg == "--raw":
+            options["raw"] = next(iterator)
+        elif arg in ["-p", "--patch"]:
+            options["patch"] = next(iterator)
+        elif arg == "--type":
+            options["extra"]["type"] = [next(iterator)]
+        elif arg.startswith("--"):
+            key, value = arg[2:].split("=", 1)
+            options["extra"].setdefault(key, []).append(value)
+        else:
+            positional.append(arg)
+
+    return positional, options
+
+
+def render(resource: Dict[str, Any], output: Optional[str]) -> str:
+    if output == "name":
+        return f"{resource['kind'].lower()}/{resource['metadata']['name']}\n"
+    if output == "json":
+        return json.dumps(resource)
+    return yaml.safe_dump(resource)
+
+
+def not_found(kind: str, name: str) -> ApiError:
+    return ApiError("NotFound", f'{KINDS[kind][1]} "{name}" not found')
+
+
+def get(
+    state_file: str, rest: List[str], namespace: str, options: Dict[str, Any]
+) -> str:
+    if "raw" in options:
+        with locked_state(state_file) as state:
+            return list_raw(state, options["raw"])
+
+    kind = ALIASES[rest[0]]
+    with locked_state(state_file) as state:
+        if len(rest) > 1:
+            resource = state[kind].get(f"{namespace}/{rest[1]}")
+            if resource is None:
+                if options.get("ignore_not_found"):
+                    return ""
+                raise not_found(kind, rest[1])
+            return render(resource, options.get("output"))
+
+        items = select(
+            state,
+            kind,
+            None if options.get("all_namespaces") else namespace,
+            options["labels"],
+        )
+        return yaml.safe_dump({"apiVersion": "v1", "items": items})
+
+
+def creation_fields(kind: str, extra: Dict[str, List[str]]) -> Dict[str, Any]:
+    if kind == "secret":
+        data = {}
+        for env_file in extra.get("from-env-file", []):
+            with open(env_file) as fid:
+                for line in filter(None, map(str.strip, fid)):
+                    key, value = line.split("=", 1)
+                    data[key] = base64.b64encode(value.encode("utf-8")).decode("utf-8")
+        return {"data": data}
+    if kind == "role":
+        return {
+            "rules": [
+                {
+                    "apiGroups": [""],
+                    "resources": extra.get("resource", []),
+                    "verbs": extra.get("verb", []),
+                }
+            ]
+        }
+    if kind == "rolebinding":
+        return {
+            "roleRef": {"kind": "Role", "name": extra["role"][0]},
+            "subjects": [
+                {"kind": "ServiceAccount", "name": sa.split(":")[1]}
+                for sa in extra.get("serviceaccount", [])
+            ],
+        }
+    return {}
+
+
+def create(
+    state_file: str, rest: List[str], namespace: str, options: Dict[str, Any]
+) -> str:
+    if rest[:2] == ["secret", "generic"]:
+        rest = ["secret"] + rest[2:]
+    kind, name = ALIASES[rest[0]], rest[1]
+    with locked_state(state_file, write=True) as state:
+        if f"{namespace}/{name}" in state[kind]:
+            raise ApiError("AlreadyExists", f'{KINDS[kind][1]} "{name}" already exists')
+        fields = creation_fields(kind, options["extra"])
+        return render(
+            new_resource(state, kind, name, namespace, **fields), options.get("output")
+        )
+
+
+def delete(
+    state_file: str, rest: List[str], namespace: str, options: Dict[str, Any]
+) -> str:
+    kind, name = ALIASES[rest[0]], rest[1]
+    with locked_state(state_file, write=True) as state:
+        resource = state[kind].pop(f"{namespace}/{name}", None)
+        if resource is None:
+            if options.get("ignore_not_found"):
+                return ""
+            raise not_found(kind, name)
+        record(state, kind, "DELETED", resource)
+        return render(resource, options.get("output"))
+
+
+def label(
+    state_file: str, rest: List[str], namespace: str, options: Dict[str, Any]
+) -> str:
+    kind, name = ALIASES[rest[0]], rest[1]
+    with locked_state(state_file, write=True) as state:
+        resource = state[kind].get(f"{namespace}/{name}")
+        if resource is None:
+            raise not_found(kind, name)
+
+        for item in rest[2:]:
+            if item.endswith("-"):
+                resource["metadata"]["labels"].pop(item[:-1], None)
+            else:
+                key, value = item.split("=", 1)
+                resource["metadata"]["labels"][key] = value
+
+        record(state, kind, "MODIFIED", resource)
+        return render(resource, options.get("output"))
+
+
+def patch(
+    state_file: str, rest: List[str], namespace: str, options: Dict[str, Any]
+) -> str:
+    kind, name = ALIASES[rest[0]], rest[1]
+    with locked_state(state_file, write=True) as state:
+        resource = state[kind].get(f"{namespace}/{name}")
+        if resource is None:
+            raise not_found(kind, name)
+
+        if options["extra"].get("type", ["strategic"])[0] == "json":
+            raise ApiError("BadRequest", "json patches are not supported")
+        resource = merge_patch(resource, json.loads(options["patch"]))
+        state[kind][f"{namespace}/{name}"] = resource
+
+        record(state, kind, "MODIFIED", resource)
+        return render(resource, options.get("output"))
+
+
+VERBS: Dict[str, Callable[[str, List[str], str, Dict[str, Any]], str]] = {
+    "get": get,
+    "create": create,
+    "delete": delete,
+    "label": label,
+    "patch": patch,
+}
+
+
+def run(args: List[str], state_file: str) -> str:
+    positional, options = parse_args(args)
+    verb, rest = positional[0], positional[1:]
+
+    if verb not in VERBS:
+        raise ApiError("BadRequest", f"unsupported command {' '.join(positional)}")
+
+    return VERBS[verb](state_file, rest, options.get("namespace", "default"), options)
+
+
+def inject_faults():
+    latency = float(os.environ.get(LATENCY_ENV, "0")) + random.uniform(
+        0, float(os.environ.get(JITTER_ENV, "0"))
+    )
+    if latency > 0:
+        time.sleep(latency)
+
+    draw = random.random()
+    too_many_requests_rate = float(os.environ.get(TOO_MANY_REQUESTS_RATE_ENV, "0"))
+    server_error_rate = float(os.environ.get(SERVER_ERROR_RATE_ENV, "0"))
+
+    if draw < too_many_requests_rate:
+        raise ApiError(
+            "TooManyRequests",
+            "the server has received too many requests and has asked us to try again later",
+        )
+    if draw < too_many_requests_rate + server_error_rate:
+        raise ApiError(
+            "InternalError",
+            'an error on the server ("") has prevented the request from succeeding',
+        )
+
+
+def main() -> int:
+    state_file = os.environ[STATE_ENV]
+
+    try:
+        inject_faults()
+
+        _, options = parse_args(sys.argv[1:])
+        if "raw" in options and "watch=true" in options["raw"]:
+            for event in watch_raw(state_file, options["raw"]):
+                sys.stdout.write(json.dumps(event) + "\n")
+                sys.stdout.flush()
+            return 0
+
+        sys.stdout.write(run(sys.argv[1:], state_file))
+        return 0
+    except ApiError as e:
+        sys.stderr.write(f"{e}\n")
+        return 1
+    except BrokenPipeError:
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+import logging
+import os
+import threading
+import time
+import unittest
+import uuid
+
+from spark_client.agent import AgentClient, AgentServer
+from spark_client.domain import PropertyFile, ServiceAccount
+from spark_client.exceptions import AgentUnavailable
+from spark_client.services import InMemoryAccountRegistry, KubeInterface
+from spark_client.throttling import RetryPolicy, TokenBucket
+from tests import UnittestWithTmpFolder
+
+
+class TestAgent(UnittestWithTmpFolder):
+    def test_agent_resolve(self):
+        kubeconfig = str(uuid.uuid4())
+        context = str(uuid.uuid4())
+        name = str(uuid.uuid4())
+        namespace = str(uuid.uuid4())
+        api_server = str(uuid.uuid4())
+        props = {str(uuid.uuid4()): str(uuid.uuid4())}
+        socket_path = os.path.join(self.TMP_FOLDER, "agent.sock")
+
+        service_account = ServiceAccount(
+            name=name,
+            namespace=namespace,
+            api_server=api_server,
+            primary=True,
+            extra_confs=PropertyFile(props),
+        )
+        factory_calls = []
+
+        def registry_factory(kube_interface):
+            factory_calls.append(kube_interface.context_name)
+            return InMemoryAccountRegistry({service_account.id: service_account})
+
+        agent = AgentServer(
+            socket_path,
+            KubeInterface(kubeconfig, context_name=context),
+            registry_factory=registry_factory,
+        )
+        thread = threading.Thread(target=agent.serve_forever, daemon=True)
+        thread.start()
+
+        client = AgentClient(socket_path)
+        for _ in range(100):
+            if client.ping(kubeconfig):
+                break
+            time.sleep(0.01)
+
+        try:
+            primary = client.resolve(kubeconfig, None, None, None)
+            self.assertEqual(primary.id, service_account.id)
+            self.assertEqual(primary.api_server, api_server)
+            self.assertEqual(primary.extra_confs.props, props)
+
+            other = client.resolve(kubeconfig, None, name, namespace)
+            self.assertEqual(other.id, service_account.id)
+
+            self.assertIsNone(client.resolve(kubeconfig, None, "other", namespace))
+            self.assertEqual(factory_calls, [context])
+
+            with self.assertRaises(AgentUnavailable):
+                client.resolve(str(uuid.uuid4()), None, None, None)
+        finally:
+            agent.shutdown()
+            thread.join()
+
+        self.assertFalse(os.path.exists(socket_path))
+
+    def test_agent_reload_keeps_throttling(self):
+        kubeconfig = os.path.join(self.TMP_FOLDER, str(uuid.uuid4()))
+        with open(kubeconfig, "w") as fid:
+            fid.write("{}")
+        context = str(uuid.uuid4())
+        rate_limiter = TokenBucket(qps=10.0)
+        retry_policy = RetryPolicy(base_delay=0.0)
+
+        agent = AgentServer(
+            os.path.join(self.TMP_FOLDER, "agent.sock"),
+            KubeInterface(
+                kubeconfig,
+                context_name=context,
+                rate_limiter=rate_limiter,
+                retry_policy=retry_policy,
+            ),
+            registry_factory=lambda kube_interface: InMemoryAccountRegistry({}),
+        )
+        previous = agent.kube_interface
+
+        os.utime(kubeconfig, (0, 0))
+        agent._reload_if_changed()
+
+        self.assertIsNot(agent.kube_interface, previous)
+        self.assertEqual(agent.kube_interface.kube_config_file, kubeconfig)
+        self.assertEqual(agent.kube_interface.context_name, context)
+        self.assertIs(agent.kube_interface.rate_limiter, rate_limiter)
+        self.assertIs(agent.kube_interface.retry_policy, retry_policy)
+
+    def test_agent_not_running(self):
+        client = AgentClient(os.path.join(self.TMP_FOLDER, str(uuid.uuid4())))
+        self.assertFalse(client.ping(str(uuid.uuid4())))
+        with self.assertRaises(AgentUnavailable):
+            client.resolve(str(uuid.uuid4()), None, None, None)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(message)s", level="DEBUG")
+    unittest.main()
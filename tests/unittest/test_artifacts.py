@@ -0,0 +1,406 @@
+import hashlib
+import logging
+import os
+import shutil
+import unittest
+import uuid
+from unittest.mock import patch
+
+from spark_client.artifacts import (
+    ArtifactCache,
+    Coordinate,
+    MavenResolver,
+    compare_versions,
+    with_cached_packages,
+)
+from spark_client.domain import Defaults, PropertyFile
+from spark_client.exceptions import ArtifactResolutionError
+from spark_client.instrumentation import add_listener, remove_listener
+from spark_client.services import SparkDeployMode, SparkInterface
+from tests import UnittestWithTmpFolder, dump_properties, make_snap
+
+POM = """<?xml version="1.0" encoding="UTF-8"?>
+<project xmlns="http://maven.apache.org/POM/4.0.0">
+  <modelVersion>4.0.0</modelVersion>
+  {parent}
+  <groupId>{group}</groupId>
+  <artifactId>{artifact}</artifactId>
+  <version>{version}</version>
+  {body}
+</project>
+"""
+
+
+def dependency(coordinate: str, extra: str = "") -> str:
+    group, artifact, *version = coordinate.split(":")
+    return (
+        f"<dependency><groupId>{group}</groupId><artifactId>{artifact}</artifactId>"
+        + (f"<version>{version[0]}</version>" if version else "")
+        + f"{extra}</dependency>"
+    )
+
+
+class TestArtifacts(UnittestWithTmpFolder):
+    def setUp(self) -> None:
+        self.repository = os.path.join(self.TMP_FOLDER, str(uuid.uuid4()))
+        self.cache_folder = os.path.join(self.TMP_FOLDER, str(uuid.uuid4()))
+        self.home = os.path.join(self.TMP_FOLDER, str(uuid.uuid4()))
+
+        # the default remote repositories are replaced by missing local ones, keeping the tests offline
+        self.central = f"file://{self.TMP_FOLDER}/{uuid.uuid4()}"
+        self.spark_packages = f"file://{self.TMP_FOLDER}/{uuid.uuid4()}"
+        environ = patch.dict(os.environ, {"DEFAULT_ARTIFACT_REPOSITORY": self.central})
+        environ.start()
+        self.addCleanup(environ.stop)
+        spark_packages = patch(
+            "spark_client.artifacts.SPARK_PACKAGES", self.spark_packages
+        )
+        spark_packages.start()
+        self.addCleanup(spark_packages.stop)
+
+        self.publish(
+            "com.example:parent:1.0",
+            "<packaging>pom</packaging>"
+            "<properties><lib.version>2.0</lib.version></properties>"
+            "<dependencyManagement><dependencies>"
+            + dependency("com.example:lib:${lib.version}")
+            + dependency("com.example:bom:1.0", "<type>pom</type><scope>import</scope>")
+            + "</dependencies></dependencyManagement>",
+            jar=False,
+        )
+        self.publish(
+            "com.example:bom:1.0",
+            "<packaging>pom</packaging><dependencyManagement><dependencies>"
+            + dependency("com.example:util:1.1")
+            + "</dependencies></dependencyManagement>",
+            jar=False,
+        )
+        self.publish(
+            "com.example:app:1.0",
+            "<dependencies>"
+            + dependency(
+                "com.example:lib",
+                "<exclusions><exclusion><groupId>com.example</groupId>"
+                "<artifactId>excluded</artifactId></exclusion></exclusions>",
+            )
+            + dependency("com.example:util:${project.version}")
+            + dependency("junit:junit:4.13", "<scope>test</scope>")
+            + dependency("com.example:optional:1.0", "<optional>true</optional>")
+            + "</dependencies>",
+            parent="com.example:parent:1.0",
+        )
+        self.publish(
+            "com.example:lib:2.0",
+            "<dependencies>"
+            + dependency("com.example:excluded:1.0")
+            + dependency("com.example:util")
+            + dependency("com.example:transitive:3.0")
+            + "</dependencies>",
+            parent="com.example:parent:1.0",
+        )
+        for coordinate in [
+            "com.example:util:1.0",
+            "com.example:util:1.1",
+            "com.example:excluded:1.0",
+            "com.example:transitive:3.0",
+        ]:
+            self.publish(coordinate)
+
+    def publish(
+        self, coordinate: str, body: str = "", parent: str = "", jar: bool = True
+    ):
+        c = Coordinate.parse(coordinate)
+        folder = os.path.join(self.repository, os.path.dirname(c.path("pom")))
+        os.makedirs(folder, exist_ok=True)
+
+        parent_element = ""
+        if parent:
+            p = Coordinate.parse(parent)
+            parent_element = (
+                f"<parent><groupId>{p.group}</groupId><artifactId>{p.artifact}</artifactId>"
+                f"<version>{p.version}</version></parent>"
+            )
+
+        with open(os.path.join(self.repository, c.path("pom")), "w") as fid:
+            fid.write(
+                POM.format(
+                    parent=parent_element,
+                    group=c.group,
+                    artifact=c.artifact,
+                    version=c.version,
+                    body=body,
+                )
+            )
+        if jar:
+            with open(os.path.join(self.repository, c.path("jar")), "wb") as fid:
+                fid.write(f"jar of {coordinate}".encode("utf-8"))
+
+    @property
+    def repository_url(self) -> str:
+        return f"file://{self.repository}"
+
+    def cache(self) -> ArtifactCache:
+        return ArtifactCache(self.cache_folder, home=self.home)
+
+    def test_resolve(self):
+        resolved = MavenResolver([self.repository_url]).resolve(
+            [Coordinate.parse("com.example:app:1.0")]
+        )
+
+        self.assertEqual(
+            [str(coordinate) for coordinate in resolved],
+            [
+                "com.example:app:1.0",
+                "com.example:lib:2.0",
+                "com.example:util:1.1",
+                "com.example:transitive:3.0",
+            ],
+        )
+
+    def test_evicted_versions_drop_their_dependencies(self):
+        self.publish(
+            "com.example:first:1.0",
+            "<dependencies>"
+            + dependency("com.example:shared:1.0")
+            + dependency("com.example:second:1.0")
+            + "</dependencies>",
+        )
+        self.publish(
+            "com.example:second:1.0",
+            "<dependencies>"
+            + dependency("com.example:shared:1.10")
+            + "</dependencies>",
+        )
+        self.publish(
+            "com.example:shared:1.0",
+            "<dependencies>" + dependency("com.example:util:1.0") + "</dependencies>",
+        )
+        self.publish("com.example:shared:1.10")
+
+        resolved = MavenResolver([self.repository_url]).resolve(
+            [Coordinate.parse("com.example:first:1.0")]
+        )
+
+        self.assertEqual(
+            [str(coordinate) for coordinate in resolved],
+            [
+                "com.example:first:1.0",
+                "com.example:shared:1.10",
+                "com.example:second:1.0",
+            ],
+        )
+
+    def test_compare_versions(self):
+        for older, newer in [
+            ("1.9", "1.10"),
+            ("1.0", "1.0.1"),
+            ("1.0-rc1", "1.0"),
+            ("1.0-dev", "1.0-rc1"),
+            ("2.0-rc2", "2.0-final"),
+            ("1.0-alpha", "1.0-beta"),
+            ("1.0-beta", "1.0.1"),
+        ]:
+            self.assertLess(compare_versions(older, newer), 0)
+            self.assertGreater(compare_versions(newer, older), 0)
+        self.assertEqual(compare_versions("1.0", "1.0"), 0)
+
+    def test_resolve_with_excludes(self):
+        resolved = MavenResolver([self.repository_url]).resolve(
+            [Coordinate.parse("com.example:lib:2.0")],
+            frozenset({("com.example", "transitive")}),
+        )
+
+        self.assertEqual(
+            [str(coordinate) for coordinate in resolved],
+            [
+                "com.example:lib:2.0",
+                "com.example:excluded:1.0",
+                "com.example:util:1.1",
+            ],
+        )
+
+    def test_spark_modules_are_excluded(self):
+        self.publish(
+            "com.example:connector:1.0",
+            "<dependencies>"
+            + dependency("org.apache.spark:spark-sql_2.12:3.4.1")
+            + dependency("org.apache.spark:spark-sql-kafka-0-10_2.12:3.4.1")
+            + "</dependencies>",
+        )
+        self.publish("org.apache.spark:spark-sql-kafka-0-10_2.12:3.4.1")
+
+        paths = self.cache().resolve("com.example:connector:1.0", self.repository_url)
+
+        self.assertEqual(
+            [os.path.basename(path) for path in paths],
+            ["connector-1.0.jar", "spark-sql-kafka-0-10_2.12-3.4.1.jar"],
+        )
+
+    def test_repositories_are_the_ones_of_spark_submit(self):
+        local = f"file://{self.home}/.m2/repository"
+
+        self.assertEqual(
+            self.cache().repositories(), [local, self.central, self.spark_packages]
+        )
+        self.assertEqual(
+            self.cache().repositories(f"{self.repository_url}, https://example.com"),
+            [
+                local,
+                self.central,
+                self.spark_packages,
+                self.repository_url,
+                "https://example.com",
+            ],
+        )
+
+        shutil.copytree(self.repository, os.path.join(self.home, ".m2", "repository"))
+        paths = self.cache().resolve("com.example:app:1.0")
+        self.assertEqual(len(paths), 4)
+
+    def test_checksums_are_verified(self):
+        jar = os.path.join(
+            self.repository, Coordinate.parse("com.example:util:1.0").path("jar")
+        )
+        with open(jar, "rb") as fid:
+            content = fid.read()
+        with open(f"{jar}.sha1", "w") as fid:
+            fid.write(f"{hashlib.sha1(content).hexdigest()}  util-1.0.jar\n")
+
+        resolver = MavenResolver([self.repository_url])
+        self.assertEqual(resolver.fetch(os.path.relpath(jar, self.repository)), content)
+
+        with open(f"{jar}.sha1", "w") as fid:
+            fid.write(hashlib.sha1(b"other content").hexdigest())
+
+        with self.assertRaises(ArtifactResolutionError):
+            resolver.fetch(os.path.relpath(jar, self.repository))
+
+    def test_local_ivy_artifacts_are_left_to_spark(self):
+        cache = self.cache()
+        self.assertEqual(
+            len(cache.resolve("com.example:app:1.0", self.repository_url)), 4
+        )
+
+        os.makedirs(
+            os.path.join(self.home, ".ivy2", "local", "com.example", "util", "1.1")
+        )
+
+        with self.assertRaises(ArtifactResolutionError):
+            cache.resolve("com.example:app:1.0", self.repository_url)
+
+        ivy = os.path.join(self.TMP_FOLDER, str(uuid.uuid4()))
+        self.assertEqual(
+            len(cache.resolve("com.example:app:1.0", self.repository_url, ivy=ivy)), 4
+        )
+
+    def test_cache_is_populated_then_reused_offline(self):
+        results = []
+        listener = add_listener(
+            lambda m: (
+                results.append(m.attributes.get("result"))
+                if m.name == "artifacts.resolve"
+                else None
+            )
+        )
+
+        try:
+            cache = self.cache()
+            paths = cache.resolve("com.example:app:1.0", self.repository_url)
+
+            self.assertEqual(len(paths), 4)
+            for path in paths:
+                self.assertTrue(path.startswith(self.cache_folder))
+            with open(paths[0], "rb") as fid:
+                self.assertEqual(fid.read(), b"jar of com.example:app:1.0")
+
+            shutil.rmtree(self.repository)
+
+            self.assertEqual(
+                self.cache().resolve("com.example:app:1.0", self.repository_url), paths
+            )
+        finally:
+            remove_listener(listener)
+
+        self.assertEqual(results, ["miss", "hit"])
+
+    def test_identical_jars_are_stored_once(self):
+        cache = self.cache()
+        coordinate = Coordinate.parse("com.example:app:1.0")
+
+        first = cache.store(coordinate, b"content")
+        second = cache.store(coordinate, b"content")
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, cache.store(coordinate, b"other content"))
+
+    def test_with_cached_packages(self):
+        properties = with_cached_packages(
+            PropertyFile(
+                {
+                    "spark.jars": "/opt/app.jar",
+                    "spark.jars.packages": "com.example:util:1.0",
+                    "spark.jars.repositories": self.repository_url,
+                }
+            ),
+            self.cache(),
+        )
+
+        self.assertNotIn("spark.jars.packages", properties.props)
+        jars = properties.props["spark.jars"].split(",")
+        self.assertEqual(jars[0], "/opt/app.jar")
+        self.assertEqual(len(jars), 2)
+        self.assertTrue(jars[1].endswith("/util-1.0.jar"))
+
+    def test_unresolvable_packages_are_left_to_spark(self):
+        properties = PropertyFile(
+            {
+                "spark.jars.packages": "com.example:missing:1.0",
+                "spark.jars.repositories": self.repository_url,
+            }
+        )
+
+        with self.assertLogs("spark_client.artifacts", level="WARNING"):
+            self.assertIs(
+                with_cached_packages(properties, self.cache()),
+                properties,
+            )
+
+        with self.assertRaises(ArtifactResolutionError):
+            Coordinate.parse("com.example:missing")
+
+    def test_spark_submit_uses_the_cache(self):
+        snap = os.path.join(self.TMP_FOLDER, str(uuid.uuid4()))
+        output = os.path.join(snap, "output")
+        make_snap(
+            snap,
+            dump_properties(output),
+            "spark.jars.packages=com.example:util:1.0\n"
+            f"spark.jars.repositories={self.repository_url}\n",
+        )
+
+        spark = SparkInterface(
+            service_account=None,
+            kube_interface=None,
+            defaults=Defaults(
+                {
+                    "SNAP": snap,
+                    "SNAP_USER_DATA": snap,
+                    "HOME": snap,
+                    "SPARK_CLIENT_ARTIFACT_CACHE": "true",
+                }
+            ),
+            master="local[*]",
+        )
+
+        self.assertEqual(spark.spark_submit(SparkDeployMode.CLIENT, None, []), 0)
+
+        submitted = PropertyFile.read(output).props
+        self.assertNotIn("spark.jars.packages", submitted)
+        self.assertTrue(
+            submitted["spark.jars"].startswith(os.path.join(snap, "artifacts"))
+        )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(message)s", level="DEBUG")
+    unittest.main()
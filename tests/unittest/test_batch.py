@@ -0,0 +1,175 @@
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+import uuid
+
+from spark_client.batch import (
+    BatchJob,
+    BatchSubmitter,
+    format_summary,
+    read_manifest,
+    summary,
+)
+from spark_client.domain import Defaults, PropertyFile
+from spark_client.exceptions import FormatError
+from spark_client.instrumentation import add_listener, remove_listener
+from spark_client.services import SparkDeployMode, SparkInterface
+from tests import UnittestWithTmpFolder, make_snap
+from tests.benchmark import CLI_FOLDER, stub_snap
+
+
+class TestBatch(UnittestWithTmpFolder):
+    def setUp(self) -> None:
+        self.snap = os.path.join(self.TMP_FOLDER, str(uuid.uuid4()))
+        self.running = os.path.join(self.snap, "running")
+        self.output = os.path.join(self.snap, "output")
+        os.makedirs(self.running)
+
+        make_snap(
+            self.snap,
+            f"touch {self.running}/$$\n"
+            f"echo running=$(ls {self.running} | wc -l) >> {self.output}\n"
+            "while [ $# -gt 0 ]; do\n"
+            f'  [ "$1" = "--properties-file" ] && cat "$2" >> {self.output}\n'
+            '  [ "$1" = "fail" ] && status=3\n'
+            "  shift\n"
+            "done\n"
+            "sleep 0.2\n"
+            f"rm {self.running}/$$\n"
+            "exit ${status:-0}\n",
+            "spark.app.name=base\n",
+        )
+
+        self.spark = SparkInterface(
+            service_account=None,
+            kube_interface=None,
+            defaults=Defaults({"SNAP": self.snap, "HOME": self.snap}),
+            master="local[*]",
+        )
+
+    def test_read_manifest(self):
+        manifest = os.path.join(self.TMP_FOLDER, str(uuid.uuid4()))
+        with open(manifest, "w") as fid:
+            fid.write(
+                "- args: [app.py, '1']\n"
+                "- name: second\n"
+                "  args: [app.py]\n"
+                "  conf: {spark.executor.instances: 2}\n"
+                "  deploy-mode: cluster\n"
+            )
+
+        first, second = read_manifest(manifest)
+
+        self.assertEqual(first.name, "job-0")
+        self.assertEqual(first.args, ["app.py", "1"])
+        self.assertEqual(first.conf.props, {})
+        self.assertIsNone(first.deploy_mode)
+        self.assertEqual(second.name, "second")
+        self.assertEqual(second.conf.props, {"spark.executor.instances": "2"})
+        self.assertEqual(second.deploy_mode, SparkDeployMode.CLUSTER)
+
+        with open(manifest, "w") as fid:
+            json.dump([{"name": "no-args"}], fid)
+
+        with self.assertRaises(FormatError):
+            read_manifest(manifest)
+
+    def test_batch_submitter(self):
+        merges = []
+        listener = add_listener(
+            lambda m: (merges.append(m) if m.name == "spark.merge_config" else None)
+        )
+
+        jobs = [
+            BatchJob(
+                name=f"job-{i}",
+                args=["fail" if i == 1 else "ok"],
+                conf=PropertyFile({"spark.app.name": f"job-{i}"}),
+            )
+            for i in range(5)
+        ]
+
+        try:
+            results = BatchSubmitter(
+                self.spark, SparkDeployMode.CLIENT, concurrency=2
+            ).run(jobs)
+        finally:
+            remove_listener(listener)
+
+        self.assertEqual(
+            [result.name for result in results], [job.name for job in jobs]
+        )
+        self.assertEqual([result.exit_code for result in results], [0, 3, 0, 0, 0])
+        self.assertTrue(all(result.duration >= 0.2 for result in results))
+        self.assertTrue(
+            all(result.latency <= result.duration - 0.2 for result in results)
+        )
+        self.assertEqual(len(merges), 1)
+
+        with open(self.output) as fid:
+            lines = fid.read().splitlines()
+
+        running = [
+            int(line.split("=")[1]) for line in lines if line.startswith("running=")
+        ]
+        self.assertEqual(len(running), 5)
+        self.assertLessEqual(max(running), 2)
+        self.assertEqual(
+            sorted(line for line in lines if line.startswith("spark.app.name")),
+            [f"spark.app.name=job-{i}" for i in range(5)],
+        )
+
+        totals = summary(results)
+        self.assertEqual((totals["succeeded"], totals["failed"]), (4, 1))
+        self.assertIn("4 succeeded, 1 failed", format_summary(results))
+
+    def test_submit_batch_cli(self):
+        with tempfile.TemporaryDirectory() as folder:
+            env = stub_snap(folder, os.path.join(folder, "missing-kubeconfig"))
+            os.remove(os.path.join(env["SNAP"], "kubectl"))
+            with open(os.path.join(env["SNAP"], "bin", "spark-submit"), "w") as fid:
+                fid.write(
+                    '#!/bin/sh\nfor arg in "$@"; do [ "$arg" = "fail" ] && exit 3; done\nexit 0\n'
+                )
+
+            manifest = os.path.join(folder, "manifest.json")
+            with open(manifest, "w") as fid:
+                json.dump([{"args": ["ok"]}, {"name": "bad", "args": ["fail"]}], fid)
+
+            summary_file = os.path.join(folder, "summary.json")
+
+            process = subprocess.run(
+                [
+                    sys.executable,
+                    os.path.join(CLI_FOLDER, "submit-batch.py"),
+                    "--master",
+                    "local[*]",
+                    "--manifest",
+                    manifest,
+                    "--summary-file",
+                    summary_file,
+                ],
+                env=env,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
+
+            self.assertEqual(process.returncode, 1, process.stderr)
+            self.assertIn(b"1 succeeded, 1 failed", process.stdout)
+
+            with open(summary_file) as fid:
+                jobs = json.load(fid)["jobs"]
+
+            self.assertEqual(
+                [(job["name"], job["exit_code"]) for job in jobs],
+                [("job-0", 0), ("bad", 3)],
+            )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(message)s", level="DEBUG")
+    unittest.main()
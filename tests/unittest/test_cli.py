@@ -0,0 +1,100 @@
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from tests import TestCase
+from tests.benchmark import CLI_COMMANDS, CLI_FOLDER, ROOT_FOLDER, stub_snap
+from tests.benchmark.startup import import_time_ms
+
+
+class TestCli(TestCase):
+    HEAVY_MODULES = [
+        "yaml",
+        "spark_client.services",
+        "spark_client.agent",
+        "spark_client.client",
+        "spark_client.tracing",
+        "spark_client.metrics",
+        "urllib.request",
+        "concurrent.futures",
+    ]
+
+    def test_help_does_not_import_heavy_modules(self):
+        """
+        Validates that the CLI entry points print their help without importing the K8s machinery.
+        """
+        for script in [
+            "spark-submit.py",
+            "spark-shell.py",
+            "pyspark.py",
+            "submit-batch.py",
+        ]:
+            process = subprocess.run(
+                [
+                    sys.executable,
+                    "-X",
+                    "importtime",
+                    os.path.join(CLI_FOLDER, script),
+                    "--help",
+                ],
+                env=dict(os.environ, PYTHONPATH=ROOT_FOLDER),
+                check=True,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+            )
+
+            imported = {
+                line.split("|")[-1].strip()
+                for line in process.stderr.decode("utf-8").splitlines()
+            }
+            for module in self.HEAVY_MODULES:
+                self.assertNotIn(module, imported, f"{module} imported by {script}")
+
+    def test_local_master_skips_kubernetes(self):
+        """
+        Validates that a local master launches Spark without reading the kube config nor calling kubectl.
+        """
+        with tempfile.TemporaryDirectory() as folder:
+            env = stub_snap(folder, os.path.join(folder, "missing-kubeconfig"))
+            os.remove(os.path.join(env["SNAP"], "kubectl"))
+
+            for name in ["spark-submit", "spark-shell", "pyspark"]:
+                process = subprocess.run(
+                    [
+                        sys.executable,
+                        "-X",
+                        "importtime",
+                        os.path.join(CLI_FOLDER, CLI_COMMANDS[name][0]),
+                        "--master",
+                        "local[*]",
+                    ],
+                    env=env,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.PIPE,
+                )
+                self.assertEqual(process.returncode, 0, process.stderr)
+                self.assertNotIn(b" yaml\n", process.stderr)
+
+    def test_import_time_ms(self):
+        """
+        Validates that only the top-level imports are summed up.
+        """
+        stderr = "\n".join(
+            [
+                "import time: self [us] | cumulative | imported package",
+                "import time:       100 |        100 |   io",
+                "import time:       500 |       1500 | spark_client",
+                "import time:       200 |        200 |     yaml.reader",
+                "import time:      1000 |       2500 | spark_client.cli",
+            ]
+        )
+
+        self.assertEqual(import_time_ms(stderr), 4.0)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(message)s", level="DEBUG")
+    unittest.main()
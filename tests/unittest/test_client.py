@@ -0,0 +1,165 @@
+import logging
+import os
+import unittest
+import uuid
+from unittest.mock import patch
+
+from spark_client.client import SparkClient
+from spark_client.domain import Defaults, PropertyFile, ServiceAccount
+from spark_client.services import (
+    InMemoryAccountRegistry,
+    KubeInterface,
+    SparkDeployMode,
+    SparkInterface,
+)
+from tests import UnittestWithTmpFolder, make_snap
+
+
+class TestSparkClient(UnittestWithTmpFolder):
+    def setUp(self) -> None:
+        self.snap = os.path.join(self.TMP_FOLDER, str(uuid.uuid4()))
+        self.output = os.path.join(self.snap, "output")
+        make_snap(
+            self.snap,
+            f'echo "$KUBECONFIG $@" >> {self.output}\n'
+            'for arg in "$@"; do [ "$arg" = "fail" ] && exit 3; done\n'
+            "exit 0\n",
+        )
+
+    def test_spark_client_submit(self):
+        kubeconfig = str(uuid.uuid4())
+        api_server = f"https://{str(uuid.uuid4())}"
+        service_account = ServiceAccount(
+            name=str(uuid.uuid4()),
+            namespace=str(uuid.uuid4()),
+            api_server=api_server,
+            primary=True,
+            extra_confs=PropertyFile({"spark.app.name": "test"}),
+        )
+        registries = []
+
+        def registry_factory(kube_interface):
+            registries.append(kube_interface.context_name)
+            return InMemoryAccountRegistry({service_account.id: service_account})
+
+        with SparkClient(
+            defaults=Defaults({"SNAP": self.snap, "HOME": self.snap}),
+            kube_interface=KubeInterface(kubeconfig, context_name="ctx"),
+            registry_factory=registry_factory,
+        ) as client:
+            submission = client.submit(["ok"])
+            self.assertEqual(submission.exit_code, 0)
+            self.assertTrue(
+                set(submission.timings.keys()) >= {"resolve", "spark_submit", "total"}
+            )
+
+            submissions = [
+                client.submit_async(
+                    ["fail" if i % 2 else "ok"], deploy_mode=SparkDeployMode.CLUSTER
+                )
+                for i in range(6)
+            ]
+            exit_codes = [submission.wait().exit_code for submission in submissions]
+            self.assertEqual(exit_codes, [0, 3, 0, 3, 0, 3])
+
+            with self.assertRaises(ValueError):
+                client.submit(["ok"], username=str(uuid.uuid4()))
+
+        self.assertEqual(registries, ["ctx"])
+
+        with open(self.output) as fid:
+            lines = fid.read().splitlines()
+
+        self.assertEqual(len(lines), 7)
+        self.assertTrue(
+            lines[0].startswith(
+                f"{kubeconfig} --master k8s://{api_server} --deploy-mode client"
+            )
+        )
+        self.assertEqual(
+            len([line for line in lines if "--deploy-mode cluster" in line]), 6
+        )
+
+    def test_spark_client_submit_uses_the_context_of_the_master(self):
+        api_servers = {"ctx1": "https://one", "ctx2": "https://two"}
+        kube_config = {
+            "current-context": "ctx1",
+            "clusters": [
+                {"name": f"cluster-{context}", "cluster": {"server": server}}
+                for context, server in api_servers.items()
+            ],
+            "contexts": [
+                {"name": context, "context": {"cluster": f"cluster-{context}"}}
+                for context in api_servers
+            ],
+        }
+        service_account = ServiceAccount(
+            name=str(uuid.uuid4()),
+            namespace=str(uuid.uuid4()),
+            api_server="https://two",
+            primary=True,
+            extra_confs=PropertyFile.empty(),
+        )
+        registries = []
+
+        def registry_factory(kube_interface):
+            registries.append(kube_interface.context_name)
+            return InMemoryAccountRegistry({service_account.id: service_account})
+
+        with patch.object(
+            SparkInterface, "spark_submit", autospec=True, return_value=0
+        ) as spark_submit, SparkClient(
+            defaults=Defaults({"SNAP": self.snap, "HOME": self.snap}),
+            kube_interface=KubeInterface(kube_config),
+            registry_factory=registry_factory,
+        ) as client:
+            self.assertEqual(
+                client.submit(["ok"], master="k8s://https://two").exit_code, 0
+            )
+            self.assertIs(
+                client.interface("k8s://https://two"),
+                client.interface("k8s://https://two"),
+            )
+
+        self.assertEqual(registries, ["ctx2"])
+        spark = spark_submit.call_args[0][0]
+        self.assertEqual(spark.kube_interface.context_name, "ctx2")
+        self.assertEqual(spark.master, "k8s://https://two")
+
+    def test_spark_client_submit_local_master(self):
+        registries = []
+
+        def registry_factory(kube_interface):
+            registries.append(kube_interface.context_name)
+            return InMemoryAccountRegistry({})
+
+        with patch.dict(os.environ), SparkClient(
+            defaults=Defaults({"SNAP": self.snap, "HOME": self.snap}),
+            kube_interface=KubeInterface(str(uuid.uuid4())),
+            registry_factory=registry_factory,
+        ) as client:
+            os.environ.pop("KUBECONFIG", None)
+            submission = client.submit(
+                ["ok"], master="local[*]", username=str(uuid.uuid4())
+            )
+
+        self.assertEqual(submission.exit_code, 0)
+        self.assertEqual(registries, [])
+
+        with open(self.output) as fid:
+            line = fid.read().strip()
+
+        self.assertTrue(line.startswith("--master local[*] --deploy-mode client"))
+
+    def test_spark_interface_requires_master_without_account(self):
+        with self.assertRaises(ValueError):
+            SparkInterface(
+                service_account=None,
+                kube_interface=None,
+                defaults=Defaults({"SNAP": self.snap}),
+            )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(message)s", level="DEBUG")
+    unittest.main()
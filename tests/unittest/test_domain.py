@@ -1,8 +1,15 @@
 import logging
 import unittest
 import uuid
-
-from spark_client.domain import Defaults, PropertyFile, ServiceAccount
+from typing import List
+from unittest.mock import patch
+
+from spark_client.domain import (
+    Defaults,
+    LazyPropertyFile,
+    PropertyFile,
+    ServiceAccount,
+)
 from spark_client.services import InMemoryAccountRegistry
 from spark_client.utils import umask_named_temporary_file
 from tests import TestCase
@@ -188,6 +195,23 @@ class TestDomain(TestCase):
             )
             assert test_config_r.props.get("spark.app.name") == app_name
 
+    def test_property_file_read_expansion(self):
+        """
+        Validates variables expansion against an explicit mapping when reading property files.
+        """
+        home = str(uuid.uuid4())
+
+        with umask_named_temporary_file(
+            mode="w", prefix="spark-client-snap-unittest-", suffix=".test"
+        ) as t:
+            t.write("spark.a=$HOME/a\nspark.b=${HOME}/b\nspark.c=$NOT_SET/c\n")
+            t.flush()
+            conf = PropertyFile.read(t.name, environ={"HOME": home})
+
+        self.assertEqual(conf.props["spark.a"], f"{home}/a")
+        self.assertEqual(conf.props["spark.b"], f"{home}/b")
+        self.assertEqual(conf.props["spark.c"], "$NOT_SET/c")
+
     def test_property_file_log(self):
         """
         Validates property file logging function.
@@ -201,6 +225,60 @@ class TestDomain(TestCase):
             conf.log()
         self.assertEqual(cm.output, [f"INFO:spark_client.domain.PropertyFile:{k}={v}"])
 
+    def test_property_file_log_bounded(self):
+        """
+        Validates that property file logging can be bounded, summarising the remaining properties.
+        """
+        reference = str(uuid.uuid4())
+        conf = PropertyFile(props={f"spark.key{i}": str(i) for i in range(5)})
+
+        lines: List[str] = []
+        conf.log(lines.append, max_items=2, reference=reference)
+
+        self.assertEqual(
+            lines,
+            ["spark.key0=0", "spark.key1=1", f"... 3 more properties in {reference}"],
+        )
+
+        logger = conf.logger
+        self.assertIs(logger, PropertyFile({}).logger)
+        self.assertEqual(logger.name, "spark_client.domain.PropertyFile")
+
+        logger.setLevel("WARNING")
+        try:
+            with patch.object(logger, "info") as info:
+                conf.log()
+            info.assert_not_called()
+        finally:
+            logger.setLevel("NOTSET")
+
+    def test_lazy_property_file(self):
+        """
+        Validates that lazy property file loads its properties only once on first access.
+        """
+        k = str(uuid.uuid4())
+        v = str(uuid.uuid4())
+        calls = []
+
+        def loader():
+            calls.append(1)
+            return {k: v}
+
+        conf = LazyPropertyFile(loader)
+        sa = ServiceAccount(
+            name=str(uuid.uuid4()),
+            namespace=str(uuid.uuid4()),
+            api_server=str(uuid.uuid4()),
+            extra_confs=conf,
+        )
+        self.assertFalse(conf.is_loaded)
+        self.assertEqual(len(calls), 0)
+
+        self.assertEqual(sa.configurations.props.get(k), v)
+        self.assertEqual(sa.configurations.props.get(k), v)
+        self.assertTrue(conf.is_loaded)
+        self.assertEqual(len(calls), 1)
+
     def test_in_memory_registry(self):
         """
         Validate in memory registry functionalities.
@@ -0,0 +1,163 @@
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+import unittest
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from spark_client.domain import PropertyFile, ServiceAccount
+from spark_client.services import (
+    K8sServiceAccountRegistry,
+    KubeInterface,
+    WatchedK8sServiceAccountRegistry,
+)
+from tests import UnittestWithTmpFolder, fake_kubectl
+
+
+class TestFakeKubectl(UnittestWithTmpFolder):
+    def setUp(self) -> None:
+        self.state_file = os.path.join(self.TMP_FOLDER, f"{str(uuid.uuid4())}.json")
+        self.kube_config = os.path.join(self.TMP_FOLDER, str(uuid.uuid4()))
+        fake_kubectl.write_kube_config(self.kube_config)
+
+        self.environ = patch.dict(os.environ, {fake_kubectl.STATE_ENV: self.state_file})
+        self.environ.start()
+
+        self.kube_interface = KubeInterface(
+            self.kube_config, kubectl_cmd=f"{sys.executable} {fake_kubectl.__file__}"
+        )
+
+    def tearDown(self) -> None:
+        self.environ.stop()
+
+    def test_registry_lifecycle(self):
+        registry = K8sServiceAccountRegistry(self.kube_interface)
+        registry.PAGE_SIZE = 1
+
+        namespace = str(uuid.uuid4())
+        app_name = str(uuid.uuid4())
+
+        registry.create(
+            ServiceAccount(
+                "first",
+                namespace,
+                self.kube_interface.api_server,
+                primary=True,
+                extra_confs=PropertyFile({"spark.app.name": app_name}),
+            )
+        )
+        registry.create(
+            ServiceAccount("second", namespace, self.kube_interface.api_server)
+        )
+
+        self.assertEqual(
+            sorted(account.id for account in registry.all()),
+            [f"{namespace}:first", f"{namespace}:second"],
+        )
+        self.assertEqual(
+            registry.get(f"{namespace}:first").extra_confs.props,
+            {"spark.app.name": app_name},
+        )
+        self.assertEqual(registry.get_primary().name, "first")
+
+        registry.set_primary(f"{namespace}:second")
+        self.assertEqual(registry.get_primary().name, "second")
+
+        registry.delete(f"{namespace}:first")
+        self.assertEqual(
+            [account.id for account in registry.all()], [f"{namespace}:second"]
+        )
+
+    def test_patch(self):
+        fake_kubectl.seed_accounts(self.state_file, 1)
+
+        patched = self.kube_interface.exec(
+            "patch serviceaccount spark-0 --type merge -p "
+            f"'{json.dumps({'metadata': {'labels': {'patched': 'yes'}}})}'",
+            namespace="default",
+        )
+
+        self.assertEqual(patched["metadata"]["labels"]["patched"], "yes")
+        self.assertEqual(
+            [
+                account["metadata"]["name"]
+                for account in self.kube_interface.iter_service_accounts(
+                    labels=["patched=yes"]
+                )
+            ],
+            ["spark-0"],
+        )
+
+    def test_watch(self):
+        fake_kubectl.seed_accounts(self.state_file, 2)
+
+        mirror = WatchedK8sServiceAccountRegistry(
+            self.kube_interface, timeout_seconds=1
+        )
+        self.assertEqual(len(mirror.all()), 2)
+
+        mirror.start()
+        try:
+            K8sServiceAccountRegistry(self.kube_interface).delete("default:spark-1")
+
+            deadline = time.monotonic() + 10
+            while len(mirror.all()) != 1 and time.monotonic() < deadline:
+                time.sleep(0.1)
+        finally:
+            mirror.stop()
+
+        self.assertEqual([account.id for account in mirror.all()], ["default:spark-0"])
+
+    def test_watch_expired(self):
+        fake_kubectl.seed_accounts(self.state_file, 2)
+
+        events = list(
+            self.kube_interface.watch_raw(
+                "/api/v1/serviceaccounts", resourceVersion="1", timeoutSeconds=1
+            )
+        )
+
+        self.assertEqual(events[0]["type"], "ERROR")
+        self.assertEqual(events[0]["object"]["code"], 410)
+
+    def test_fault_injection(self):
+        fake_kubectl.seed_accounts(self.state_file, 1)
+
+        for env in [
+            fake_kubectl.TOO_MANY_REQUESTS_RATE_ENV,
+            fake_kubectl.SERVER_ERROR_RATE_ENV,
+        ]:
+            with patch.dict(os.environ, {env: "1"}):
+                with self.assertRaises(subprocess.CalledProcessError):
+                    self.kube_interface.get_raw("/api/v1/serviceaccounts")
+
+        with patch.dict(os.environ, {fake_kubectl.LATENCY_ENV: "0.5"}):
+            start = time.monotonic()
+            self.kube_interface.get_raw("/api/v1/serviceaccounts")
+            self.assertGreaterEqual(time.monotonic() - start, 0.5)
+
+    def test_concurrent_clients(self):
+        registry = K8sServiceAccountRegistry(self.kube_interface)
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(
+                executor.map(
+                    lambda i: registry.create(
+                        ServiceAccount(
+                            f"spark-{i}", "default", self.kube_interface.api_server
+                        )
+                    ),
+                    range(4),
+                )
+            )
+
+        self.assertEqual(len(registry.all()), 4)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(message)s", level="DEBUG")
+    unittest.main()
@@ -17,6 +17,12 @@ class TestLoggingConfig(UnittestWithTmpFolder):
 
 
 class TestProperties(UnittestWithTmpFolder):
+    def setUp(self) -> None:
+        helpers.utils._resolution_context.cache_clear()
+
+    def tearDown(self) -> None:
+        helpers.utils._resolution_context.cache_clear()
+
     def test_read_property_file_invalid_file(self):
         test_id = str(uuid.uuid4())
         conf = helpers.utils.read_property_file(f"dummy_file_{test_id}")
@@ -218,50 +224,76 @@ class TestProperties(UnittestWithTmpFolder):
     @patch("helpers.utils.subprocess.check_output")
     def test_autodetect_kubernetes_master(self, mock_subprocess):
         # mock logic
-        def side_effect(*args, **kwargs):
-            return values[args[0]]
-
-        mock_subprocess.side_effect = side_effect
-
-        test_id = str(uuid.uuid4())
-        username = str(uuid.uuid4())
-        namespace = str(uuid.uuid4())
-        kubeconfig = helpers.utils.get_kube_config()
         context = str(uuid.uuid4())
+        other_context = str(uuid.uuid4())
         control_plane_uri = f"http://{str(uuid.uuid4())}:{str(uuid.uuid4())}"
+        other_control_plane_uri = f"http://{str(uuid.uuid4())}:{str(uuid.uuid4())}"
 
-        label = helpers.utils.get_primary_label()
-
-        cmd_get_service_account = f"{test_id}/kubectl --kubeconfig {kubeconfig} --namespace {namespace} --context {context}  get serviceaccount -l {label} -A -o yaml"
-        output_get_service_account_yaml_str = f'apiVersion: v1\nitems:\n- apiVersion: v1\n  kind: ServiceAccount\n  metadata:\n    creationTimestamp: "2022-11-21T14:32:06Z"\n    labels:\n      app.kubernetes.io/managed-by: spark-client\n      app.kubernetes.io/spark-client-primary: "1"\n    name: {username}\n    namespace: {namespace}\n    resourceVersion: "321848"\n    uid: 87ef7231-8106-4a36-b545-d8cf167788a6\nkind: List\nmetadata:\n  resourceVersion: ""'
-        output_get_service_account = output_get_service_account_yaml_str.encode("utf-8")
-
-        cmd_get_master = f"{test_id}/kubectl --kubeconfig {kubeconfig} --namespace {namespace} --context {context} config view --minify -o jsonpath=\"{{.clusters[0]['cluster.server']}}\""
-        output_get_master = control_plane_uri.encode("utf-8")
-
-        values = {
-            cmd_get_service_account: output_get_service_account,
-            cmd_get_master: output_get_master,
-        }
+        kubeconfig = os.path.join(self.TMP_FOLDER, str(uuid.uuid4()))
+        with open(kubeconfig, "w") as f:
+            helpers.utils.yaml.dump(
+                {
+                    "current-context": context,
+                    "contexts": [
+                        {"name": context, "context": {"cluster": "first"}},
+                        {"name": other_context, "context": {"cluster": "second"}},
+                    ],
+                    "clusters": [
+                        {"name": "first", "cluster": {"server": control_plane_uri}},
+                        {
+                            "name": "second",
+                            "cluster": {"server": other_control_plane_uri},
+                        },
+                    ],
+                },
+                f,
+            )
 
         # test logic
-        env_snap = os.environ.get("SNAP")
-        os.environ["SNAP"] = test_id
+        with patch.dict(os.environ, {"KUBECONFIG": kubeconfig}):
+            master = helpers.utils.autodetect_kubernetes_master(dict())
+            other_master = helpers.utils.autodetect_kubernetes_master(
+                {"spark.kubernetes.context": other_context}
+            )
 
-        conf = dict()
-        conf["spark.kubernetes.namespace"] = namespace
-        conf["spark.kubernetes.context"] = context
-        master = helpers.utils.autodetect_kubernetes_master(conf)
+        mock_subprocess.assert_not_called()
 
-        if env_snap:
-            os.environ["SNAP"] = env_snap
+        assert master == f"k8s://{control_plane_uri}"
+        assert other_master == f"k8s://{other_control_plane_uri}"
+
+    @patch("helpers.utils.get_kube_config")
+    @patch("helpers.utils.retrieve_kubernetes_secret")
+    @patch("helpers.utils.retrieve_primary_service_account_details")
+    def test_resolution_context_is_memoized(
+        self,
+        mock_retrieve_primary_service_account_details,
+        mock_retrieve_kubernetes_secret,
+        mock_get_kube_config,
+    ):
+        # mock logic
+        username = str(uuid.uuid4())
+        namespace = str(uuid.uuid4())
+        kubeconfig = str(uuid.uuid4())
 
-        expected_master = f"k8s://{control_plane_uri}"
+        mock_retrieve_primary_service_account_details.return_value = {
+            "spark.kubernetes.authenticate.driver.serviceAccountName": username,
+            "spark.kubernetes.namespace": namespace,
+        }
+        mock_retrieve_kubernetes_secret.return_value = {"k": "v"}
+        mock_get_kube_config.return_value = kubeconfig
 
-        mock_subprocess.assert_any_call(cmd_get_service_account, shell=True)
-        mock_subprocess.assert_called_with(cmd_get_master, shell=True)
+        # test logic
+        first = helpers.utils.get_dynamic_defaults(None, None)
+        second = helpers.utils.get_dynamic_defaults(None, None)
 
-        assert master == expected_master
+        assert first == second
+        assert helpers.utils.get_resolution_context().kubeconfig == kubeconfig
+        mock_retrieve_primary_service_account_details.assert_called_once_with(
+            None, kubeconfig, None
+        )
+        mock_retrieve_kubernetes_secret.assert_called_once_with(
+            username, namespace, kubeconfig, None, None
+        )
 
     @patch("helpers.utils.NamedTemporaryFile")
     @patch("helpers.utils.io.TextIOWrapper")
@@ -331,7 +363,10 @@ class TestProperties(UnittestWithTmpFolder):
         context = str(uuid.uuid4())
         conf_key = str(uuid.uuid4())
         conf_value = str(uuid.uuid4())
-        conf_value_base64_encoded = base64.b64encode(conf_value.encode("ascii"))
+        conf_value_base64_encoded = base64.b64encode(conf_value.encode("ascii")).decode(
+            "ascii"
+        )
+        missing_key = str(uuid.uuid4())
 
         mock_os.environ.__getitem__.return_value = test_id
 
@@ -339,270 +374,145 @@ class TestProperties(UnittestWithTmpFolder):
         output_retrieve_secret_yaml_str = f'apiVersion: v1\ndata:\n  {conf_key}: {conf_value_base64_encoded}\nkind: Secret\nmetadata:\n  creationTimestamp: "2022-11-21T07:54:51Z"\n  name: spark-client-sa-conf-{username}\n  namespace: {namespace}\n  resourceVersion: "292967"\n  uid: 943b82c3-2891-4332-886c-621ef4f4633f\ntype: Opaque'
         output_retrieve_secret_yaml = output_retrieve_secret_yaml_str.encode("utf-8")
 
-        cmd_retrieve_secret = f"{test_id}/kubectl --kubeconfig {kubeconfig} --namespace {namespace} --context {context} get secret spark-client-sa-conf-{username} -o jsonpath='{{.data.{conf_key}}}' | base64 --decode"
-        output_retrieve_secret_str = conf_value
-        output_retrieve_secret = output_retrieve_secret_str.encode("utf-8")
-
         values = {
             cmd_retrieve_secret_yaml: output_retrieve_secret_yaml,
-            cmd_retrieve_secret: output_retrieve_secret,
         }
 
         # test logic
         env_snap = os.environ.get("SNAP")
         os.environ["SNAP"] = test_id
 
-        helpers.utils.retrieve_kubernetes_secret(
+        conf = helpers.utils.retrieve_kubernetes_secret(
             username, namespace, kubeconfig, context, None
         )
-
-        if env_snap:
-            os.environ["SNAP"] = env_snap
-
-        mock_subprocess.assert_any_call(cmd_retrieve_secret_yaml, shell=True)
-        mock_subprocess.assert_called_with(cmd_retrieve_secret, shell=True)
-
-    @patch("helpers.utils.os.system")
-    @patch("helpers.utils.subprocess.check_output")
-    def test_set_up_user_primary_defined_primary_reassigned(
-        self, mock_subprocess, mock_os_system
-    ):
-        # mock logic
-        def side_effect_subprocess(*args, **kwargs):
-            return values_subprocess[args[0]]
-
-        def side_effect_os(*args, **kwargs):
-            return values_os[args[0]]
-
-        mock_os_system.side_effect = side_effect_os
-        mock_os_system.return_value = 0
-
-        mock_subprocess.side_effect = side_effect_subprocess
-
-        test_id = str(uuid.uuid4())
-        username = str(uuid.uuid4())
-        namespace = str(uuid.uuid4())
-        kubeconfig = str(uuid.uuid4())
-        context = str(uuid.uuid4())
-        conf_key = str(uuid.uuid4())
-        conf_value = str(uuid.uuid4())
-
-        cmd_create_service_account = f"{test_id}/kubectl --kubeconfig {kubeconfig} --namespace {namespace} --context {context} create serviceaccount {username}"
-        output_create_service_account = ""
-        cmd_create_role_binding = f"{test_id}/kubectl --kubeconfig {kubeconfig} --namespace {namespace} --context {context} create rolebinding {username}-role --role=view --serviceaccount={namespace}:{username}"
-        output_create_role_binding = ""
-
-        cmd_retrieve_primary_sa_yaml = f"{test_id}/kubectl --kubeconfig {kubeconfig} --namespace {namespace} --context {context}  get serviceaccount -l app.kubernetes.io/spark-client-primary=1 -A -o yaml"
-        output_retrieve_primary_sa_yaml_str = f'apiVersion: v1\nitems:\n- apiVersion: v1\n  kind: ServiceAccount\n  metadata:\n    creationTimestamp: "2022-11-21T14:32:06Z"\n    labels:\n      app.kubernetes.io/managed-by: spark-client\n      app.kubernetes.io/spark-client-primary: "1"\n    name: {username}\n    namespace: {namespace}\n    resourceVersion: "321848"\n    uid: 87ef7231-8106-4a36-b545-d8cf167788a6\nkind: List\nmetadata:\n  resourceVersion: ""'
-        output_retrieve_primary_sa_yaml = output_retrieve_primary_sa_yaml_str.encode(
-            "utf-8"
-        )
-
-        cmd_unlabel_service_account = f"{test_id}/kubectl --kubeconfig {kubeconfig} --namespace {namespace} --context {context} label serviceaccount --namespace={namespace} {username} app.kubernetes.io/spark-client-primary-"
-        output_unlabel_service_account = ""
-        cmd_unlabel_rolebinding = f"{test_id}/kubectl --kubeconfig {kubeconfig} --namespace {namespace} --context {context} label rolebinding --namespace={namespace} {username}-role app.kubernetes.io/spark-client-primary-"
-        output_unlabel_rolebinding = ""
-        cmd_label_new_service_account = f"{test_id}/kubectl --kubeconfig {kubeconfig} --namespace {namespace} --context {context} label serviceaccount {username} app.kubernetes.io/managed-by=spark-client app.kubernetes.io/spark-client-primary=1"
-        output_label_service_account = ""
-        cmd_label_new_rolebinding = f"{test_id}/kubectl --kubeconfig {kubeconfig} --namespace {namespace} --context {context} label rolebinding {username}-role app.kubernetes.io/managed-by=spark-client app.kubernetes.io/spark-client-primary=1"
-        output_label_new_rolebinding = ""
-
-        values_subprocess = {
-            cmd_retrieve_primary_sa_yaml: output_retrieve_primary_sa_yaml
-        }
-
-        values_os = {
-            cmd_create_service_account: output_create_service_account,
-            cmd_create_role_binding: output_create_role_binding,
-            cmd_unlabel_service_account: output_unlabel_service_account,
-            cmd_unlabel_rolebinding: output_unlabel_rolebinding,
-            cmd_label_new_service_account: output_label_service_account,
-            cmd_label_new_rolebinding: output_label_new_rolebinding,
-        }
-
-        # test logic
-        env_snap = os.environ.get("SNAP")
-        os.environ["SNAP"] = test_id
-
-        defaults = dict()
-        defaults[conf_key] = conf_value
-        helpers.utils.set_up_user(
-            username, namespace, kubeconfig, context, defaults, mark_primary=True
+        selected_conf = helpers.utils.retrieve_kubernetes_secret(
+            username, namespace, kubeconfig, context, [conf_key, missing_key]
         )
 
         if env_snap:
             os.environ["SNAP"] = env_snap
 
-        mock_os_system.assert_any_call(cmd_create_service_account)
-        mock_os_system.assert_any_call(cmd_create_role_binding)
-
-        mock_subprocess.assert_any_call(cmd_retrieve_primary_sa_yaml, shell=True)
-
-        mock_os_system.assert_any_call(cmd_unlabel_service_account)
-        mock_os_system.assert_any_call(cmd_unlabel_rolebinding)
-        mock_os_system.assert_any_call(cmd_label_new_service_account)
-        mock_os_system.assert_any_call(cmd_label_new_rolebinding)
-
-    @patch("helpers.utils.os.system")
-    @patch("helpers.utils.subprocess.check_output")
-    def test_set_up_user_primary_defined_primary_not_reassigned(
-        self, mock_subprocess, mock_os_system
-    ):
-        # mock logic
-        def side_effect_subprocess(*args, **kwargs):
-            return values_subprocess[args[0]]
-
-        def side_effect_os(*args, **kwargs):
-            return values_os[args[0]]
+        assert conf == {conf_key: conf_value}
+        assert selected_conf == {conf_key: conf_value, missing_key: None}
 
-        mock_os_system.side_effect = side_effect_os
-        mock_os_system.return_value = 0
-
-        mock_subprocess.side_effect = side_effect_subprocess
+        mock_subprocess.assert_called_with(cmd_retrieve_secret_yaml, shell=True)
+        assert mock_subprocess.call_count == 2
 
+    def _set_up_user(self, primary_sa, mark_primary, returncode=0, is_primary=False):
         test_id = str(uuid.uuid4())
         username = str(uuid.uuid4())
         namespace = str(uuid.uuid4())
         kubeconfig = str(uuid.uuid4())
         context = str(uuid.uuid4())
-        conf_key = str(uuid.uuid4())
-        conf_value = str(uuid.uuid4())
-
-        cmd_create_service_account = f"{test_id}/kubectl --kubeconfig {kubeconfig} --namespace {namespace} --context {context} create serviceaccount {username}"
-        output_create_service_account = ""
-        cmd_create_role_binding = f"{test_id}/kubectl --kubeconfig {kubeconfig} --namespace {namespace} --context {context} create rolebinding {username}-role --role=view --serviceaccount={namespace}:{username}"
-        output_create_role_binding = ""
+        if is_primary:
+            primary_sa = (username, namespace)
+
+        kubectl_cmd = f"{test_id}/kubectl --kubeconfig {kubeconfig} --namespace {namespace} --context {context}"
+        cmd_retrieve_primary_sa_yaml = f"{kubectl_cmd}  get serviceaccount -l app.kubernetes.io/spark-client-primary=1 -A -o yaml"
+        items = [
+            {"metadata": {"name": primary_sa[0], "namespace": primary_sa[1]}}
+            for primary_sa in ([primary_sa] if primary_sa else [])
+        ]
+        output_retrieve_primary_sa_yaml = helpers.utils.yaml.safe_dump(
+            {"apiVersion": "v1", "kind": "List", "items": items}
+        ).encode("utf-8")
+
+        with patch.dict(os.environ, {"SNAP": test_id}), patch(
+            "helpers.utils.subprocess.check_output",
+            return_value=output_retrieve_primary_sa_yaml,
+        ) as mock_subprocess, patch("helpers.utils.subprocess.run") as mock_run:
+            mock_run.return_value.returncode = returncode
+            statuses = helpers.utils.set_up_user(
+                username, namespace, kubeconfig, context, dict(), mark_primary
+            )
 
-        cmd_retrieve_primary_sa_yaml = f"{test_id}/kubectl --kubeconfig {kubeconfig} --namespace {namespace} --context {context}  get serviceaccount -l app.kubernetes.io/spark-client-primary=1 -A -o yaml"
-        output_retrieve_primary_sa_yaml_str = f'apiVersion: v1\nitems:\n- apiVersion: v1\n  kind: ServiceAccount\n  metadata:\n    creationTimestamp: "2022-11-21T14:32:06Z"\n    labels:\n      app.kubernetes.io/managed-by: spark-client\n      app.kubernetes.io/spark-client-primary: "1"\n    name: {username}\n    namespace: {namespace}\n    resourceVersion: "321848"\n    uid: 87ef7231-8106-4a36-b545-d8cf167788a6\nkind: List\nmetadata:\n  resourceVersion: ""'
-        output_retrieve_primary_sa_yaml = output_retrieve_primary_sa_yaml_str.encode(
-            "utf-8"
+        mock_subprocess.assert_called_once_with(
+            cmd_retrieve_primary_sa_yaml, shell=True
         )
 
-        cmd_label_new_service_account = f"{test_id}/kubectl --kubeconfig {kubeconfig} --namespace {namespace} --context {context} label serviceaccount {username} app.kubernetes.io/managed-by=spark-client"
-        output_label_service_account = ""
-        cmd_label_new_rolebinding = f"{test_id}/kubectl --kubeconfig {kubeconfig} --namespace {namespace} --context {context} label rolebinding {username}-role app.kubernetes.io/managed-by=spark-client"
-        output_label_new_rolebinding = ""
+        runs = {c.args[0]: c.kwargs["input"] for c in mock_run.call_args_list}
+        assert set(statuses.keys()) == set(runs.keys())
+        assert next(iter(runs)) == f"{kubectl_cmd} apply -f -"
+
+        resources = helpers.utils.yaml.safe_load(runs.pop(f"{kubectl_cmd} apply -f -"))
+        service_account, role_binding = resources["items"]
+
+        assert service_account["kind"] == "ServiceAccount"
+        assert service_account["metadata"]["name"] == username
+        assert service_account["metadata"]["namespace"] == namespace
+        assert role_binding["kind"] == "RoleBinding"
+        assert role_binding["metadata"]["name"] == f"{username}-role"
+        assert role_binding["roleRef"]["name"] == "view"
+        assert role_binding["subjects"] == [
+            {"kind": "ServiceAccount", "name": username, "namespace": namespace}
+        ]
+        assert service_account["metadata"]["labels"] == role_binding["metadata"]["labels"]
 
-        values_subprocess = {
-            cmd_retrieve_primary_sa_yaml: output_retrieve_primary_sa_yaml
-        }
+        return service_account["metadata"]["labels"], runs
 
-        values_os = {
-            cmd_create_service_account: output_create_service_account,
-            cmd_create_role_binding: output_create_role_binding,
-            cmd_label_new_service_account: output_label_service_account,
-            cmd_label_new_rolebinding: output_label_new_rolebinding,
-        }
+    def test_set_up_user_primary_defined_primary_reassigned(self):
+        primary_sa = (str(uuid.uuid4()), str(uuid.uuid4()))
 
-        # test logic
-        env_snap = os.environ.get("SNAP")
-        os.environ["SNAP"] = test_id
+        labels, other_runs = self._set_up_user(primary_sa, mark_primary=True)
 
-        defaults = dict()
-        defaults[conf_key] = conf_value
-        helpers.utils.set_up_user(
-            username, namespace, kubeconfig, context, defaults, mark_primary=False
+        assert labels == {
+            "app.kubernetes.io/managed-by": "spark-client",
+            "app.kubernetes.io/spark-client-primary": "1",
+        }
+        [(cmd_unlabel, stdin)] = other_runs.items()
+        assert stdin is None
+        assert f"--namespace {primary_sa[1]} " in cmd_unlabel
+        assert cmd_unlabel.endswith(
+            f"label serviceaccount/{primary_sa[0]} rolebinding/{primary_sa[0]}-role app.kubernetes.io/spark-client-primary-"
         )
 
-        if env_snap:
-            os.environ["SNAP"] = env_snap
-
-        mock_os_system.assert_any_call(cmd_create_service_account)
-        mock_os_system.assert_any_call(cmd_create_role_binding)
-
-        mock_subprocess.assert_any_call(cmd_retrieve_primary_sa_yaml, shell=True)
-
-        mock_os_system.assert_any_call(cmd_label_new_service_account)
-        mock_os_system.assert_any_call(cmd_label_new_rolebinding)
+    def test_set_up_user_primary_defined_primary_not_reassigned(self):
+        primary_sa = (str(uuid.uuid4()), str(uuid.uuid4()))
 
-    @patch("helpers.utils.os.system")
-    @patch("helpers.utils.subprocess.check_output")
-    def test_set_up_user_primary_not_defined(self, mock_subprocess, mock_os_system):
-        # mock logic
-        def side_effect_subprocess(*args, **kwargs):
-            return values_subprocess[args[0]]
-
-        def side_effect_os(*args, **kwargs):
-            return values_os[args[0]]
+        labels, other_runs = self._set_up_user(primary_sa, mark_primary=False)
 
-        mock_os_system.side_effect = side_effect_os
-        mock_os_system.return_value = 0
+        assert labels == {"app.kubernetes.io/managed-by": "spark-client"}
+        assert other_runs == dict()
 
-        mock_subprocess.side_effect = side_effect_subprocess
+    def test_set_up_user_primary_not_defined(self):
+        labels, other_runs = self._set_up_user(None, mark_primary=False)
 
-        test_id = str(uuid.uuid4())
-        username = str(uuid.uuid4())
-        namespace = str(uuid.uuid4())
-        kubeconfig = str(uuid.uuid4())
-        context = str(uuid.uuid4())
-        conf_key = str(uuid.uuid4())
-        conf_value = str(uuid.uuid4())
-
-        cmd_create_service_account = f"{test_id}/kubectl --kubeconfig {kubeconfig} --namespace {namespace} --context {context} create serviceaccount {username}"
-        output_create_service_account = ""
-        cmd_create_role_binding = f"{test_id}/kubectl --kubeconfig {kubeconfig} --namespace {namespace} --context {context} create rolebinding {username}-role --role=view --serviceaccount={namespace}:{username}"
-        output_create_role_binding = ""
-
-        cmd_retrieve_primary_sa_yaml = f"{test_id}/kubectl --kubeconfig {kubeconfig} --namespace {namespace} --context {context}  get serviceaccount -l app.kubernetes.io/spark-client-primary=1 -A -o yaml"
-        output_retrieve_primary_sa_yaml_str = (
-            'apiVersion: v1\nitems: []\nkind: List\nmetadata:\n  resourceVersion: ""'
-        )
-        output_retrieve_primary_sa_yaml = output_retrieve_primary_sa_yaml_str.encode(
-            "utf-8"
-        )
-
-        cmd_label_new_service_account = f"{test_id}/kubectl --kubeconfig {kubeconfig} --namespace {namespace} --context {context} label serviceaccount {username} app.kubernetes.io/managed-by=spark-client app.kubernetes.io/spark-client-primary=1"
-        output_label_service_account = ""
-        cmd_label_new_rolebinding = f"{test_id}/kubectl --kubeconfig {kubeconfig} --namespace {namespace} --context {context} label rolebinding {username}-role app.kubernetes.io/managed-by=spark-client app.kubernetes.io/spark-client-primary=1"
-        output_label_new_rolebinding = ""
-
-        values_subprocess = {
-            cmd_retrieve_primary_sa_yaml: output_retrieve_primary_sa_yaml
-        }
-
-        values_os = {
-            cmd_create_service_account: output_create_service_account,
-            cmd_create_role_binding: output_create_role_binding,
-            cmd_label_new_service_account: output_label_service_account,
-            cmd_label_new_rolebinding: output_label_new_rolebinding,
+        assert labels == {
+            "app.kubernetes.io/managed-by": "spark-client",
+            "app.kubernetes.io/spark-client-primary": "1",
         }
+        assert other_runs == dict()
 
-        # test logic
-        env_snap = os.environ.get("SNAP")
-        os.environ["SNAP"] = test_id
-
-        defaults = dict()
-        defaults[conf_key] = conf_value
-        helpers.utils.set_up_user(
-            username, namespace, kubeconfig, context, defaults, mark_primary=False
-        )
-
-        if env_snap:
-            os.environ["SNAP"] = env_snap
-
-        mock_os_system.assert_any_call(cmd_create_service_account)
-        mock_os_system.assert_any_call(cmd_create_role_binding)
+    def test_set_up_user_primary_set_up_again(self):
+        for mark_primary in [False, True]:
+            labels, other_runs = self._set_up_user(
+                None, mark_primary=mark_primary, is_primary=True
+            )
 
-        mock_subprocess.assert_any_call(cmd_retrieve_primary_sa_yaml, shell=True)
+            assert labels == {
+                "app.kubernetes.io/managed-by": "spark-client",
+                "app.kubernetes.io/spark-client-primary": "1",
+            }
+            assert other_runs == dict()
 
-        mock_os_system.assert_any_call(cmd_label_new_service_account)
-        mock_os_system.assert_any_call(cmd_label_new_rolebinding)
+    @patch("helpers.utils.sys.exit")
+    def test_set_up_user_failed_apply_keeps_primary(self, mock_sys_exit):
+        primary_sa = (str(uuid.uuid4()), str(uuid.uuid4()))
 
-    @patch("helpers.utils.os.system")
-    @patch("helpers.utils.subprocess.check_output")
-    def test_clean_up_user(self, mock_subprocess, mock_os_system):
-        # mock logic
-        def side_effect_os(*args, **kwargs):
-            return values_os[args[0]]
+        with self.assertLogs(level="ERROR") as cm:
+            _, other_runs = self._set_up_user(
+                primary_sa, mark_primary=True, returncode=1
+            )
 
-        def side_effect_subprocess(*args, **kwargs):
-            return values_subprocess[args[0]]
+        assert len(cm.output) == 1
+        assert other_runs == dict()
+        mock_sys_exit.assert_called_once_with(
+            helpers.constants.EXIT_CODE_SET_UP_RESOURCES_FAILED
+        )
 
-        mock_subprocess.side_effect = side_effect_subprocess
-        mock_subprocess.return_value = 0
-        mock_os_system.side_effect = side_effect_os
-        mock_os_system.return_value = 0
+    @patch("helpers.utils.subprocess.run")
+    def test_clean_up_user(self, mock_run):
+        mock_run.return_value.returncode = 0
 
         test_id = str(uuid.uuid4())
         username = str(uuid.uuid4())
@@ -610,36 +520,16 @@ class TestProperties(UnittestWithTmpFolder):
         kubeconfig = str(uuid.uuid4())
         context = str(uuid.uuid4())
 
-        cmd_cleanup_service_account = f"{test_id}/kubectl --kubeconfig {kubeconfig} --namespace {namespace} --context {context} delete serviceaccount {username}"
-        output_cleanup_service_account = ""
-        cmd_cleanup_role_binding = f"{test_id}/kubectl --kubeconfig {kubeconfig} --namespace {namespace} --context {context} delete rolebinding {username}-role"
-        output_cleanup_role_binding = ""
-
-        cmd_delete_kubernetes_secret = f"{test_id}/kubectl --kubeconfig {kubeconfig} --namespace {namespace} --context {context} delete secret spark-client-sa-conf-{username}"
-        output_delete_kubernetes_secret = ""
-
-        values_os = {
-            cmd_cleanup_service_account: output_cleanup_service_account,
-            cmd_cleanup_role_binding: output_cleanup_role_binding,
-        }
-
-        values_subprocess = {
-            cmd_delete_kubernetes_secret: output_delete_kubernetes_secret
-        }
+        cmd_cleanup = f"{test_id}/kubectl --kubeconfig {kubeconfig} --namespace {namespace} --context {context} delete serviceaccount/{username} rolebinding/{username}-role secret/spark-client-sa-conf-{username} --ignore-not-found"
 
         # test logic
-        env_snap = os.environ.get("SNAP")
-        os.environ["SNAP"] = test_id
-
-        helpers.utils.cleanup_user(username, namespace, kubeconfig, context)
-
-        if env_snap:
-            os.environ["SNAP"] = env_snap
-
-        mock_os_system.assert_any_call(cmd_cleanup_service_account)
-        mock_os_system.assert_any_call(cmd_cleanup_role_binding)
+        with patch.dict(os.environ, {"SNAP": test_id}):
+            statuses = helpers.utils.cleanup_user(
+                username, namespace, kubeconfig, context
+            )
 
-        mock_subprocess.assert_any_call(cmd_delete_kubernetes_secret, shell=True)
+        mock_run.assert_called_once_with(cmd_cleanup, shell=True, input=None, text=True)
+        assert statuses == {cmd_cleanup: 0}
 
     @patch("helpers.utils.get_kube_config")
     @patch("helpers.utils.retrieve_kubernetes_secret")
@@ -0,0 +1,124 @@
+import logging
+import os
+import unittest
+import uuid
+from unittest.mock import patch
+
+from spark_client.domain import Defaults, PropertyFile, ServiceAccount
+from spark_client.instrumentation import (
+    Profile,
+    add_launch_hook,
+    add_listener,
+    instrumented,
+    measure,
+    remove_launch_hook,
+    remove_listener,
+)
+from spark_client.services import KubeInterface, SparkInterface
+from tests import UnittestWithTmpFolder, make_snap
+
+
+class TestInstrumentation(UnittestWithTmpFolder):
+    def test_measure_without_listeners(self):
+        with measure("test") as m:
+            pass
+        self.assertEqual(m.duration, 0.0)
+
+    def test_measure_and_instrumented(self):
+        measurements = []
+        listener = add_listener(measurements.append)
+
+        @instrumented("test.function")
+        def function(value):
+            if value is None:
+                raise ValueError(value)
+            return value
+
+        try:
+            with measure("test.block", key="value") as m:
+                m.bytes = 10
+
+            self.assertEqual(function(1), 1)
+            with self.assertRaises(ValueError):
+                function(None)
+        finally:
+            remove_listener(listener)
+
+        self.assertEqual(
+            [m.name for m in measurements],
+            ["test.block", "test.function", "test.function"],
+        )
+        self.assertEqual(measurements[0].bytes, 10)
+        self.assertEqual(measurements[0].attributes, {"key": "value"})
+        self.assertIsNone(measurements[1].error)
+        self.assertIsInstance(measurements[2].error, ValueError)
+
+        profile = Profile()
+        for measurement in measurements:
+            profile.record(measurement)
+
+        self.assertEqual(profile.stats["test.function"].calls, 2)
+        self.assertEqual(profile.stats["test.function"].errors, 1)
+        self.assertEqual(profile.stats["test.block"].bytes, 10)
+        self.assertIn("test.function", profile.report())
+
+    @patch("spark_client.services.subprocess")
+    def test_kube_interface_exec_is_profiled(self, mock_subprocess):
+        mock_subprocess.check_output.return_value = b"kind: Secret\n"
+
+        profile = Profile().start()
+        try:
+            output = KubeInterface(
+                str(uuid.uuid4()), context_name="ctx", kubectl_cmd="kubectl"
+            ).exec("get secret test", namespace="default")
+        finally:
+            profile.stop()
+
+        self.assertEqual(output, {"kind": "Secret"})
+        self.assertEqual(profile.stats["kubectl"].calls, 1)
+        self.assertEqual(profile.stats["kubectl"].bytes, 13)
+
+    def test_spark_interface_stages_are_profiled_before_launch(self):
+        snap = os.path.join(self.TMP_FOLDER, str(uuid.uuid4()))
+        output = os.path.join(snap, "output")
+        make_snap(snap, f"echo launched >> {output}\n")
+
+        reports = []
+
+        profile = Profile().start()
+
+        def hook():
+            reports.append((profile.report(), os.path.exists(output)))
+
+        add_launch_hook(hook)
+        try:
+            exit_code = SparkInterface(
+                service_account=ServiceAccount(
+                    name="spark",
+                    namespace="default",
+                    api_server="https://localhost",
+                    extra_confs=PropertyFile({"spark.app.name": "test"}),
+                ),
+                kube_interface=KubeInterface(str(uuid.uuid4())),
+                defaults=Defaults({"SNAP": snap}),
+            ).spark_submit("client", None, [])
+        finally:
+            remove_launch_hook(hook)
+            profile.stop()
+
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(len(reports), 1)
+
+        report, launched = reports[0]
+        self.assertFalse(launched)
+        self.assertIn("properties.read", report)
+        self.assertIn("spark.merge_config", report)
+        self.assertIn("spark.write_properties", report)
+        self.assertNotIn("spark.exec", report)
+
+        self.assertEqual(profile.stats["spark.exec"].calls, 1)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(message)s", level="DEBUG")
+    unittest.main()
@@ -0,0 +1,123 @@
+import logging
+import os
+import unittest
+import uuid
+
+from spark_client.instrumentation import measure, notify_launch
+from spark_client.metrics import PrometheusTextfileExporter, parse_samples
+from tests import UnittestWithTmpFolder
+
+
+class TestMetrics(UnittestWithTmpFolder):
+    def run_command(self, filename: str, fail_kubectl: bool):
+        exporter = PrometheusTextfileExporter(filename, "spark-submit").start()
+        try:
+            with measure("command", command="spark-submit"):
+                with measure("account.resolve", source="kubernetes"):
+                    with measure("registry.get"):
+                        with measure("kubectl", verb="get"):
+                            pass
+                        try:
+                            with measure("kubectl", verb="get"):
+                                if fail_kubectl:
+                                    raise ValueError()
+                        except ValueError:
+                            pass
+                with measure("spark.merge_config"):
+                    pass
+                notify_launch()
+        finally:
+            exporter.stop()
+
+    def test_textfile_exporter(self):
+        filename = os.path.join(self.TMP_FOLDER, f"{str(uuid.uuid4())}.prom")
+
+        self.run_command(filename, fail_kubectl=False)
+        self.run_command(filename, fail_kubectl=True)
+
+        with open(filename) as fid:
+            content = fid.read()
+
+        self.assertIn("# TYPE spark_client_kubectl_calls_total counter", content)
+        self.assertIn("# TYPE spark_client_prelaunch_seconds histogram", content)
+
+        samples = parse_samples(content)
+
+        self.assertEqual(
+            samples[
+                (
+                    "spark_client_kubectl_calls_total",
+                    (("result", "success"), ("verb", "get")),
+                )
+            ],
+            3,
+        )
+        self.assertEqual(
+            samples[
+                (
+                    "spark_client_kubectl_calls_total",
+                    (("result", "error"), ("verb", "get")),
+                )
+            ],
+            1,
+        )
+        self.assertEqual(
+            samples[
+                (
+                    "spark_client_registry_operation_seconds_count",
+                    (("operation", "get"),),
+                )
+            ],
+            2,
+        )
+        self.assertEqual(
+            samples[
+                (
+                    "spark_client_resolution_cache_requests_total",
+                    (("result", "miss"),),
+                )
+            ],
+            2,
+        )
+        self.assertEqual(
+            samples[("spark_client_config_merge_seconds_bucket", (("le", "+Inf"),))],
+            2,
+        )
+        self.assertEqual(
+            samples[
+                (
+                    "spark_client_prelaunch_seconds_count",
+                    (("command", "spark-submit"),),
+                )
+            ],
+            2,
+        )
+        self.assertEqual(
+            samples[
+                (
+                    "spark_client_command_seconds_count",
+                    (("command", "spark-submit"), ("result", "success")),
+                )
+            ],
+            2,
+        )
+
+        buckets = [
+            line for line in content.splitlines() if "prelaunch_seconds_bucket" in line
+        ]
+        self.assertTrue(
+            buckets[0].startswith(
+                'spark_client_prelaunch_seconds_bucket{command="spark-submit",le="0.005"}'
+            )
+        )
+        self.assertIn('le="+Inf"', buckets[-1])
+
+        self.assertEqual(
+            [f for f in os.listdir(self.TMP_FOLDER) if f.startswith(".spark-client-")],
+            [],
+        )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(message)s", level="DEBUG")
+    unittest.main()
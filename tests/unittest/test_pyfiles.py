@@ -0,0 +1,250 @@
+import glob
+import logging
+import os
+import sys
+import tarfile
+import unittest
+import uuid
+import zipfile
+from typing import List
+from unittest.mock import patch
+
+from spark_client.domain import Defaults, PropertyFile
+from spark_client.exceptions import PythonDependencyError
+from spark_client.instrumentation import add_listener, remove_listener
+from spark_client.pyfiles import (
+    PythonPackager,
+    local_driver_pythonpath,
+    with_python_dependencies,
+)
+from spark_client.services import SparkDeployMode, SparkInterface
+from tests import UnittestWithTmpFolder, dump_properties, make_snap
+
+FAKE_PIP = """
+import os
+import sys
+
+target = sys.argv[sys.argv.index("--target") + 1]
+requirements = sys.argv[sys.argv.index("--requirement") + 1]
+with open(os.path.join(os.path.dirname(requirements), "pip-calls"), "a") as fid:
+    fid.write("install\\n")
+with open(os.path.join(os.path.dirname(requirements), "pip-args"), "w") as fid:
+    fid.write(" ".join(sys.argv[sys.argv.index("--requirement") + 2 :]))
+with open(requirements) as fid:
+    for name in fid.read().split():
+        os.makedirs(os.path.join(target, name))
+        open(os.path.join(target, name, "__init__.py"), "w").close()
+"""
+
+
+class TestPyFiles(UnittestWithTmpFolder):
+    def setUp(self) -> None:
+        self.folder = os.path.join(self.TMP_FOLDER, str(uuid.uuid4()))
+        self.sources = os.path.join(self.folder, "src")
+        os.makedirs(os.path.join(self.sources, "pkg", "__pycache__"))
+        for name in ["pkg/__init__.py", "pkg/module.py", "pkg/__pycache__/a.pyc"]:
+            with open(os.path.join(self.sources, name), "w") as fid:
+                fid.write(f"# {name}\n")
+
+        self.requirements = os.path.join(self.folder, "requirements.txt")
+        with open(self.requirements, "w") as fid:
+            fid.write("first\nsecond\n")
+
+        fake_pip = os.path.join(self.folder, "fake_pip.py")
+        with open(fake_pip, "w") as fid:
+            fid.write(FAKE_PIP)
+
+        self.packager = PythonPackager(
+            os.path.join(self.folder, "cache"), f"{sys.executable} {fake_pip}"
+        )
+
+        self.results: List[str] = []
+        self.listener = add_listener(
+            lambda m: (
+                self.results.append(m.attributes["result"])
+                if m.name == "pyfiles.package"
+                else None
+            )
+        )
+
+    def tearDown(self) -> None:
+        remove_listener(self.listener)
+
+    def test_package_sources(self):
+        archive = self.packager.package_sources(self.sources)
+
+        self.assertTrue(archive.endswith("/src.zip"))
+        with zipfile.ZipFile(archive) as fid:
+            self.assertEqual(fid.namelist(), ["pkg/__init__.py", "pkg/module.py"])
+
+        self.assertEqual(self.packager.package_sources(self.sources), archive)
+
+        with open(os.path.join(self.sources, "pkg", "module.py"), "a") as fid:
+            fid.write("value = 1\n")
+
+        self.assertNotEqual(self.packager.package_sources(self.sources), archive)
+        self.assertEqual(self.results, ["miss", "hit", "miss"])
+
+    def test_package_sources_missing_folder(self):
+        with self.assertRaises(PythonDependencyError):
+            self.packager.package_sources(os.path.join(self.folder, "missing"))
+
+        self.assertFalse(os.path.exists(self.packager.folder))
+
+    def test_package_requirements(self):
+        archive = self.packager.package_requirements(self.requirements)
+
+        with tarfile.open(archive) as fid:
+            self.assertEqual(
+                sorted(fid.getnames()),
+                ["first", "first/__init__.py", "second", "second/__init__.py"],
+            )
+
+        self.assertEqual(self.packager.package_requirements(self.requirements), archive)
+        with open(os.path.join(self.folder, "pip-calls")) as fid:
+            self.assertEqual(fid.read(), "install\n")
+
+    def test_package_requirements_failed_install(self):
+        packager = PythonPackager(self.packager.folder, "false")
+
+        with self.assertRaises(PythonDependencyError):
+            packager.package_requirements(self.requirements)
+
+        with self.assertRaises(PythonDependencyError):
+            packager.package_requirements(os.path.join(self.folder, "missing.txt"))
+
+        self.assertEqual(
+            glob.glob(os.path.join(packager.folder, "**", "*.tar.gz"), recursive=True),
+            [],
+        )
+
+    def test_package_requirements_for_target(self):
+        archive = self.packager.package_requirements(self.requirements)
+        with open(os.path.join(self.folder, "pip-args")) as fid:
+            self.assertEqual(fid.read(), "")
+
+        packager = PythonPackager(
+            self.packager.folder,
+            self.packager.pip_cmd,
+            "3.10",
+            ["manylinux2014_x86_64", "linux_x86_64"],
+        )
+        target_archive = packager.package_requirements(self.requirements)
+
+        self.assertNotEqual(target_archive, archive)
+        with open(os.path.join(self.folder, "pip-args")) as fid:
+            self.assertEqual(
+                fid.read(),
+                "--only-binary=:all: --python-version 3.10 "
+                "--platform manylinux2014_x86_64 --platform linux_x86_64",
+            )
+        self.assertEqual(
+            packager.package_requirements(self.requirements), target_archive
+        )
+        self.assertEqual(self.results, ["miss", "miss", "hit"])
+
+    def test_with_python_dependencies(self):
+        properties = with_python_dependencies(
+            PropertyFile(
+                {
+                    "spark.submit.pyFiles": "/opt/other.zip",
+                    "spark.executorEnv.PYTHONPATH": "/opt/lib",
+                }
+            ),
+            self.packager,
+            self.sources,
+            self.requirements,
+        )
+
+        self.assertEqual(
+            properties.props["spark.submit.pyFiles"],
+            f"/opt/other.zip,{self.packager.package_sources(self.sources)}",
+        )
+        self.assertEqual(
+            properties.props["spark.archives"],
+            f"{self.packager.package_requirements(self.requirements)}#pydeps",
+        )
+        self.assertEqual(
+            properties.props["spark.executorEnv.PYTHONPATH"], "./pydeps:/opt/lib"
+        )
+        self.assertEqual(
+            properties.props["spark.kubernetes.driverEnv.PYTHONPATH"], "./pydeps"
+        )
+
+    def test_local_driver_pythonpath(self):
+        with patch.dict(os.environ, {"PYTHONPATH": "/opt/lib"}):
+            pythonpath = local_driver_pythonpath(self.packager, self.requirements)
+
+        folder, rest = pythonpath.split(":")
+        self.assertEqual(rest, "/opt/lib")
+        self.assertEqual(sorted(os.listdir(folder)), ["first", "second"])
+        self.assertTrue(os.path.isfile(os.path.join(folder, "first", "__init__.py")))
+
+        with patch.dict(os.environ, {"PYTHONPATH": ""}):
+            self.assertEqual(
+                local_driver_pythonpath(self.packager, self.requirements), folder
+            )
+        with open(os.path.join(self.folder, "pip-calls")) as fid:
+            self.assertEqual(fid.read(), "install\n")
+
+    def test_spark_submit_client_mode_with_py_requirements(self):
+        snap = os.path.join(self.folder, "snap")
+        output = os.path.join(snap, "output")
+        make_snap(snap, f'echo "$PYTHONPATH" > {output}\n')
+
+        spark = SparkInterface(
+            service_account=None,
+            kube_interface=None,
+            defaults=Defaults(
+                {
+                    "SNAP": snap,
+                    "SNAP_USER_DATA": snap,
+                    "HOME": snap,
+                    "SPARK_CLIENT_PIP_CMD": self.packager.pip_cmd,
+                }
+            ),
+            master="local[*]",
+        )
+
+        self.assertEqual(
+            spark.spark_submit(
+                SparkDeployMode.CLIENT,
+                None,
+                ["app.py"],
+                py_requirements=self.requirements,
+            ),
+            0,
+        )
+
+        with open(output) as fid:
+            folder = fid.read().strip().split(":")[0]
+        self.assertTrue(folder.startswith(os.path.join(snap, "pyfiles")))
+        self.assertEqual(sorted(os.listdir(folder)), ["first", "second"])
+
+    def test_spark_submit_with_py_source(self):
+        snap = os.path.join(self.folder, "snap")
+        output = os.path.join(snap, "output")
+        make_snap(snap, dump_properties(output))
+
+        spark = SparkInterface(
+            service_account=None,
+            kube_interface=None,
+            defaults=Defaults({"SNAP": snap, "SNAP_USER_DATA": snap, "HOME": snap}),
+            master="local[*]",
+        )
+
+        self.assertEqual(
+            spark.spark_submit(
+                SparkDeployMode.CLIENT, None, ["app.py"], py_source=self.sources
+            ),
+            0,
+        )
+
+        py_files = PropertyFile.read(output).props["spark.submit.pyFiles"]
+        self.assertTrue(py_files.startswith(os.path.join(snap, "pyfiles")))
+        self.assertTrue(py_files.endswith("/src.zip"))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(message)s", level="DEBUG")
+    unittest.main()
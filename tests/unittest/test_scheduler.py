@@ -0,0 +1,151 @@
+import logging
+import os
+import sqlite3
+import subprocess
+import threading
+import time
+import unittest
+import uuid
+
+from spark_client.domain import Defaults, PropertyFile, ServiceAccount
+from spark_client.instrumentation import add_listener, remove_listener
+from spark_client.scheduler import SubmissionScheduler
+from spark_client.services import SparkDeployMode, SparkInterface
+from tests import UnittestWithTmpFolder, make_snap
+
+
+class TestScheduler(UnittestWithTmpFolder):
+    def setUp(self) -> None:
+        self.filename = os.path.join(
+            self.TMP_FOLDER, str(uuid.uuid4()), "submissions.db"
+        )
+
+    def scheduler(self, max_concurrent: int) -> SubmissionScheduler:
+        return SubmissionScheduler(self.filename, max_concurrent, poll_interval=0.01)
+
+    def test_max_concurrent_per_namespace(self):
+        lock = threading.Lock()
+        running = {"a": 0, "b": 0}
+        peaks = {"a": 0, "b": 0}
+
+        def submit(namespace):
+            with self.scheduler(2).slot(namespace):
+                with lock:
+                    running[namespace] += 1
+                    peaks[namespace] = max(peaks[namespace], running[namespace])
+                time.sleep(0.1)
+                with lock:
+                    running[namespace] -= 1
+
+        threads = [
+            threading.Thread(target=submit, args=(namespace,))
+            for namespace in ["a", "b"] * 4
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(peaks, {"a": 2, "b": 2})
+
+    def test_priority_ordering(self):
+        started = []
+
+        def submit(name, priority):
+            with self.scheduler(1).slot("ns", priority):
+                started.append(name)
+
+        with self.scheduler(1).slot("ns") as waited:
+            self.assertLess(waited, 1.0)
+
+            threads = []
+            for name, priority in [("low", 0), ("high", 10), ("medium", 5)]:
+                threads.append(threading.Thread(target=submit, args=(name, priority)))
+                threads[-1].start()
+                time.sleep(0.1)
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(started, ["high", "medium", "low"])
+
+    def test_entries_of_dead_processes_are_discarded(self):
+        process = subprocess.Popen(["true"])
+        process.wait()
+
+        with self.scheduler(1).slot("ns"):
+            pass
+
+        connection = sqlite3.connect(self.filename)
+        connection.execute(
+            "INSERT INTO submissions (namespace, priority, pid, running, enqueued) "
+            "VALUES ('ns', 0, ?, 1, 0)",
+            (process.pid,),
+        )
+        connection.commit()
+        connection.close()
+
+        with self.scheduler(1).slot("ns") as waited:
+            self.assertLess(waited, 1.0)
+
+    @unittest.skipUnless(os.path.exists("/proc/self/stat"), "requires procfs")
+    def test_entries_of_reused_pids_are_discarded(self):
+        with self.scheduler(1).slot("ns"):
+            pass
+
+        connection = sqlite3.connect(self.filename)
+        connection.execute(
+            "INSERT INTO submissions (namespace, priority, pid, started, running, enqueued) "
+            "VALUES ('ns', 0, ?, -1, 1, 0)",
+            (os.getpid(),),
+        )
+        connection.commit()
+        connection.close()
+
+        with self.scheduler(1).slot("ns") as waited:
+            self.assertLess(waited, 1.0)
+
+    def test_spark_submit_waits_in_queue(self):
+        snap = make_snap(os.path.join(self.TMP_FOLDER, str(uuid.uuid4())))
+
+        namespace = str(uuid.uuid4())
+        spark = SparkInterface(
+            service_account=ServiceAccount(
+                "spark",
+                namespace,
+                "https://localhost",
+                extra_confs=PropertyFile.empty(),
+            ),
+            kube_interface=None,
+            defaults=Defaults(
+                {
+                    "SNAP": snap,
+                    "HOME": snap,
+                    "SPARK_CLIENT_QUEUE_MAX_CONCURRENT": "1",
+                    "SPARK_CLIENT_QUEUE_FILE": self.filename,
+                }
+            ),
+        )
+
+        queued = []
+        listener = add_listener(
+            lambda m: queued.append(m) if m.name == "spark.queue" else None
+        )
+        try:
+            self.assertEqual(spark.spark_submit(SparkDeployMode.CLUSTER, None, []), 0)
+        finally:
+            remove_listener(listener)
+
+        self.assertEqual(len(queued), 1)
+        self.assertEqual(queued[0].attributes["namespace"], namespace)
+
+        connection = sqlite3.connect(self.filename)
+        self.assertEqual(
+            connection.execute("SELECT COUNT(*) FROM submissions").fetchone(), (0,)
+        )
+        connection.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(message)s", level="DEBUG")
+    unittest.main()
@@ -1,8 +1,13 @@
 import base64
+import json
 import logging
+import os
+import shlex
+import subprocess
+import time
 import unittest
 import uuid
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
 import yaml
 
@@ -10,6 +15,7 @@ from spark_client.domain import PropertyFile, ServiceAccount
 from spark_client.services import (
     K8sServiceAccountRegistry,
     KubeInterface,
+    WatchedK8sServiceAccountRegistry,
     parse_conf_overrides,
 )
 from tests import TestCase
@@ -28,6 +34,21 @@ class TestServices(TestCase):
             parsed_property.props["my-other-conf"], "/this/does/$NOT/change"
         )
 
+    def test_conf_expansion_cli_does_not_touch_environ(self):
+        environ_before = dict(os.environ)
+
+        parsed_property = parse_conf_overrides(
+            ["a=${HOME}/x", "b=$HOME$HOME", "c=${NOT}", "d=${}", "e=$"],
+            environ_vars={"HOME": "/home"},
+        )
+
+        self.assertEqual(parsed_property.props["a"], "/home/x")
+        self.assertEqual(parsed_property.props["b"], "/home/home")
+        self.assertEqual(parsed_property.props["c"], "${NOT}")
+        self.assertEqual(parsed_property.props["d"], "${}")
+        self.assertEqual(parsed_property.props["e"], "$")
+        self.assertEqual(dict(os.environ), environ_before)
+
     def test_kube_interface(self):
         # mock logic
         test_id = str(uuid.uuid4())
@@ -135,7 +156,9 @@ class TestServices(TestCase):
     ):
         # mock logic
         def side_effect(*args, **kwargs):
-            return values[args[0]]
+            return next(
+                out for cmd, out in values.items() if shlex.split(cmd) == args[0]
+            )
 
         mock_subprocess.side_effect = side_effect
 
@@ -203,7 +226,9 @@ class TestServices(TestCase):
             secret_result = k.get_secret(secret_name, namespace)
             self.assertEqual(conf_value, secret_result["data"][conf_key])
 
-        mock_subprocess.assert_any_call(cmd_get_secret, shell=True, stderr=None)
+        mock_subprocess.assert_any_call(
+            shlex.split(cmd_get_secret), stderr=subprocess.PIPE, timeout=None
+        )
 
     @patch("helpers.utils.yaml.safe_load")
     @patch("builtins.open")
@@ -213,7 +238,9 @@ class TestServices(TestCase):
     ):
         # mock logic
         def side_effect(*args, **kwargs):
-            return values[args[0]]
+            return next(
+                out for cmd, out in values.items() if shlex.split(cmd) == args[0]
+            )
 
         mock_subprocess.side_effect = side_effect
 
@@ -265,7 +292,9 @@ class TestServices(TestCase):
             k = KubeInterface(kube_config_file=kubeconfig)
             k.set_label(resource_type, resource_name, label, namespace)
 
-        mock_subprocess.assert_any_call(cmd_set_label, shell=True, stderr=None)
+        mock_subprocess.assert_any_call(
+            shlex.split(cmd_set_label), stderr=subprocess.PIPE, timeout=None
+        )
 
     @patch("helpers.utils.yaml.safe_load")
     @patch("builtins.open")
@@ -275,7 +304,9 @@ class TestServices(TestCase):
     ):
         # mock logic
         def side_effect(*args, **kwargs):
-            return values[args[0]]
+            return next(
+                out for cmd, out in values.items() if shlex.split(cmd) == args[0]
+            )
 
         mock_subprocess.side_effect = side_effect
 
@@ -331,7 +362,9 @@ class TestServices(TestCase):
                 **{"k1": "v1", "k2": ["v21", "v22"]},
             )
 
-        mock_subprocess.assert_any_call(cmd_create, shell=True, stderr=None)
+        mock_subprocess.assert_any_call(
+            shlex.split(cmd_create), stderr=subprocess.PIPE, timeout=None
+        )
 
     @patch("helpers.utils.yaml.safe_load")
     @patch("builtins.open")
@@ -341,7 +374,9 @@ class TestServices(TestCase):
     ):
         # mock logic
         def side_effect(*args, **kwargs):
-            return values[args[0]]
+            return next(
+                out for cmd, out in values.items() if shlex.split(cmd) == args[0]
+            )
 
         mock_subprocess.side_effect = side_effect
 
@@ -392,7 +427,9 @@ class TestServices(TestCase):
             k = KubeInterface(kube_config_file=kubeconfig)
             k.delete(resource_type, resource_name, namespace)
 
-        mock_subprocess.assert_any_call(cmd_delete, shell=True, stderr=None)
+        mock_subprocess.assert_any_call(
+            shlex.split(cmd_delete), stderr=subprocess.PIPE, timeout=None
+        )
 
     @patch("helpers.utils.yaml.safe_load")
     @patch("builtins.open")
@@ -402,7 +439,9 @@ class TestServices(TestCase):
     ):
         # mock logic
         def side_effect(*args, **kwargs):
-            return values[args[0]]
+            return next(
+                out for cmd, out in values.items() if shlex.split(cmd) == args[0]
+            )
 
         mock_subprocess.side_effect = side_effect
 
@@ -477,7 +516,9 @@ class TestServices(TestCase):
             self.assertEqual(sa_list[0].get("metadata").get("name"), username)
             self.assertEqual(sa_list[0].get("metadata").get("namespace"), namespace)
 
-        mock_subprocess.assert_any_call(cmd_get_sa, shell=True, stderr=None)
+        mock_subprocess.assert_any_call(
+            shlex.split(cmd_get_sa), stderr=subprocess.PIPE, timeout=None
+        )
 
     @patch("helpers.utils.yaml.safe_load")
     @patch("builtins.open")
@@ -636,6 +677,66 @@ class TestServices(TestCase):
             k = KubeInterface(kube_config_file=kubeconfig)
             self.assertEqual(k, k.select_by_master(f"https://0.0.0.0:{test_id}"))
 
+    @patch("spark_client.services.subprocess.check_output")
+    def test_kube_interface_iter_service_accounts(self, mock_subprocess):
+        kubeconfig = str(uuid.uuid4())
+        context = str(uuid.uuid4())
+        namespace = str(uuid.uuid4())
+        name1 = str(uuid.uuid4())
+        name2 = str(uuid.uuid4())
+        token = str(uuid.uuid4())
+
+        pages = [
+            {"items": [{"metadata": {"name": name1}}], "metadata": {"continue": token}},
+            {"items": [{"metadata": {"name": name2}}], "metadata": {}},
+        ]
+        mock_subprocess.side_effect = [json.dumps(page).encode() for page in pages]
+
+        k = KubeInterface(kube_config_file=kubeconfig, context_name=context)
+        stream = k.iter_service_accounts(
+            namespace=namespace, labels=["a=b", "c"], name=name1, limit=1
+        )
+
+        self.assertEqual(next(stream)["metadata"]["name"], name1)
+        self.assertEqual(mock_subprocess.call_count, 1)
+        self.assertEqual(next(stream)["metadata"]["name"], name2)
+        self.assertEqual(mock_subprocess.call_count, 2)
+        self.assertEqual(list(stream), [])
+
+        base_cmd = (
+            f"kubectl --kubeconfig {kubeconfig}  --context {context} get --raw "
+            f"'/api/v1/namespaces/{namespace}/serviceaccounts?limit=1"
+            f"&labelSelector=a%3Db%2Cc&fieldSelector=metadata.name%3D{name1}"
+        )
+        mock_subprocess.assert_any_call(
+            shlex.split(f"{base_cmd}'"), stderr=subprocess.PIPE, timeout=None
+        )
+        mock_subprocess.assert_any_call(
+            shlex.split(f"{base_cmd}&continue={token}'"),
+            stderr=subprocess.PIPE,
+            timeout=None,
+        )
+
+    @patch("spark_client.services.KubeInterface")
+    def test_k8s_registry_get(self, mock_kube_interface):
+        name = str(uuid.uuid4())
+        namespace = str(uuid.uuid4())
+
+        mock_kube_interface.iter_service_accounts.return_value = [
+            {"metadata": {"name": name, "namespace": namespace, "labels": {}}}
+        ]
+        registry = K8sServiceAccountRegistry(mock_kube_interface)
+
+        self.assertEqual(registry.get(f"{namespace}:{name}").name, name)
+        for malformed in [name, f"{namespace}:{name}:{name}", f":{name}"]:
+            self.assertIsNone(registry.get(malformed))
+        mock_kube_interface.iter_service_accounts.assert_called_once_with(
+            namespace=namespace,
+            labels=[f"{K8sServiceAccountRegistry.SPARK_MANAGER_LABEL}=spark-client"],
+            name=name,
+            limit=K8sServiceAccountRegistry.PAGE_SIZE,
+        )
+
     @patch("spark_client.services.KubeInterface")
     def test_k8s_registry_retrieve_account_configurations(self, mock_kube_interface):
         data = {"k": "v"}
@@ -677,7 +778,7 @@ class TestServices(TestCase):
             }
         }
 
-        mock_kube_interface.get_service_accounts.return_value = [sa1, sa2]
+        mock_kube_interface.iter_service_accounts.return_value = [sa1, sa2]
         registry = K8sServiceAccountRegistry(mock_kube_interface)
         output = registry.all()
         self.assertEqual(output[0].name, name1)
@@ -687,6 +788,10 @@ class TestServices(TestCase):
         self.assertEqual(output[1].namespace, namespace2)
         self.assertEqual(output[1].primary, False)
 
+        mock_kube_interface.get_secret.assert_not_called()
+        self.assertEqual(output[0].extra_confs.props, data)
+        mock_kube_interface.get_secret.assert_called_once()
+
     @patch("spark_client.services.KubeInterface")
     def test_k8s_registry_set_primary(self, mock_kube_interface):
         data = {"k": "v"}
@@ -716,7 +821,7 @@ class TestServices(TestCase):
             }
         }
 
-        mock_kube_interface.get_service_accounts.return_value = [sa1, sa2]
+        mock_kube_interface.iter_service_accounts.return_value = [sa1, sa2]
         mock_kube_interface.set_label.return_value = 0
         registry = K8sServiceAccountRegistry(mock_kube_interface)
         self.assertEqual(
@@ -799,7 +904,7 @@ class TestServices(TestCase):
             extra_confs=PropertyFile(data),
         )
 
-        mock_kube_interface.get_service_accounts.return_value = [sa1, sa2, sa3]
+        mock_kube_interface.iter_service_accounts.return_value = [sa1, sa2, sa3]
         mock_kube_interface.set_label.return_value = 0
         mock_kube_interface.create.return_value = 0
 
@@ -901,6 +1006,135 @@ class TestServices(TestCase):
             "secret", f"spark-client-sa-conf-{name2}", namespace=namespace2
         )
 
+    def test_watched_k8s_registry(self):
+        mock_kube_interface = MagicMock()
+        name1 = str(uuid.uuid4())
+        name2 = str(uuid.uuid4())
+        namespace = str(uuid.uuid4())
+        conf_value = str(uuid.uuid4())
+
+        def sa(name, primary=False, resource_version="1"):
+            labels = {K8sServiceAccountRegistry.SPARK_MANAGER_LABEL: "spark-client"}
+            if primary:
+                labels[K8sServiceAccountRegistry.PRIMARY_LABEL] = "True"
+            return {
+                "metadata": {
+                    "name": name,
+                    "namespace": namespace,
+                    "labels": labels,
+                    "resourceVersion": resource_version,
+                }
+            }
+
+        def secret(name, value, resource_version="1"):
+            return {
+                "metadata": {
+                    "name": f"spark-client-sa-conf-{name}",
+                    "namespace": namespace,
+                    "resourceVersion": resource_version,
+                },
+                "data": {"k": base64.b64encode(value.encode()).decode()},
+            }
+
+        listings = {
+            "/api/v1/secrets": [
+                {"items": [secret(name1, "v")], "metadata": {"resourceVersion": "1"}}
+            ],
+            "/api/v1/serviceaccounts": [
+                {
+                    "items": [sa(name1, primary=True)],
+                    "metadata": {"resourceVersion": "1"},
+                }
+            ],
+        }
+        mock_kube_interface.iter_pages.side_effect = lambda path, **kwargs: listings[
+            path
+        ]
+
+        registry = WatchedK8sServiceAccountRegistry(mock_kube_interface)
+
+        self.assertEqual(registry.get_primary().name, name1)
+        self.assertEqual(
+            registry.get(f"{namespace}:{name1}").extra_confs.props, {"k": "v"}
+        )
+        self.assertIsNone(registry.get(f"{namespace}:{name2}"))
+
+        # Stub watch streams on service accounts and secrets
+        mock_kube_interface.watch_raw.return_value = [
+            {"type": "ADDED", "object": sa(name2, resource_version="2")},
+            {"type": "MODIFIED", "object": sa(name1, resource_version="3")},
+            {"type": "BOOKMARK", "object": {"metadata": {"resourceVersion": "4"}}},
+        ]
+        registry.watch_once(registry.SERVICE_ACCOUNTS)
+
+        mock_kube_interface.watch_raw.return_value = [
+            {"type": "MODIFIED", "object": secret(name1, conf_value, "5")},
+        ]
+        registry.watch_once(registry.SECRETS)
+
+        self.assertIsNone(registry.get_primary())
+        self.assertEqual(
+            registry.get(f"{namespace}:{name1}").extra_confs.props, {"k": conf_value}
+        )
+        self.assertEqual(registry.get(f"{namespace}:{name2}").name, name2)
+        self.assertEqual(registry._resource_versions[registry.SERVICE_ACCOUNTS], "4")
+
+        mock_kube_interface.watch_raw.return_value = [
+            {"type": "DELETED", "object": sa(name2, resource_version="6")},
+        ]
+        registry.watch_once(registry.SERVICE_ACCOUNTS)
+        self.assertIsNone(registry.get(f"{namespace}:{name2}"))
+
+        # An expired watch triggers a resync from a fresh listing
+        mock_kube_interface.watch_raw.return_value = [
+            {"type": "ERROR", "object": {"code": 410, "message": "too old"}},
+        ]
+        registry.watch_once(registry.SERVICE_ACCOUNTS)
+        self.assertEqual(registry.get_primary().name, name1)
+        self.assertEqual(len(registry.all()), 1)
+        mock_kube_interface.get_service_accounts.assert_not_called()
+        mock_kube_interface.iter_service_accounts.assert_not_called()
+
+    def test_watch_raw_raises_on_kubectl_failure(self):
+        kube_interface = KubeInterface(
+            "kubeconfig",
+            context_name="ctx",
+            kubectl_cmd="sh -c 'echo {}; exit 1' kubectl",
+        )
+
+        events = kube_interface.watch_raw("/api/v1/serviceaccounts")
+
+        self.assertEqual(next(events), {})
+        with self.assertRaises(subprocess.CalledProcessError):
+            next(events)
+
+    def test_watched_k8s_registry_survives_failures(self):
+        mock_kube_interface = MagicMock()
+        mock_kube_interface.iter_pages.return_value = [
+            {"items": [], "metadata": {"resourceVersion": "1"}}
+        ]
+
+        registry = WatchedK8sServiceAccountRegistry(mock_kube_interface)
+        registry.RETRY_BASE_DELAY = 0.05
+
+        mock_kube_interface.watch_raw.side_effect = subprocess.CalledProcessError(
+            1, "kubectl"
+        )
+        mock_kube_interface.iter_pages.side_effect = ValueError("unreachable")
+
+        with self.assertLogs(
+            "spark_client.services.WatchedK8sServiceAccountRegistry", level="ERROR"
+        ):
+            registry.start()
+            time.sleep(0.3)
+
+        try:
+            self.assertTrue(all(thread.is_alive() for thread in registry._threads))
+            # Exponential backoff: 0.05, 0.1, 0.2s, hence at most 3 attempts per kind
+            self.assertLessEqual(mock_kube_interface.watch_raw.call_count, 6)
+        finally:
+            registry.stop()
+
 
 if __name__ == "__main__":
     logging.basicConfig(format="%(asctime)s %(levelname)s %(message)s", level="DEBUG")
@@ -0,0 +1,203 @@
+import logging
+import os
+import subprocess
+import unittest
+import uuid
+from decimal import Decimal
+from unittest.mock import patch
+
+from spark_client.domain import Defaults, PropertyFile, ServiceAccount
+from spark_client.services import KubeInterface, SparkDeployMode, SparkInterface
+from spark_client.sizing import (
+    ClusterCapacity,
+    capacity_from_resources,
+    parse_quantity,
+    parse_spark_size,
+    propose_sizing,
+    settings_from_args,
+)
+from tests import UnittestWithTmpFolder, dump_properties, fake_kubectl, make_snap
+
+
+def node(cpu: str, memory: str, **spec) -> dict:
+    return {"spec": spec, "status": {"allocatable": {"cpu": cpu, "memory": memory}}}
+
+
+class TestSizing(UnittestWithTmpFolder):
+    def test_parse_quantity(self):
+        self.assertEqual(parse_quantity("500m"), Decimal("0.5"))
+        self.assertEqual(parse_quantity("4"), 4)
+        self.assertEqual(parse_quantity("16Gi"), 16 * 1024**3)
+        self.assertEqual(parse_quantity("1k"), 1000)
+        self.assertEqual(parse_quantity("1e3"), 1000)
+
+        with self.assertRaises(ValueError):
+            parse_quantity("lots")
+
+    def test_parse_spark_size(self):
+        self.assertEqual(parse_spark_size("4g"), 4096)
+        self.assertEqual(parse_spark_size("512m"), 512)
+        self.assertEqual(parse_spark_size("2048"), 2048)
+        self.assertEqual(parse_spark_size("1T"), 1024**2)
+
+        with self.assertRaises(ValueError):
+            parse_spark_size("4 gigabytes")
+
+    def test_capacity_from_resources(self):
+        capacity = capacity_from_resources(
+            [
+                node("16", "64Gi"),
+                node("4000m", "16Gi", unschedulable=True),
+                node("8", "32Gi", taints=[{"effect": "NoSchedule"}]),
+                node("8", "32Gi", taints=[{"effect": "PreferNoSchedule"}]),
+            ],
+            [
+                {
+                    "status": {
+                        "hard": {"requests.cpu": "20", "requests.memory": "100Gi"},
+                        "used": {"requests.cpu": "2500m", "requests.memory": "4Gi"},
+                    }
+                },
+                {"status": {"hard": {"limits.memory": "50Gi"}}},
+            ],
+        )
+
+        self.assertEqual(capacity.nodes, [(16000, 65536), (8000, 32768)])
+        self.assertEqual(capacity.quota_millicores, 17500)
+        self.assertEqual(capacity.quota_mib, 50 * 1024)
+
+        self.assertIsNone(capacity_from_resources([], []).quota_mib)
+
+    def test_propose_sizing(self):
+        decision = propose_sizing(
+            PropertyFile.empty(),
+            ClusterCapacity(
+                nodes=[(16000, 65536)] * 3, quota_millicores=18000, quota_mib=None
+            ),
+        )
+
+        self.assertEqual(
+            decision.properties,
+            {
+                "spark.executor.cores": "2",
+                "spark.executor.memory": "7659m",
+                "spark.executor.memoryOverhead": "767m",
+                "spark.executor.instances": "8",
+                "spark.kubernetes.allocation.batch.size": "7",
+            },
+        )
+        self.assertIn("quota", decision.format())
+
+    def test_propose_sizing_keeps_user_settings(self):
+        decision = propose_sizing(
+            PropertyFile(
+                {
+                    "spark.executor.memory": "8g",
+                    "spark.dynamicAllocation.enabled": "true",
+                }
+            )
+            + settings_from_args(["--executor-cores", "4", "app.py"]),
+            ClusterCapacity(nodes=[(16000, 65536)] * 3),
+        )
+
+        self.assertEqual(
+            decision.properties,
+            {
+                "spark.dynamicAllocation.maxExecutors": "9",
+                "spark.kubernetes.allocation.batch.size": "5",
+            },
+        )
+        self.assertIn("spark.executor.cores=4 kept as set", decision.format())
+
+        self.assertEqual(
+            propose_sizing(
+                PropertyFile({"spark.executor.cores": "32"}),
+                ClusterCapacity(nodes=[(16000, 65536)]),
+            ).properties,
+            {},
+        )
+
+    def test_settings_from_args(self):
+        self.assertEqual(
+            settings_from_args(
+                [
+                    "--num-executors",
+                    "3",
+                    "--executor-memory=2g",
+                    "--conf",
+                    "spark.executor.cores=2",
+                    "--conf=spark.executor.memoryOverhead=1g",
+                    "app.py",
+                ]
+            ).props,
+            {
+                "spark.executor.instances": "3",
+                "spark.executor.memory": "2g",
+                "spark.executor.cores": "2",
+                "spark.executor.memoryOverhead": "1g",
+            },
+        )
+
+    def test_spark_submit_reads_the_nodes_once(self):
+        snap = os.path.join(self.TMP_FOLDER, str(uuid.uuid4()))
+        output = os.path.join(snap, "output")
+        make_snap(snap, dump_properties(output))
+
+        kube_config = os.path.join(snap, "kube-config")
+        fake_kubectl.write_kube_config(kube_config)
+
+        spark = SparkInterface(
+            service_account=ServiceAccount(
+                "spark", "spark-ns", "https://localhost", PropertyFile.empty()
+            ),
+            kube_interface=KubeInterface(kube_config),
+            defaults=Defaults(
+                {"SNAP": snap, "HOME": snap, "SPARK_CLIENT_AUTOTUNE": "true"}
+            ),
+        )
+
+        def pages(path):
+            return iter(
+                [{"items": [node("8", "32Gi")] if path == "/api/v1/nodes" else []}]
+            )
+
+        with patch.object(
+            KubeInterface, "iter_pages", side_effect=pages
+        ) as mock_iter_pages, patch("sys.stderr") as mock_stderr:
+            for _ in range(2):
+                self.assertEqual(
+                    spark.spark_submit(
+                        SparkDeployMode.CLUSTER,
+                        None,
+                        ["--executor-cores", "3", "app.py"],
+                    ),
+                    0,
+                )
+
+        self.assertEqual(
+            [call.args for call in mock_iter_pages.call_args_list],
+            [
+                ("/api/v1/nodes",),
+                ("/api/v1/namespaces/spark-ns/resourcequotas",),
+                ("/api/v1/namespaces/spark-ns/resourcequotas",),
+            ],
+        )
+        self.assertIn("Executor sizing", str(mock_stderr.write.call_args_list))
+
+        submitted = PropertyFile.read(output).props
+        self.assertNotIn("spark.executor.cores", submitted)
+        self.assertEqual(submitted["spark.executor.instances"], "2")
+
+        with patch.object(
+            KubeInterface,
+            "iter_pages",
+            side_effect=subprocess.TimeoutExpired("kubectl", 1),
+        ), self.assertLogs("spark_client.services", level="WARNING"):
+            self.assertEqual(
+                spark.spark_submit(SparkDeployMode.CLUSTER, None, ["app.py"]), 0
+            )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(message)s", level="DEBUG")
+    unittest.main()
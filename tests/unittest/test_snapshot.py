@@ -0,0 +1,179 @@
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+import unittest
+import uuid
+
+from spark_client.domain import LazyPropertyFile, PropertyFile, ServiceAccount
+from spark_client.exceptions import ResolutionTimeout
+from spark_client.services import KubeInterface
+from spark_client.snapshot import AccountSnapshotStore, call_with_timeout
+from spark_client.throttling import RetryPolicy
+from tests import UnittestWithTmpFolder
+
+
+class TestSnapshot(UnittestWithTmpFolder):
+    def setUp(self) -> None:
+        self.store = AccountSnapshotStore(
+            os.path.join(self.TMP_FOLDER, str(uuid.uuid4()))
+        )
+        self.key = self.store.key(str(uuid.uuid4()), None, None, None)
+        self.account = ServiceAccount(
+            name=str(uuid.uuid4()),
+            namespace=str(uuid.uuid4()),
+            api_server=f"https://{str(uuid.uuid4())}",
+            primary=True,
+            extra_confs=PropertyFile({"spark.app.name": str(uuid.uuid4())}),
+        )
+
+    def test_save_and_load(self):
+        self.assertIsNone(self.store.load(self.key, 60))
+
+        self.store.save(self.key, self.account)
+
+        account, age = self.store.load(self.key, 60)
+        self.assertEqual(account.id, self.account.id)
+        self.assertTrue(account.primary)
+        self.assertEqual(account.extra_confs.props, self.account.extra_confs.props)
+        self.assertLess(age, 60)
+
+        filename = os.path.join(self.store.folder, f"{self.key}.json")
+        self.assertEqual(os.stat(filename).st_mode & 0o777, 0o600)
+
+        with open(filename) as fid:
+            raw = json.load(fid)
+        raw["timestamp"] -= 120
+        with open(filename, "w") as fid:
+            json.dump(raw, fid)
+
+        self.assertIsNone(self.store.load(self.key, 60))
+
+    def test_resolve_refreshes_snapshot(self):
+        account, age = self.store.resolve(self.key, lambda: self.account, 5, 60)
+
+        self.assertEqual(account.id, self.account.id)
+        self.assertIsNone(age)
+        self.assertIsNotNone(self.store.load(self.key, 60))
+
+        account, age = self.store.resolve(self.key, lambda: None, 5, 60)
+        self.assertIsNone(account)
+
+    def test_resolve_falls_back_to_snapshot(self):
+        def fail():
+            raise subprocess.CalledProcessError(1, "kubectl")
+
+        with self.assertRaises(subprocess.CalledProcessError):
+            self.store.resolve(self.key, fail, 5, 60)
+
+        self.store.save(self.key, self.account)
+
+        with self.assertLogs(
+            "spark_client.snapshot.AccountSnapshotStore", level="WARNING"
+        ) as cm:
+            account, age = self.store.resolve(self.key, fail, 5, 60)
+
+        self.assertEqual(account.id, self.account.id)
+        self.assertIsNotNone(age)
+        self.assertIn("last known-good snapshot", cm.output[0])
+
+        with self.assertRaises(ValueError):
+            self.store.resolve(self.key, lambda: int("not a number"), 5, 60)
+
+    def test_resolve_timeout(self):
+        release = threading.Event()
+        self.store.save(self.key, self.account)
+
+        try:
+            account, age = self.store.resolve(
+                self.key, lambda: release.wait(10), 0.1, 60
+            )
+            self.assertEqual(account.id, self.account.id)
+
+            with self.assertRaises(ResolutionTimeout):
+                call_with_timeout(lambda: release.wait(10), 0.1)
+        finally:
+            release.set()
+
+    def test_resolve_loads_configurations_within_budget(self):
+        release = threading.Event()
+        self.store.save(self.key, self.account)
+        filename = os.path.join(self.store.folder, f"{self.key}.json")
+        with open(filename) as fid:
+            expected = json.load(fid)
+
+        def failing_confs():
+            raise subprocess.CalledProcessError(1, "kubectl")
+
+        try:
+            for loader in [failing_confs, lambda: release.wait(10) and {}]:
+                account, age = self.store.resolve(
+                    self.key,
+                    lambda: ServiceAccount(
+                        name=self.account.name,
+                        namespace=self.account.namespace,
+                        api_server=self.account.api_server,
+                        primary=True,
+                        extra_confs=LazyPropertyFile(loader),
+                    ),
+                    0.2,
+                    60,
+                )
+
+                self.assertIsNotNone(age)
+                self.assertEqual(
+                    account.extra_confs.props, self.account.extra_confs.props
+                )
+                with open(filename) as fid:
+                    self.assertEqual(json.load(fid), expected)
+        finally:
+            release.set()
+
+    def test_timeout_stops_kubectl_calls(self):
+        kube_interface = KubeInterface(
+            str(uuid.uuid4()),
+            context_name="ctx",
+            kubectl_cmd=f"{sys.executable} -c 'import time; time.sleep(10)'",
+        )
+        errors = []
+
+        def resolve():
+            try:
+                kube_interface.exec("get serviceaccounts", namespace="default")
+            except subprocess.TimeoutExpired as e:
+                errors.append(e)
+
+        start = time.monotonic()
+        with self.assertRaises(ResolutionTimeout):
+            call_with_timeout(resolve, 0.2)
+
+        for _ in range(200):
+            if errors:
+                break
+            time.sleep(0.01)
+
+        self.assertEqual(len(errors), 1)
+        self.assertLess(time.monotonic() - start, 3)
+
+        self.store.save(self.key, self.account)
+        account, age = self.store.resolve(
+            self.key,
+            lambda: KubeInterface(
+                kube_interface.kube_config_file,
+                context_name="ctx",
+                kubectl_cmd=kube_interface.kubectl_cmd,
+                retry_policy=RetryPolicy(max_attempts=1, timeout=0.1),
+            ).exec("get serviceaccounts", namespace="default"),
+            5,
+            60,
+        )
+        self.assertEqual(account.id, self.account.id)
+        self.assertIsNotNone(age)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(message)s", level="DEBUG")
+    unittest.main()
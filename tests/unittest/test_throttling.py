@@ -0,0 +1,183 @@
+import logging
+import os
+import subprocess
+import sys
+import time
+import unittest
+import uuid
+from typing import Any, Dict, List
+from unittest.mock import patch
+
+from spark_client.instrumentation import add_listener, remove_listener
+from spark_client.services import KubeInterface
+from spark_client.throttling import (
+    CONNECTION_ERROR,
+    ERROR,
+    SERVER_ERROR,
+    THROTTLED,
+    TIMEOUT,
+    RetryPolicy,
+    TokenBucket,
+    classify_error,
+)
+from tests import UnittestWithTmpFolder, fake_kubectl
+
+
+class TestThrottling(UnittestWithTmpFolder):
+    def setUp(self) -> None:
+        self.kube_config = os.path.join(self.TMP_FOLDER, str(uuid.uuid4()))
+        fake_kubectl.write_kube_config(self.kube_config)
+
+        self.attempts: List[Dict[str, Any]] = []
+        self.listener = add_listener(
+            lambda m: (
+                self.attempts.append(m.attributes) if m.name == "kubectl" else None
+            )
+        )
+
+    def tearDown(self) -> None:
+        remove_listener(self.listener)
+
+    def test_classify_error(self):
+        self.assertEqual(
+            classify_error(b"Error from server (TooManyRequests): slow down"),
+            THROTTLED,
+        )
+        self.assertEqual(
+            classify_error(b"Error from server (InternalError): oops"), SERVER_ERROR
+        )
+        self.assertEqual(
+            classify_error(b"Unable to connect to the server: dial tcp"),
+            CONNECTION_ERROR,
+        )
+        self.assertEqual(
+            classify_error(b'Error from server (NotFound): "spark" not found'), ERROR
+        )
+        self.assertEqual(classify_error(None), ERROR)
+
+    def test_token_bucket(self):
+        self.assertEqual(TokenBucket(0).acquire(), 0.0)
+
+        bucket = TokenBucket(qps=50, burst=2)
+
+        start = time.monotonic()
+        waits = [bucket.acquire() for _ in range(6)]
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(waits[:2], [0.0, 0.0])
+        self.assertTrue(all(wait > 0 for wait in waits[2:]))
+        self.assertGreaterEqual(elapsed, 4 / 50 * 0.9)
+
+    def test_retry_policy(self):
+        policy = RetryPolicy(max_attempts=3, base_delay=1.0, max_delay=2.0)
+
+        self.assertTrue(policy.should_retry("create", THROTTLED, 1))
+        self.assertFalse(policy.should_retry("create", SERVER_ERROR, 1))
+        self.assertFalse(policy.should_retry("label", TIMEOUT, 1))
+        self.assertTrue(policy.should_retry("get", SERVER_ERROR, 1))
+        self.assertTrue(policy.should_retry("delete", CONNECTION_ERROR, 2))
+        self.assertFalse(policy.should_retry("get", ERROR, 1))
+        self.assertFalse(policy.should_retry("get", THROTTLED, 3))
+
+        self.assertTrue(all(0 <= policy.delay(10) <= 2.0 for _ in range(100)))
+
+    def test_throttled_call_is_retried(self):
+        kube_interface = KubeInterface(
+            self.kube_config,
+            retry_policy=RetryPolicy(base_delay=0.0),
+        )
+
+        with patch.object(
+            subprocess,
+            "check_output",
+            side_effect=[
+                subprocess.CalledProcessError(
+                    1, "kubectl", stderr=b"Error from server (TooManyRequests)"
+                ),
+                b"{}",
+            ],
+        ) as mock_check_output:
+            self.assertEqual(kube_interface.exec("create serviceaccount spark"), {})
+
+        self.assertEqual(mock_check_output.call_count, 2)
+        self.assertEqual(
+            [(m["attempt"], m["outcome"]) for m in self.attempts],
+            [(1, THROTTLED), (2, "success")],
+        )
+
+    def test_non_idempotent_call_is_not_retried(self):
+        kube_interface = KubeInterface(
+            self.kube_config,
+            retry_policy=RetryPolicy(base_delay=0.0),
+        )
+
+        with patch.object(
+            subprocess,
+            "check_output",
+            side_effect=subprocess.CalledProcessError(
+                1, "kubectl", stderr=b"Error from server (InternalError)"
+            ),
+        ) as mock_check_output, patch.object(sys, "stderr") as mock_stderr:
+            with self.assertRaises(subprocess.CalledProcessError):
+                kube_interface.exec("create serviceaccount spark")
+
+        self.assertEqual(mock_check_output.call_count, 1)
+        mock_stderr.write.assert_called_once_with("Error from server (InternalError)")
+
+    def test_timed_out_call_kills_kubectl(self):
+        pid_file = os.path.join(self.TMP_FOLDER, str(uuid.uuid4()))
+        kube_interface = KubeInterface(
+            self.kube_config,
+            kubectl_cmd=(
+                f"{sys.executable} -c 'import os, time; "
+                f'open("{pid_file}", "w").write(str(os.getpid())); time.sleep(10)\''
+            ),
+            retry_policy=RetryPolicy(max_attempts=1, timeout=0.5),
+        ).with_context("fake")
+
+        with patch.object(sys, "stderr"), self.assertRaises(subprocess.TimeoutExpired):
+            kube_interface.exec("get serviceaccounts", namespace="default")
+
+        with open(pid_file) as fid:
+            pid = int(fid.read())
+        with self.assertRaises(ProcessLookupError):
+            os.kill(pid, 0)
+        self.assertEqual([m["outcome"] for m in self.attempts], [TIMEOUT])
+
+    def test_retries_are_exhausted(self):
+        kube_interface = KubeInterface(
+            self.kube_config,
+            kubectl_cmd=f"{sys.executable} {fake_kubectl.__file__}",
+            retry_policy=RetryPolicy(max_attempts=3, base_delay=0.01),
+        ).with_context("fake")
+
+        with patch.dict(
+            os.environ,
+            {
+                fake_kubectl.STATE_ENV: os.path.join(self.TMP_FOLDER, "state.json"),
+                fake_kubectl.TOO_MANY_REQUESTS_RATE_ENV: "1",
+            },
+        ), patch.object(sys, "stderr"):
+            with self.assertRaises(subprocess.CalledProcessError):
+                kube_interface.get_raw("/api/v1/serviceaccounts")
+
+        self.assertEqual(
+            [(m["attempt"], m["outcome"]) for m in self.attempts],
+            [(1, THROTTLED), (2, THROTTLED), (3, THROTTLED)],
+        )
+
+    def test_derived_interfaces_share_the_rate_limiter(self):
+        bucket = TokenBucket(qps=10, burst=5)
+        kube_interface = KubeInterface(self.kube_config, rate_limiter=bucket)
+
+        derived = (
+            kube_interface.with_context("other").with_kubectl_cmd("kubectl").reloaded()
+        )
+
+        self.assertIs(derived.rate_limiter, bucket)
+        self.assertIs(derived.retry_policy, kube_interface.retry_policy)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(message)s", level="DEBUG")
+    unittest.main()
@@ -0,0 +1,139 @@
+import json
+import logging
+import os
+import unittest
+import uuid
+
+from spark_client.instrumentation import Measurement, measure
+from spark_client.tracing import (
+    JsonLinesSpanExporter,
+    OtlpHttpSpanExporter,
+    SpanExporter,
+    Tracer,
+)
+from tests import UnittestWithTmpFolder
+
+
+class ListSpanExporter(SpanExporter):
+    def __init__(self):
+        self.traces = []
+
+    def export(self, spans):
+        self.traces.append(spans)
+
+
+class TestTracing(UnittestWithTmpFolder):
+    def test_tracer_nested_spans(self):
+        exporter = ListSpanExporter()
+        account_id = f"{str(uuid.uuid4())}:{str(uuid.uuid4())}"
+
+        tracer = Tracer(exporter).start()
+        try:
+            with measure("command", command="spark-submit") as root:
+                with measure("account.resolve") as m:
+                    m.attributes["account"] = account_id
+                    with measure("secret.fetch"):
+                        pass
+                with measure("spark.merge_config", keys=3):
+                    pass
+            with measure("registry.all"):
+                pass
+        finally:
+            tracer.stop()
+
+        self.assertEqual(len(exporter.traces), 2)
+
+        spans = {span.name: span for span in exporter.traces[0]}
+        self.assertEqual(
+            set(spans.keys()),
+            {"command", "account.resolve", "secret.fetch", "spark.merge_config"},
+        )
+        self.assertEqual({span.trace_id for span in spans.values()}, {root.trace_id})
+        self.assertIsNone(spans["command"].parent_id)
+        self.assertEqual(spans["account.resolve"].parent_id, root.span_id)
+        self.assertEqual(
+            spans["secret.fetch"].parent_id, spans["account.resolve"].span_id
+        )
+        self.assertEqual(spans["account.resolve"].attributes["account"], account_id)
+        self.assertEqual(spans["spark.merge_config"].attributes["keys"], 3)
+
+        self.assertNotEqual(exporter.traces[1][0].trace_id, root.trace_id)
+
+    def test_tracer_sampling(self):
+        exporter = ListSpanExporter()
+
+        tracer = Tracer(exporter, sample_ratio=0.5).start()
+        try:
+            for _ in range(200):
+                with measure("command"):
+                    with measure("account.resolve"):
+                        pass
+        finally:
+            tracer.stop()
+
+        self.assertTrue(0 < len(exporter.traces) < 200)
+        self.assertTrue(all(len(spans) == 2 for spans in exporter.traces))
+
+        exporter = ListSpanExporter()
+        tracer = Tracer(exporter, sample_ratio=0.0).start()
+        with measure("command"):
+            pass
+        tracer.stop()
+
+        self.assertEqual(exporter.traces, [])
+
+    def test_json_lines_exporter_rotation(self):
+        filename = os.path.join(self.TMP_FOLDER, str(uuid.uuid4()))
+        exporter = JsonLinesSpanExporter(filename, max_bytes=1, backup_count=2)
+
+        for index in range(4):
+            exporter.export(
+                [
+                    Measurement(
+                        f"span-{index}", trace_id="0" * 32, span_id=f"{index:016x}"
+                    )
+                ]
+            )
+
+        with open(filename) as fid:
+            self.assertEqual(json.loads(fid.readline())["name"], "span-3")
+        with open(f"{filename}.1") as fid:
+            self.assertEqual(json.loads(fid.readline())["name"], "span-2")
+        with open(f"{filename}.2") as fid:
+            self.assertEqual(json.loads(fid.readline())["name"], "span-1")
+        self.assertFalse(os.path.exists(f"{filename}.3"))
+
+    def test_otlp_payload(self):
+        root = Measurement(
+            "command",
+            trace_id="1" * 32,
+            span_id="2" * 16,
+            timestamp=1.5,
+            duration=0.25,
+        )
+        child = Measurement(
+            "spark.exec",
+            attributes={"command": "spark-submit"},
+            trace_id="1" * 32,
+            span_id="3" * 16,
+            parent_id="2" * 16,
+            error=ValueError("test"),
+        )
+
+        payload = OtlpHttpSpanExporter("http://localhost:4318/").payload([child, root])
+
+        spans = payload["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        self.assertEqual(spans[0]["parentSpanId"], "2" * 16)
+        self.assertEqual(spans[0]["status"]["code"], 2)
+        self.assertIn(
+            {"key": "command", "value": {"stringValue": "spark-submit"}},
+            spans[0]["attributes"],
+        )
+        self.assertNotIn("parentSpanId", spans[1])
+        self.assertEqual(spans[1]["startTimeUnixNano"], "1500000000")
+        self.assertEqual(spans[1]["endTimeUnixNano"], "1750000000")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(message)s", level="DEBUG")
+    unittest.main()
@@ -0,0 +1,162 @@
+import logging
+import os
+import unittest
+import uuid
+
+from spark_client.domain import Defaults, PropertyFile, ServiceAccount
+from spark_client.instrumentation import add_listener, remove_listener
+from spark_client.services import SparkDeployMode, SparkInterface
+from spark_client.uploads import UploadCache, file_digest, stage_dependencies
+from tests import UnittestWithTmpFolder, make_snap
+
+
+class TestUploads(UnittestWithTmpFolder):
+    def setUp(self) -> None:
+        self.folder = os.path.join(self.TMP_FOLDER, str(uuid.uuid4()))
+        self.upload_path = os.path.join(self.folder, "uploads")
+        os.makedirs(self.folder)
+
+        self.app = self.write("app.jar", b"application")
+        self.dep = self.write("dep.jar", b"dependency")
+        self.env = self.write("env.tar.gz", b"environment")
+
+    def write(self, name: str, content: bytes) -> str:
+        path = os.path.join(self.folder, name)
+        with open(path, "wb") as fid:
+            fid.write(content)
+        return path
+
+    def staged(self, path: str) -> str:
+        return os.path.join(
+            self.upload_path,
+            "spark-client-cache",
+            file_digest(path),
+            os.path.basename(path),
+        )
+
+    def test_stage_is_keyed_by_content(self):
+        results = []
+        listener = add_listener(
+            lambda m: (
+                results.append(m.attributes["result"])
+                if m.name == "uploads.stage"
+                else None
+            )
+        )
+
+        try:
+            staged = UploadCache(self.upload_path).stage(self.app)
+            self.assertEqual(staged, self.staged(self.app))
+            with open(staged, "rb") as fid:
+                self.assertEqual(fid.read(), b"application")
+
+            self.assertEqual(
+                UploadCache(f"file://{self.upload_path}").stage(self.app), staged
+            )
+
+            self.write("app.jar", b"new application")
+            self.assertNotEqual(UploadCache(self.upload_path).stage(self.app), staged)
+        finally:
+            remove_listener(listener)
+
+        self.assertEqual(results, ["miss", "hit", "miss"])
+
+    def test_rewrite_args(self):
+        args = UploadCache(self.upload_path).rewrite_args(
+            [
+                "--class",
+                "org.example.Main",
+                "--jars",
+                f"file://{self.dep},s3a://bucket/other.jar",
+                f"--archives={self.env}#environment",
+                "--conf",
+                f"spark.files={self.dep}",
+                "--conf",
+                f"spark.app.name={self.dep}",
+                "--verbose",
+                self.app,
+                self.dep,
+            ]
+        )
+
+        self.assertEqual(
+            args,
+            [
+                "--class",
+                "org.example.Main",
+                "--jars",
+                f"local://{self.staged(self.dep)},s3a://bucket/other.jar",
+                f"--archives=local://{self.staged(self.env)}#environment",
+                "--conf",
+                f"spark.files=local://{self.staged(self.dep)}",
+                "--conf",
+                f"spark.app.name={self.dep}",
+                "--verbose",
+                f"local://{self.staged(self.app)}",
+                self.dep,
+            ],
+        )
+
+    def test_stage_dependencies(self):
+        properties = PropertyFile(
+            {
+                "spark.kubernetes.file.upload.path": self.upload_path,
+                "spark.jars": f"{self.dep},local:///opt/spark/jars/other.jar",
+                "spark.app.name": "app",
+            }
+        )
+
+        staged_properties, args = stage_dependencies(properties, [self.app])
+
+        self.assertEqual(
+            staged_properties.props["spark.jars"],
+            f"local://{self.staged(self.dep)},local:///opt/spark/jars/other.jar",
+        )
+        self.assertEqual(staged_properties.props["spark.app.name"], "app")
+        self.assertEqual(args, [f"local://{self.staged(self.app)}"])
+
+        remote = PropertyFile(
+            {
+                "spark.kubernetes.file.upload.path": "s3a://bucket/uploads",
+                "spark.jars": self.dep,
+            }
+        )
+        self.assertEqual(stage_dependencies(remote, [self.app]), (remote, [self.app]))
+
+    def test_spark_submit_stages_dependencies_in_cluster_mode(self):
+        snap = os.path.join(self.folder, "snap")
+        output = os.path.join(snap, "output")
+        make_snap(
+            snap,
+            f'echo "$@" > {output}\n',
+            f"spark.kubernetes.file.upload.path={self.upload_path}\n",
+        )
+
+        spark = SparkInterface(
+            service_account=ServiceAccount(
+                "spark",
+                "default",
+                "https://localhost",
+                extra_confs=PropertyFile.empty(),
+            ),
+            kube_interface=None,
+            defaults=Defaults(
+                {"SNAP": snap, "HOME": snap, "SPARK_CLIENT_UPLOAD_CACHE": "true"}
+            ),
+        )
+
+        for deploy_mode in [SparkDeployMode.CLIENT, SparkDeployMode.CLUSTER]:
+            self.assertEqual(spark.spark_submit(deploy_mode, None, [self.app]), 0)
+
+            with open(output) as fid:
+                submitted = fid.read().split()
+
+            if deploy_mode == SparkDeployMode.CLIENT:
+                self.assertEqual(submitted[-1], self.app)
+            else:
+                self.assertEqual(submitted[-1], f"local://{self.staged(self.app)}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(message)s", level="DEBUG")
+    unittest.main()